@@ -2,30 +2,47 @@
 Real-time chat event handlers using Flask-SocketIO
 """
 
+from flask import request
 from flask_socketio import emit, join_room, leave_room
-from flask_login import current_user
 from app import socketio, db
-from app.models import ForumPost, ForumReply, User
+from app.utils.chat import HISTORY_PAGE_SIZE, channel_id_for, chat_context, chat_history, message_payload, next_message_id, persist_message
+from app.utils.pagination import page_size
+from app.utils.presence import presence
+from app.utils.search import MAX_RESULTS, search_chat
+from app.utils.socket_sessions import sessions, socket_user
+from app.utils.typing_indicators import typing_aggregator
+from app.utils.metrics import track_event_metrics
+from app.utils.query_stats import track_event_queries
 from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
 
 @socketio.on('connect')
 def on_connect():
-    """Handle client connection"""
-    if current_user.is_authenticated:
-        print(f'User {current_user.username} connected')
-    else:
-        print('Anonymous user connected')
+    """Handle client connection; resolves the connection's user snapshot once"""
+    user = socket_user()
+    logger.info('Socket connected', extra={'event': 'socket.connect',
+                                           'user_id': user.user_id if user is not None else None})
 
 @socketio.on('disconnect')
 def on_disconnect():
     """Handle client disconnection"""
-    if current_user.is_authenticated:
-        print(f'User {current_user.username} disconnected')
+    user = sessions.get(request.sid)
+    sessions.remove(request.sid)
+    presence().disconnect(request.sid)
+    if user is not None:
+        typing_aggregator().forget(user.user_id)
+    logger.info('Socket disconnected', extra={'event': 'socket.disconnect',
+                                              'user_id': user.user_id if user is not None else None})
 
 @socketio.on('join')
+@track_event_metrics('join')
+@track_event_queries('join', budget=3)
 def on_join(data):
     """Handle user joining a chat room (class group)"""
-    if not current_user.is_authenticated:
+    user = socket_user()
+    if user is None:
         return
     
     room = data.get('room')
@@ -35,7 +52,7 @@ def on_join(data):
     # Verify user belongs to this class group
     try:
         room_id = int(room)
-        if current_user.class_group_id != room_id:
+        if user.class_group_id != room_id:
             emit('error', {'message': 'Access denied to this chat room'})
             return
     except (ValueError, TypeError):
@@ -43,18 +60,27 @@ def on_join(data):
         return
     
     join_room(room)
+    sessions.joined(request.sid, room)
     emit('status', {
-        'message': f'{current_user.username} joined the chat',
-        'user': current_user.username,
+        'message': f'{user.username} joined the chat',
+        'user': user.username,
         'timestamp': datetime.now().strftime('%H:%M')
     }, to=room)
     
-    print(f'User {current_user.username} joined room {room}')
+    # Online list: the room gets a debounced update, the joiner the current one
+    tracker = presence()
+    tracker.join(room, request.sid, user.user_id, user.username)
+    emit('presence', tracker.snapshot(room))
+    
+    logger.info('Joined chat room', extra={'event': 'chat.join', 'user_id': user.user_id, 'room': room})
 
 @socketio.on('leave')
+@track_event_metrics('leave')
+@track_event_queries('leave', budget=3)
 def on_leave(data):
     """Handle user leaving a chat room"""
-    if not current_user.is_authenticated:
+    user = socket_user()
+    if user is None:
         return
     
     room = data.get('room')
@@ -62,38 +88,38 @@ def on_leave(data):
         return
     
     leave_room(room)
+    sessions.left(request.sid, room)
+    presence().leave(room, request.sid)
+    typing_aggregator().update(room, user.user_id, user.username, False)
     emit('status', {
-        'message': f'{current_user.username} left the chat',
-        'user': current_user.username,
+        'message': f'{user.username} left the chat',
+        'user': user.username,
         'timestamp': datetime.now().strftime('%H:%M')
     }, to=room)
     
-    print(f'User {current_user.username} left room {room}')
+    logger.info('Left chat room', extra={'event': 'chat.leave', 'user_id': user.user_id, 'room': room})
 
 @socketio.on('message')
+@track_event_metrics('message')
+@track_event_queries('message', budget=7)
 def handle_message(data):
     """Handle real-time chat messages"""
-    print(f'📨 Received message event from {current_user.username if current_user.is_authenticated else "anonymous"}: {data}')
-    
-    if not current_user.is_authenticated:
-        print('❌ User not authenticated')
+    user = socket_user()
+    if user is None:
         emit('error', {'message': 'Authentication required'})
         return
     
     message_text = data.get('msg', '').strip()
     room = data.get('room')
     
-    print(f'📝 Message: "{message_text}", Room: {room}')
-    
     if not message_text or not room:
-        print('❌ Missing message or room')
         emit('error', {'message': 'Message and room are required'})
         return
     
     # Verify user belongs to this class group
     try:
         room_id = int(room)
-        if current_user.class_group_id != room_id:
+        if user.class_group_id != room_id:
             emit('error', {'message': 'Access denied to this chat room'})
             return
     except (ValueError, TypeError):
@@ -101,59 +127,46 @@ def handle_message(data):
         return
     
     try:
-        # Save message to database as a ForumReply (for persistence)
-        # First, get or create a general chat post for this class
-        chat_post = ForumPost.query.filter_by(
-            class_group_id=room,
-            title='Class Chat'
-        ).first()
+        author = (user.user_id, user.username, user.initials)
         
-        if not chat_post:
-            # Create a general chat post for this class
-            chat_post = ForumPost(
-                title='Class Chat',
-                content='Real-time class discussion',
-                user_id=current_user.id,
-                class_group_id=room
-            )
-            db.session.add(chat_post)
-            db.session.commit()
-        
-        # Create the chat message as a reply
-        chat_message = ForumReply(
-            content=message_text,
-            user_id=current_user.id,
-            post_id=chat_post.id
-        )
-        db.session.add(chat_message)
-        db.session.commit()
-        
-        # Prepare message data for broadcast
-        message_data = {
-            'id': chat_message.id,
-            'msg': message_text,
-            'user': current_user.username,
-            'user_initials': current_user.avatar_initials,
-            'user_id': current_user.id,
-            'timestamp': chat_message.timestamp.strftime('%H:%M'),
-            'full_timestamp': chat_message.timestamp.strftime('%B %d, %Y at %H:%M'),
-            'room': room
+        # The id is assigned here so the message goes out before it is written
+        chat_message = {
+            'id': next_message_id(),
+            'channel_id': channel_id_for(room_id),
+            'user_id': author[0],
+            'content': message_text,
+            'timestamp': datetime.utcnow()
         }
         
-        # Broadcast message to all users in the room
-        emit('message', message_data, to=room)
-        
-        print(f'Message from {current_user.username} in room {room}: {message_text}')
-        
-    except Exception as e:
-        print(f'Error saving message: {e}')
+        # Prepare message data for broadcast
+        message_data = message_payload(chat_message['id'], message_text, chat_message['timestamp'], *author)
+        message_data['room'] = room
+    except Exception:
+        logger.exception('Preparing chat message failed', extra={'event': 'chat.message_failed', 'room': room})
         emit('error', {'message': 'Failed to send message'})
         db.session.rollback()
+        return
+    
+    # Broadcast message to all users in the room
+    emit('message', message_data, to=room)
+    
+    try:
+        # Queued for the chat writer (see app/utils/chat.py)
+        persist_message(chat_message, message_data)
+        logger.info('Chat message', extra={'event': 'chat.message', 'user_id': author[0], 'room': room,
+                                           'message_id': chat_message['id'], 'length': len(message_text)})
+    except Exception:
+        logger.exception('Saving chat message failed', extra={'event': 'chat.save_failed', 'room': room,
+                                                               'message_id': chat_message['id']})
+        db.session.rollback()
 
 @socketio.on('typing')
+@track_event_metrics('typing')
+@track_event_queries('typing', budget=2)
 def handle_typing(data):
     """Handle typing indicators"""
-    if not current_user.is_authenticated:
+    user = socket_user()
+    if user is None:
         return
     
     room = data.get('room')
@@ -165,22 +178,21 @@ def handle_typing(data):
     # Verify user belongs to this class group
     try:
         room_id = int(room)
-        if current_user.class_group_id != room_id:
+        if user.class_group_id != room_id:
             return
     except (ValueError, TypeError):
         return
     
-    # Broadcast typing status to other users in the room
-    emit('typing', {
-        'user': current_user.username,
-        'user_id': current_user.id,
-        'typing': is_typing
-    }, to=room, include_self=False)
+    # Coalesced into one `typing_users` list per room (see app/utils/typing_indicators.py)
+    typing_aggregator().update(room, user.user_id, user.username, bool(is_typing))
 
 @socketio.on('get_chat_history')
+@track_event_metrics('get_chat_history')
+@track_event_queries('get_chat_history', budget=3)
 def handle_get_chat_history(data):
-    """Send recent chat history to newly connected user"""
-    if not current_user.is_authenticated:
+    """Send a page of chat history: the newest, or the one before `before_id` when scrolling back"""
+    user = socket_user()
+    if user is None:
         return
     
     room = data.get('room')
@@ -189,45 +201,99 @@ def handle_get_chat_history(data):
     
     try:
         room_id = int(room)
-        if current_user.class_group_id != room_id:
+        if user.class_group_id != room_id:
             return
     except (ValueError, TypeError):
         return
     
+    before_id = data.get('before_id')
     try:
-        # Get the class chat post
-        chat_post = ForumPost.query.filter_by(
-            class_group_id=room,
-            title='Class Chat'
-        ).first()
-        
-        if not chat_post:
-            emit('chat_history', {'messages': []})
+        before_id = int(before_id) if before_id is not None else None
+    except (ValueError, TypeError):
+        emit('error', {'message': 'Invalid history cursor'})
+        return
+    limit = page_size(data.get('limit'), default=HISTORY_PAGE_SIZE, maximum=HISTORY_PAGE_SIZE)
+    
+    try:
+        # The newest page creates the room's channel, so even an empty room
+        # warms its ring buffer and starts the cross-worker relay
+        channel_id = channel_id_for(room_id, create=before_id is None)
+        if channel_id is None:
+            emit('chat_history', {'messages': [], 'has_more': False, 'before_id': before_id})
             return
         
-        # Get recent messages (last 50)
-        recent_messages = ForumReply.query.filter_by(
-            post_id=chat_post.id
-        ).order_by(ForumReply.timestamp.desc()).limit(50).all()
-        
-        # Reverse to show oldest first
-        recent_messages.reverse()
+        messages, has_more = chat_history(channel_id, before_id, limit)
+        emit('chat_history', {'messages': messages, 'has_more': has_more, 'before_id': before_id})
         
-        # Format messages
-        messages = []
-        for msg in recent_messages:
-            messages.append({
-                'id': msg.id,
-                'msg': msg.content,
-                'user': msg.author.username,
-                'user_initials': msg.author.avatar_initials,
-                'user_id': msg.user_id,
-                'timestamp': msg.timestamp.strftime('%H:%M'),
-                'full_timestamp': msg.timestamp.strftime('%B %d, %Y at %H:%M')
-            })
-        
-        emit('chat_history', {'messages': messages})
-        
-    except Exception as e:
-        print(f'Error getting chat history: {e}')
-        emit('chat_history', {'messages': []})
\ No newline at end of file
+    except Exception:
+        logger.exception('Loading chat history failed', extra={'event': 'chat.history_failed', 'room': room})
+        emit('chat_history', {'messages': []})
+
+@socketio.on('get_chat_context')
+@track_event_metrics('get_chat_context')
+@track_event_queries('get_chat_context', budget=3)
+def handle_get_chat_context(data):
+    """Send the page of history around one message, for jumping to a search hit"""
+    user = socket_user()
+    if user is None:
+        return
+    
+    room = data.get('room')
+    try:
+        room_id = int(room)
+        around_id = int(data.get('around_id'))
+        if user.class_group_id != room_id:
+            return
+    except (ValueError, TypeError):
+        emit('error', {'message': 'Invalid room or message'})
+        return
+    limit = page_size(data.get('limit'), default=HISTORY_PAGE_SIZE, maximum=HISTORY_PAGE_SIZE)
+    
+    channel_id = channel_id_for(room_id, create=False)
+    context = chat_context(channel_id, around_id, limit) if channel_id is not None else None
+    if context is None:
+        emit('error', {'message': 'Message not found'})
+        return
+    
+    messages, has_more, has_newer = context
+    emit('chat_context', {'messages': messages, 'around_id': around_id, 'has_more': has_more, 'has_newer': has_newer})
+
+@socketio.on('search_chat')
+@track_event_metrics('search_chat')
+@track_event_queries('search_chat', budget=3)
+def handle_search_chat(data):
+    """Search the room's messages; hits carry ids for get_chat_context"""
+    user = socket_user()
+    if user is None:
+        return
+    
+    room = data.get('room')
+    query = (data.get('q') or '').strip()
+    try:
+        room_id = int(room)
+        if user.class_group_id != room_id:
+            return
+    except (ValueError, TypeError):
+        return
+    
+    channel_id = channel_id_for(room_id, create=False)
+    results = search_chat(channel_id, query, page_size(data.get('limit'), default=20, maximum=MAX_RESULTS)) if channel_id else []
+    emit('chat_search_results', {'q': query, 'results': results})
+
+@socketio.on('get_presence')
+@track_event_metrics('get_presence')
+@track_event_queries('get_presence', budget=1)
+def handle_get_presence(data):
+    """Send who is online in a chat room to the requester"""
+    user = socket_user()
+    if user is None:
+        return
+    
+    room = data.get('room')
+    try:
+        if user.class_group_id != int(room):
+            return
+    except (ValueError, TypeError):
+        return
+    
+    emit('presence', presence().snapshot(room))
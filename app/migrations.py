@@ -0,0 +1,317 @@
+"""
+Schema Migrations for UniPortal
+Ordered, idempotent changes for databases created before a model change.
+Replaces the one-off add_*_column.py scripts - run `python migrate.py`
+after pulling instead.
+
+New tables are created by db.create_all(); a migration is only needed when
+an existing table gains a column or an index. Register it at the bottom of
+this file with the next version number and never edit one that has shipped.
+"""
+
+from datetime import datetime
+from sqlalchemy import inspect, text
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a migration function taking an open connection"""
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        return func
+    return register
+
+
+def _columns(conn, table):
+    return {column['name'] for column in inspect(conn).get_columns(table)}
+
+
+def _add_column(conn, table, column, ddl_type):
+    """Add a column unless an older script already did"""
+    if column in _columns(conn, table):
+        return False
+    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl_type}'))
+    return True
+
+
+def _create_indexes(conn, *names):
+    """Create model-declared indexes by name, skipping ones that exist"""
+    from app import db
+
+    declared = {
+        index.name: index
+        for table in db.metadata.tables.values()
+        for index in table.indexes
+    }
+    for name in names:
+        declared[name].create(bind=conn, checkfirst=True)
+
+
+def _chat_message_sequence(conn):
+    """PostgreSQL sequence behind chat_messages.id, if it has one"""
+    if conn.dialect.name != 'postgresql':
+        return None
+    return conn.execute(text("SELECT pg_get_serial_sequence('chat_messages', 'id')")).scalar()
+
+
+def _chat_message_id_floor(conn):
+    """Highest chat message id stored or already handed out"""
+    floor = conn.execute(text('SELECT COALESCE(MAX(id), 0) FROM chat_messages')).scalar()
+    reserved = conn.execute(text("SELECT next_id - 1 FROM id_sequences WHERE name = 'chat_messages'")).scalar()
+    floor = max(floor, reserved or 0)
+    sequence = _chat_message_sequence(conn)
+    if sequence:
+        last_value, is_called = conn.execute(text(f'SELECT last_value, is_called FROM {sequence}')).one()
+        floor = max(floor, last_value if is_called else last_value - 1)
+    return floor
+
+
+def _seed_chat_message_ids(conn):
+    """Start the chat id sources (see app/utils/chat.py) after every id in use"""
+    params = {'next_id': _chat_message_id_floor(conn) + 1}
+    updated = conn.execute(text(
+        "UPDATE id_sequences SET next_id = :next_id WHERE name = 'chat_messages'"
+    ), params).rowcount
+    if not updated:
+        conn.execute(text("INSERT INTO id_sequences (name, next_id) VALUES ('chat_messages', :next_id)"), params)
+    sequence = _chat_message_sequence(conn)
+    if sequence:
+        conn.execute(text('SELECT setval(:sequence, :next_id, false)'), {**params, 'sequence': sequence})
+
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        'version VARCHAR(100) PRIMARY KEY, '
+        'applied_at TIMESTAMP NOT NULL)'
+    ))
+
+
+def applied_versions(engine):
+    """Versions already recorded in schema_migrations"""
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        rows = conn.execute(text('SELECT version FROM schema_migrations'))
+        return {row[0] for row in rows}
+
+
+def pending_migrations(engine):
+    """Registered migrations not yet applied, in order"""
+    applied = applied_versions(engine)
+    return [entry for entry in sorted(MIGRATIONS) if entry[0] not in applied]
+
+
+def upgrade(engine, log=print):
+    """
+    Create missing tables, then apply each pending migration in its own
+    transaction so a failure leaves earlier migrations recorded.
+    """
+    from app import db
+
+    db.metadata.create_all(bind=engine)
+
+    applied = 0
+    for version, description, func in pending_migrations(engine):
+        log(f"➕ {version}: {description}")
+        with engine.begin() as conn:
+            func(conn)
+            conn.execute(
+                text('INSERT INTO schema_migrations (version, applied_at) VALUES (:version, :applied_at)'),
+                {'version': version, 'applied_at': datetime.utcnow()}
+            )
+        applied += 1
+    return applied
+
+
+# ---------------------------------------------------------------------------
+# Migrations
+# ---------------------------------------------------------------------------
+
+@migration('0001', 'Link resources to their class')
+def resources_class_group(conn):
+    if _add_column(conn, 'resources', 'class_group_id', 'INTEGER'):
+        conn.execute(text(
+            'UPDATE resources SET class_group_id = ('
+            'SELECT class_group_id FROM courses WHERE courses.id = resources.course_id'
+            ') WHERE course_id IS NOT NULL'
+        ))
+
+
+@migration('0002', 'Add class join codes')
+def class_groups_join_code(conn):
+    _add_column(conn, 'class_groups', 'join_code', 'VARCHAR(10)')
+
+    taken = {
+        row[0] for row in conn.execute(text(
+            "SELECT join_code FROM class_groups WHERE join_code IS NOT NULL AND join_code != ''"
+        ))
+    }
+    missing = conn.execute(text(
+        "SELECT id, name FROM class_groups WHERE join_code IS NULL OR join_code = ''"
+    )).fetchall()
+
+    for class_group_id, name in missing:
+        base = ''.join(c for c in name if c.isalnum()).upper()[:10] or 'CLASS'
+        join_code, counter = base, 1
+        while join_code in taken:
+            suffix = str(counter)
+            join_code = base[:10 - len(suffix)] + suffix
+            counter += 1
+        taken.add(join_code)
+        conn.execute(
+            text('UPDATE class_groups SET join_code = :join_code WHERE id = :id'),
+            {'join_code': join_code, 'id': class_group_id}
+        )
+
+
+@migration('0003', 'Add password reset columns to users')
+def users_password_reset(conn):
+    _add_column(conn, 'users', 'password_reset_token', 'VARCHAR(100)')
+    _add_column(conn, 'users', 'password_reset_expires', 'TIMESTAMP')
+
+
+@migration('0004', 'Index hot dashboard, grading, forum and attendance filters')
+def hot_path_indexes(conn):
+    _create_indexes(
+        conn,
+        'ix_users_class_group_id',
+        'ix_courses_class_group_id',
+        'ix_courses_lecturer_id',
+        'ix_assignments_course_grade_id',
+        'ix_assignments_user_created',
+        'ix_resources_class_category_approved_created',
+        'ix_resources_course_category_approved',
+        'ix_broadcasts_class_timestamp',
+        'ix_forum_posts_class_timestamp',
+        'ix_forum_replies_post_timestamp',
+        'ix_attendance_sessions_course_active',
+        'ix_attendance_records_session_student',
+    )
+
+
+@migration('0005', 'Add denormalized class and course counters')
+def class_and_course_counters(conn):
+    for column in ('student_count', 'assignment_count', 'pending_grade_count',
+                   'broadcast_count', 'forum_reply_count'):
+        _add_column(conn, 'class_groups', column, 'INTEGER NOT NULL DEFAULT 0')
+    for column in ('assignment_count', 'pending_grade_count'):
+        _add_column(conn, 'courses', column, 'INTEGER NOT NULL DEFAULT 0')
+
+    # Backfill; the reconcile_counters task keeps them right from here on
+    conn.execute(text(
+        "UPDATE class_groups SET "
+        "student_count = (SELECT COUNT(*) FROM users "
+        "  WHERE users.class_group_id = class_groups.id AND users.role = 'Student'), "
+        "assignment_count = (SELECT COUNT(*) FROM assignments JOIN users ON assignments.user_id = users.id "
+        "  WHERE users.class_group_id = class_groups.id), "
+        "pending_grade_count = (SELECT COUNT(*) FROM assignments JOIN users ON assignments.user_id = users.id "
+        "  WHERE users.class_group_id = class_groups.id AND assignments.grade IS NULL), "
+        "broadcast_count = (SELECT COUNT(*) FROM broadcasts WHERE broadcasts.class_group_id = class_groups.id), "
+        "forum_reply_count = (SELECT COUNT(*) FROM forum_replies JOIN forum_posts ON forum_replies.post_id = forum_posts.id "
+        "  WHERE forum_posts.class_group_id = class_groups.id)"
+    ))
+    conn.execute(text(
+        "UPDATE courses SET "
+        "assignment_count = (SELECT COUNT(*) FROM assignments WHERE assignments.course_id = courses.id), "
+        "pending_grade_count = (SELECT COUNT(*) FROM assignments "
+        "  WHERE assignments.course_id = courses.id AND assignments.grade IS NULL)"
+    ))
+
+
+@migration('0006', 'Record file sizes for storage accounting')
+def file_sizes(conn):
+    _add_column(conn, 'assignments', 'file_size_bytes', 'INTEGER')
+    _add_column(conn, 'resources', 'file_size_bytes', 'INTEGER')
+    # Sizes and storage_used_mb are measured from disk by the reconcile_storage task
+    conn.execute(text('UPDATE class_groups SET storage_used_mb = 0 WHERE storage_used_mb IS NULL'))
+
+
+@migration('0007', 'Index keyset-paginated submission and payment lists')
+def keyset_pagination_indexes(conn):
+    _create_indexes(conn, 'ix_assignments_created_id', 'ix_payments_class_created')
+
+
+@migration('0008', 'Full-text search documents for forum, resources and submissions')
+def search_documents(conn):
+    from app.utils.search import create_text_index
+
+    # The table itself comes from create_all(); its text index is per dialect
+    create_text_index(conn)
+
+    sources = {
+        'post': "SELECT id, CAST(NULL AS INTEGER), class_group_id, user_id, title, content, timestamp FROM forum_posts",
+        'reply': "SELECT r.id, r.post_id, p.class_group_id, r.user_id, CAST(NULL AS VARCHAR(255)), r.content, r.timestamp "
+                 "FROM forum_replies r JOIN forum_posts p ON p.id = r.post_id",
+        'resource': "SELECT id, CAST(NULL AS INTEGER), class_group_id, uploader_id, title, description, created_at "
+                    "FROM resources WHERE is_approved = :approved",
+        'assignment': "SELECT a.id, CAST(NULL AS INTEGER), u.class_group_id, a.user_id, a.filename, CAST(NULL AS TEXT), a.created_at "
+                      "FROM assignments a JOIN users u ON u.id = a.user_id",
+    }
+    for kind, select in sources.items():
+        # File text is extracted afterwards by the rebuild_search_file_text task;
+        # typed NULLs keep Postgres from inferring text for integer columns
+        conn.execute(text(
+            "INSERT INTO search_documents "
+            "(source_id, parent_id, class_group_id, owner_id, title, body, created_at, kind) "
+            f"SELECT source.*, :kind FROM ({select}) AS source "
+            "WHERE NOT EXISTS (SELECT 1 FROM search_documents d "
+            "WHERE d.kind = :kind AND d.source_id = source.id)"
+        ), {'kind': kind, 'approved': True})
+
+
+@migration('0009', 'Move class chat out of the forum into chat_messages')
+def chat_messages(conn):
+    # Chat used to be stored as replies to one "Class Chat" post per class
+    chat_posts = conn.execute(text(
+        "SELECT id, class_group_id FROM forum_posts "
+        "WHERE title = 'Class Chat' AND content = 'Real-time class discussion'"
+    )).fetchall()
+
+    for post_id, class_group_id in chat_posts:
+        find_channel = text('SELECT id FROM chat_channels WHERE class_group_id = :class_group_id')
+        params = {'class_group_id': class_group_id, 'post_id': post_id}
+        channel_id = conn.execute(find_channel, params).scalar()
+        if channel_id is None:
+            conn.execute(text(
+                'INSERT INTO chat_channels (class_group_id, created_at) VALUES (:class_group_id, :created_at)'
+            ), {**params, 'created_at': datetime.utcnow()})
+            channel_id = conn.execute(find_channel, params).scalar()
+
+        # Explicit ids after every id in use: the column may have no database default
+        moved = conn.execute(text(
+            "INSERT INTO chat_messages (id, channel_id, user_id, content, timestamp) "
+            "SELECT :start + ROW_NUMBER() OVER (ORDER BY id), :channel_id, user_id, content, timestamp "
+            "FROM forum_replies WHERE post_id = :post_id"
+        ), {**params, 'channel_id': channel_id, 'start': _chat_message_id_floor(conn)}).rowcount
+
+        conn.execute(text(
+            "DELETE FROM search_documents WHERE (kind = 'reply' AND parent_id = :post_id) "
+            "OR (kind = 'post' AND source_id = :post_id)"
+        ), params)
+        conn.execute(text('DELETE FROM forum_replies WHERE post_id = :post_id'), params)
+        conn.execute(text('DELETE FROM forum_posts WHERE id = :post_id'), params)
+        conn.execute(text(
+            "UPDATE class_groups SET forum_reply_count = "
+            "CASE WHEN forum_reply_count > :moved THEN forum_reply_count - :moved ELSE 0 END "
+            "WHERE id = :class_group_id"
+        ), {**params, 'moved': moved})
+
+    _seed_chat_message_ids(conn)
+
+
+@migration('0010', 'Full-text index over chat messages')
+def chat_message_search(conn):
+    from app.utils.search import create_chat_text_index
+
+    # Builds the index from the messages already stored
+    create_chat_text_index(conn)
+
+
+@migration('0011', 'Draw chat message ids from one shared sequence')
+def chat_message_id_sequence(conn):
+    if conn.dialect.name == 'postgresql' and not _chat_message_sequence(conn):
+        # Tables created while the id had only a Python-side default are not SERIAL
+        conn.execute(text('CREATE SEQUENCE chat_messages_id_seq OWNED BY chat_messages.id'))
+        conn.execute(text("ALTER TABLE chat_messages ALTER COLUMN id SET DEFAULT nextval('chat_messages_id_seq')"))
+    _seed_chat_message_ids(conn)
@@ -3,6 +3,7 @@ from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
+from sqlalchemy import event
 
 class University(db.Model):
     __tablename__ = 'universities'
@@ -40,10 +41,27 @@ class ClassGroup(db.Model):
     max_file_size_mb = db.Column(db.Integer, default=0)  # No uploads for free tier
     subscription_expiry = db.Column(db.DateTime, nullable=True)
     
+    # Denormalized counters (maintained by write paths, see app/utils/counters.py)
+    student_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    assignment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    pending_grade_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    broadcast_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    forum_reply_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     users = db.relationship('User', backref='class_group', lazy=True, foreign_keys='User.class_group_id')
     lecturer = db.relationship('User', foreign_keys=[lecturer_id], backref='teaching_class')
     creator = db.relationship('User', foreign_keys=[created_by], backref='created_classes')
     
+    # Upload limits of each plan: (largest file in MB, total storage in GB)
+    PLAN_LIMITS = {
+        'free': (2, 0.1),
+        'gold': (15, 8.0),
+        'platinum': (50, 30.0),
+    }
+    # Premium granted through premium_expiry alone (trials, verify_payment and
+    # the Paystack webhook) never sets a plan; it uploads on these limits
+    PREMIUM_EXPIRY_PLAN = 'gold'
+    
     @property
     def is_active_premium(self):
         """Check if premium subscription is active"""
@@ -89,15 +107,8 @@ class ClassGroup(db.Model):
         self.subscription_expiry = datetime.utcnow() + relativedelta(months=4 * duration_semesters)
         
         # Set tier-specific limits
-        if plan_name == 'gold':
-            self.storage_limit_gb = 8.0
-            self.max_file_size_mb = 15
-        elif plan_name == 'platinum':
-            self.storage_limit_gb = 30.0
-            self.max_file_size_mb = 50
-        elif plan_name == 'free':
-            self.storage_limit_gb = 0.1  # 100MB
-            self.max_file_size_mb = 2
+        if plan_name in self.PLAN_LIMITS:
+            self.max_file_size_mb, self.storage_limit_gb = self.PLAN_LIMITS[plan_name]
         
         # Update subscription plan
         self.subscription_plan = plan_name
@@ -118,20 +129,40 @@ class ClassGroup(db.Model):
         
         return total_price
     
+    def upload_limits(self):
+        """(largest file, total storage) in MB the class may use now; None when it may not upload"""
+        now = datetime.utcnow()
+        plan_active = self.subscription_expiry is not None and self.subscription_expiry >= now
+        if self.subscription_plan == 'free' or plan_active:
+            max_file_size_mb = self.max_file_size_mb or 0
+            storage_limit_mb = (self.storage_limit_gb or 0) * 1024
+        else:
+            # A paid plan that lapsed
+            max_file_size_mb, storage_limit_mb = 0, 0
+        
+        if self.is_active_premium:
+            # Entitled through premium_expiry: never below the plan it stands for
+            premium_file_mb, premium_storage_gb = self.PLAN_LIMITS[self.PREMIUM_EXPIRY_PLAN]
+            max_file_size_mb = max(max_file_size_mb, premium_file_mb)
+            storage_limit_mb = max(storage_limit_mb, premium_storage_gb * 1024)
+        
+        if not max_file_size_mb:
+            return None
+        return max_file_size_mb, storage_limit_mb
+    
     def check_upload_permission(self, file_size_mb):
         """Check if file upload is allowed based on subscription limits"""
-        # Check 1: File size limit
-        if file_size_mb > self.max_file_size_mb:
+        limits = self.upload_limits()
+        if limits is None:
             return False
+        max_file_size_mb, storage_limit_mb = limits
         
-        # Check 2: Subscription expiry (allow if free plan OR subscription is active)
-        if self.subscription_plan != 'free':
-            if not self.subscription_expiry or self.subscription_expiry < datetime.utcnow():
-                return False
+        # Check 1: File size limit
+        if file_size_mb > max_file_size_mb:
+            return False
         
-        # Check 3: Storage space limit
-        storage_limit_mb = self.storage_limit_gb * 1024
-        if (self.storage_used_mb + file_size_mb) > storage_limit_mb:
+        # Check 2: Storage space limit
+        if ((self.storage_used_mb or 0) + file_size_mb) > storage_limit_mb:
             return False
         
         return True
@@ -141,6 +172,9 @@ class ClassGroup(db.Model):
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_class_group_id', 'class_group_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), nullable=False, unique=True)
@@ -163,15 +197,26 @@ class User(UserMixin, db.Model):
     @property
     def avatar_initials(self):
         """Generate initials for avatar from full_name or username"""
-        if self.full_name and self.full_name.strip():
+        return User.initials_for(self.full_name, self.username)
+    
+    @staticmethod
+    def initials_for(full_name, username):
+        """Avatar initials, shared with the read models in app/utils/read_models.py"""
+        if full_name and full_name.strip():
             # Get first letter of each word
-            words = self.full_name.strip().split()
+            words = full_name.strip().split()
             if len(words) >= 2:
                 return (words[0][0] + words[-1][0]).upper()
             elif len(words) == 1:
                 return words[0][:2].upper()
         # Fallback to username
-        return self.username[:2].upper()
+        return username[:2].upper()
+    
+    @property
+    def class_snapshot(self):
+        """Cached summary of the user's class (name, codes, plan) without loading the row"""
+        from app.utils.user_cache import get_class_snapshot
+        return get_class_snapshot(self.class_group_id)
     
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -207,6 +252,10 @@ class User(UserMixin, db.Model):
 
 class Course(db.Model):
     __tablename__ = 'courses'
+    __table_args__ = (
+        db.Index('ix_courses_class_group_id', 'class_group_id'),
+        db.Index('ix_courses_lecturer_id', 'lecturer_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
@@ -215,6 +264,10 @@ class Course(db.Model):
     class_group_id = db.Column(db.Integer, db.ForeignKey('class_groups.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Denormalized counters (maintained by write paths, see app/utils/counters.py)
+    assignment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    pending_grade_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     class_group = db.relationship('ClassGroup', backref='courses', lazy=True)
     lecturer = db.relationship('User', foreign_keys=[lecturer_id], backref='teaching_courses')
     assignments = db.relationship('Assignment', backref='course', lazy=True)
@@ -225,6 +278,14 @@ class Course(db.Model):
 
 class Assignment(db.Model):
     __tablename__ = 'assignments'
+    __table_args__ = (
+        # Grading queue: ungraded submissions per course in id order
+        db.Index('ix_assignments_course_grade_id', 'course_id', 'grade', 'id'),
+        # Student submission lists, newest first
+        db.Index('ix_assignments_user_created', 'user_id', 'created_at'),
+        # Admin submissions table, keyset-paginated on (created_at, id)
+        db.Index('ix_assignments_created_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
@@ -235,17 +296,26 @@ class Assignment(db.Model):
     similarity_score = db.Column(db.Float, nullable=True)
     matched_assignment_id = db.Column(db.Integer, db.ForeignKey('assignments.id'), nullable=True)
     archive_link = db.Column(db.String(500), nullable=True)
+    file_size_bytes = db.Column(db.Integer, nullable=True)  # Recorded at upload, see app/utils/storage.py
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     matched_assignment = db.relationship('Assignment', remote_side=[id], backref='matched_by', uselist=False)
     
+    search_text = None  # Extracted file text, set before flush to index it (not a column)
+    
     def __repr__(self):
         return f'<Assignment {self.filename}>'
 
 class Resource(db.Model):
     __tablename__ = 'resources'
+    __table_args__ = (
+        # Class slide lists: approved 'Lecture Slides', newest first
+        db.Index('ix_resources_class_category_approved_created',
+                 'class_group_id', 'category', 'is_approved', 'created_at'),
+        db.Index('ix_resources_course_category_approved', 'course_id', 'category', 'is_approved'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -255,12 +325,15 @@ class Resource(db.Model):
     category = db.Column(db.String(100), nullable=True)
     cover_image = db.Column(db.String(500), nullable=True)
     external_link = db.Column(db.String(500), nullable=True)
+    file_size_bytes = db.Column(db.Integer, nullable=True)  # Recorded at upload, see app/utils/storage.py
     is_approved = db.Column(db.Boolean, default=False)
     uploader_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=True)
     class_group_id = db.Column(db.Integer, db.ForeignKey('class_groups.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    search_text = None  # Extracted file text, set before flush to index it (not a column)
+    
     def __repr__(self):
         return f'<Resource {self.title}>'
 
@@ -278,6 +351,9 @@ class ClassWallet(db.Model):
 
 class Broadcast(db.Model):
     __tablename__ = 'broadcasts'
+    __table_args__ = (
+        db.Index('ix_broadcasts_class_timestamp', 'class_group_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     message = db.Column(db.String(500), nullable=False)
@@ -309,6 +385,9 @@ class Slide(db.Model):
 
 class ForumPost(db.Model):
     __tablename__ = 'forum_posts'
+    __table_args__ = (
+        db.Index('ix_forum_posts_class_timestamp', 'class_group_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -326,6 +405,10 @@ class ForumPost(db.Model):
 
 class ForumReply(db.Model):
     __tablename__ = 'forum_replies'
+    __table_args__ = (
+        # Reply threads and chat history in time order
+        db.Index('ix_forum_replies_post_timestamp', 'post_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
@@ -338,6 +421,57 @@ class ForumReply(db.Model):
     def __repr__(self):
         return f'<ForumReply {self.id}>'
 
+class ChatChannel(db.Model):
+    """One real-time chat room; class rooms map to their class group (see app/utils/chat.py)"""
+    __tablename__ = 'chat_channels'
+
+    id = db.Column(db.Integer, primary_key=True)
+    class_group_id = db.Column(db.Integer, db.ForeignKey('class_groups.id'), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ChatChannel {self.class_group_id}>'
+
+def _next_chat_message_id():
+    from app.utils.chat import next_message_id
+    return next_message_id()
+
+class ChatMessage(db.Model):
+    __tablename__ = 'chat_messages'
+    __table_args__ = (
+        # History and scroll-back within one room, in send order
+        db.Index('ix_chat_messages_channel_id', 'channel_id', 'id'),
+    )
+
+    # Ids are taken before the INSERT so a message is broadcast first (see
+    # app/utils/chat.py); ORM inserts draw from the same source. autoincrement
+    # keeps the column SERIAL on PostgreSQL, whose sequence is that source.
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True, default=_next_chat_message_id)
+    channel_id = db.Column(db.Integer, db.ForeignKey('chat_channels.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+
+    author = db.relationship('User', lazy=True)
+
+    def __repr__(self):
+        return f'<ChatMessage {self.id}>'
+
+@event.listens_for(ChatMessage.__table__, 'after_create')
+def create_chat_search_index(target, connection, **kw):
+    from app.utils.search import create_chat_text_index
+    create_chat_text_index(connection)
+
+class IdSequence(db.Model):
+    """Next free id of a table whose ids are handed out in blocks before the INSERT"""
+    __tablename__ = 'id_sequences'
+
+    name = db.Column(db.String(50), primary_key=True)
+    next_id = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<IdSequence {self.name}={self.next_id}>'
+
 class TimetableEvent(db.Model):
     __tablename__ = 'timetable_events'
     
@@ -357,6 +491,9 @@ class TimetableEvent(db.Model):
 
 class AttendanceSession(db.Model):
     __tablename__ = 'attendance_sessions'
+    __table_args__ = (
+        db.Index('ix_attendance_sessions_course_active', 'course_id', 'is_active'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
@@ -375,6 +512,10 @@ class AttendanceSession(db.Model):
 
 class AttendanceRecord(db.Model):
     __tablename__ = 'attendance_records'
+    __table_args__ = (
+        # Session record lists and the "already marked" check
+        db.Index('ix_attendance_records_session_student', 'session_id', 'student_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('attendance_sessions.id'), nullable=False)
@@ -391,6 +532,10 @@ class AttendanceRecord(db.Model):
 
 class Payment(db.Model):
     __tablename__ = 'payments'
+    __table_args__ = (
+        # Payment history per class, keyset-paginated newest first
+        db.Index('ix_payments_class_created', 'class_group_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     class_group_id = db.Column(db.Integer, db.ForeignKey('class_groups.id'), nullable=False)
@@ -423,3 +568,30 @@ class PushSubscription(db.Model):
     
     def __repr__(self):
         return f'<PushSubscription {self.id} for User {self.user_id}>'
+
+class SearchDocument(db.Model):
+    """Searchable text of a forum post, reply, resource or submission (see app/utils/search.py)"""
+    __tablename__ = 'search_documents'
+    __table_args__ = (
+        db.Index('ix_search_documents_kind_source', 'kind', 'source_id', unique=True),
+        db.Index('ix_search_documents_class', 'class_group_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # post, reply, resource, assignment
+    source_id = db.Column(db.Integer, nullable=False)
+    parent_id = db.Column(db.Integer, nullable=True)  # forum post of a reply
+    class_group_id = db.Column(db.Integer, nullable=True)
+    owner_id = db.Column(db.Integer, nullable=True)
+    title = db.Column(db.String(255), nullable=True)
+    body = db.Column(db.Text, nullable=True)
+    file_text = db.Column(db.Text, nullable=True)  # extracted from the uploaded file
+    created_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<SearchDocument {self.kind} {self.source_id}>'
+
+@event.listens_for(SearchDocument.__table__, 'after_create')
+def create_search_index(target, connection, **kw):
+    from app.utils.search import create_text_index
+    create_text_index(connection)
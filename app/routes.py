@@ -4,6 +4,15 @@ from flask_mail import Message
 from werkzeug.utils import secure_filename
 from functools import wraps
 from app import db, mail
+from app.utils.cache import cache, class_fragment_key, CLASS_FRAGMENTS
+from app.utils.subscription import get_class_entitlement, get_current_entitlement, invalidate_class_entitlement
+from app.utils.user_cache import invalidate_user, invalidate_class_snapshot
+from app.utils.socket_sessions import revoke_user
+from app.utils.query_stats import query_budget
+from app.utils.counters import bump_class_counters, count_assignment, count_grading, class_summary
+from app.utils.storage import uploaded_file_size, saved_file_size, can_store, bump_storage
+from app.utils.pagination import InvalidCursor, request_page, partial_response
+from app.utils.read_models import assignment_rows_query, to_assignment_rows, resource_rows_query, to_resource_rows
 from app.models import User, Assignment, Resource, University, Course, TimetableEvent, AttendanceSession, AttendanceRecord, Payment, PushSubscription
 from datetime import datetime, timedelta
 import os
@@ -13,9 +22,16 @@ import math
 import csv
 from io import StringIO
 import requests
+import logging
+
+logger = logging.getLogger(__name__)
 
 main = Blueprint('main', __name__)
 
+@main.errorhandler(InvalidCursor)
+def invalid_cursor(e):
+    return jsonify({'error': str(e)}), 400
+
 @main.route('/device-info')
 def device_info():
     """Test route to display device detection information"""
@@ -51,12 +67,12 @@ def premium_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         # Check if user has a class
-        if not current_user.class_group:
+        if not current_user.class_group_id:
             flash('🔒 You must join a class to access this feature.', 'warning')
             return redirect(url_for('main.dashboard'))
         
         # Check if class has active premium
-        if not current_user.class_group.is_active_premium:
+        if not get_current_entitlement()['is_premium']:
             flash('🔒 This feature requires an active premium subscription. Please contact your Class Rep to renew.', 'warning')
             return redirect(url_for('main.subscription'))
         
@@ -95,14 +111,27 @@ def extract_text_from_file(file_path):
                 return '\n'.join([para.text for para in doc.paragraphs])
             except:
                 return ''
+        elif file_path.endswith('.pptx'):
+            try:
+                import pptx
+                presentation = pptx.Presentation(file_path)
+                return '\n'.join(
+                    shape.text_frame.text
+                    for slide in presentation.slides
+                    for shape in slide.shapes
+                    if shape.has_text_frame
+                )
+            except:
+                return ''
         else:
             return ''
     except:
         return ''
 
-def check_plagiarism(new_file_path, new_file_hash):
+def check_plagiarism(new_file_path, new_file_hash, new_text=None):
     """
     Check for plagiarism by comparing with existing assignments
+    Pass new_text when the new file's text was already extracted
     Returns: (similarity_score, matched_assignment_id)
     """
     from difflib import SequenceMatcher
@@ -114,7 +143,8 @@ def check_plagiarism(new_file_path, new_file_hash):
         return 0.0, None
     
     # Extract text from new file
-    new_text = extract_text_from_file(new_file_path)
+    if new_text is None:
+        new_text = extract_text_from_file(new_file_path)
     if not new_text:
         return 0.0, None
     
@@ -136,6 +166,115 @@ def check_plagiarism(new_file_path, new_file_hash):
     
     return max_similarity, matched_id
 
+# Per-class dashboard fragments
+# Timetable, courses, slides and the latest broadcast are the same for every
+# member of a class, so they are cached per class as plain dicts and
+# invalidated by the routes that write them.
+
+TIMETABLE_DAY_ORDER = {'Monday': 1, 'Tuesday': 2, 'Wednesday': 3, 'Thursday': 4, 'Friday': 5, 'Saturday': 6, 'Sunday': 7}
+
+def _user_summary(user):
+    return {'id': user.id, 'username': user.username} if user else None
+
+def _slide_summary(resource):
+    return {
+        'id': resource.id,
+        'title': resource.title,
+        'description': resource.description,
+        'category': resource.category,
+        'is_approved': resource.is_approved,
+        'course_id': resource.course_id,
+        'created_at': resource.created_at,
+        'uploader': _user_summary(resource.uploader)
+    }
+
+def get_class_timetable(class_group_id):
+    """Timetable events for a class, sorted by day and start time"""
+    def build():
+        events = TimetableEvent.query.filter_by(class_group_id=class_group_id).all()
+        events = sorted(events, key=lambda e: (TIMETABLE_DAY_ORDER.get(e.day, 8), e.start_time))
+        return [
+            {
+                'id': e.id,
+                'day': e.day,
+                'start_time': e.start_time,
+                'end_time': e.end_time,
+                'course_name': e.course_name,
+                'venue': e.venue
+            }
+            for e in events
+        ]
+    return cache.get_or_set(class_fragment_key(class_group_id, 'timetable'), build)
+
+def get_class_slides(class_group_id):
+    """Approved lecture slides for a class, newest first"""
+    def build():
+        from sqlalchemy.orm import joinedload
+        resources = Resource.query.options(joinedload(Resource.uploader)).filter_by(
+            class_group_id=class_group_id,
+            category='Lecture Slides',
+            is_approved=True
+        ).order_by(Resource.created_at.desc()).all()
+        return [_slide_summary(r) for r in resources]
+    return cache.get_or_set(class_fragment_key(class_group_id, 'slides'), build)
+
+def get_class_courses(class_group_id):
+    """Courses of a class with their lecturer and approved lecture slides"""
+    def build():
+        from sqlalchemy.orm import joinedload
+        courses = Course.query.options(joinedload(Course.lecturer)).filter_by(
+            class_group_id=class_group_id
+        ).order_by(Course.id.asc()).all()
+        
+        slides_by_course = {course.id: [] for course in courses}
+        if slides_by_course:
+            resources = Resource.query.options(joinedload(Resource.uploader)).filter(
+                Resource.course_id.in_(list(slides_by_course)),
+                Resource.category == 'Lecture Slides',
+                Resource.is_approved == True
+            ).order_by(Resource.id.asc()).all()
+            for resource in resources:
+                slides_by_course[resource.course_id].append(_slide_summary(resource))
+        
+        return [
+            {
+                'id': course.id,
+                'name': course.name,
+                'lecturer_code': course.lecturer_code,
+                'lecturer_id': course.lecturer_id,
+                'lecturer': _user_summary(course.lecturer),
+                'class_group_id': course.class_group_id,
+                'resources': slides_by_course[course.id]
+            }
+            for course in courses
+        ]
+    return cache.get_or_set(class_fragment_key(class_group_id, 'courses'), build)
+
+def get_class_latest_broadcast(class_group_id):
+    """Latest broadcast posted to a class, or None"""
+    def build():
+        from app.models import Broadcast
+        from sqlalchemy.orm import joinedload
+        broadcast = Broadcast.query.options(joinedload(Broadcast.user)).filter_by(
+            class_group_id=class_group_id
+        ).order_by(Broadcast.timestamp.desc()).first()
+        if not broadcast:
+            return None
+        return {
+            'id': broadcast.id,
+            'message': broadcast.message,
+            'timestamp': broadcast.timestamp,
+            'user_id': broadcast.user_id,
+            'user': _user_summary(broadcast.user)
+        }
+    return cache.get_or_set(class_fragment_key(class_group_id, 'broadcast'), build)
+
+def invalidate_class_fragments(class_group_id, *fragments):
+    """Drop cached fragments of a class after a write (all of them if none named)"""
+    if not class_group_id:
+        return
+    cache.delete(*[class_fragment_key(class_group_id, f) for f in (fragments or CLASS_FRAGMENTS)])
+
 @main.route('/')
 def index():
     return redirect(url_for('main.login'))
@@ -160,21 +299,37 @@ def payment_history():
         flash('You must create a class first.', 'error')
         return redirect(url_for('main.subscription'))
     
-    # Get all payments for this class
-    payments = Payment.query.filter_by(
-        class_group_id=current_user.class_group_id
-    ).order_by(Payment.created_at.desc()).all()
+    # First page of payments; the rest load on demand from payment_history_page
+    page = request_page(class_payments(current_user.class_group_id), Payment.created_at, Payment.id)
     
-    # Calculate statistics
-    total_spent = sum(p.amount for p in payments if p.status == 'success')
-    successful_payments = len([p for p in payments if p.status == 'success'])
-    failed_payments = len([p for p in payments if p.status == 'failed'])
+    # Statistics across all payments in one aggregate query
+    from sqlalchemy import case, func
+    total_transactions, total_spent, successful_payments, failed_payments = db.session.query(
+        func.count(Payment.id),
+        func.sum(case((Payment.status == 'success', Payment.amount), else_=0)),
+        func.sum(case((Payment.status == 'success', 1), else_=0)),
+        func.sum(case((Payment.status == 'failed', 1), else_=0))
+    ).filter(Payment.class_group_id == current_user.class_group_id).one()
     
     return render_template('payment_history.html',
-                         payments=payments,
-                         total_spent=total_spent,
-                         successful_payments=successful_payments,
-                         failed_payments=failed_payments)
+                         page=page,
+                         total_transactions=total_transactions,
+                         total_spent=total_spent or 0,
+                         successful_payments=successful_payments or 0,
+                         failed_payments=failed_payments or 0)
+
+@main.route('/payment_history/page')
+@login_required
+def payment_history_page():
+    """Next page of payment history rows (HTML partial + cursor)"""
+    if current_user.role != 'Rep' or not current_user.class_group_id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    page = request_page(class_payments(current_user.class_group_id), Payment.created_at, Payment.id)
+    return partial_response('partials/payment_rows.html', page)
+
+def class_payments(class_group_id):
+    return Payment.query.filter_by(class_group_id=class_group_id)
 
 @main.route('/analytics')
 @login_required
@@ -230,21 +385,14 @@ def analytics():
             flash('You must create a class first.', 'error')
             return redirect(url_for('main.rep_dashboard'))
         
-        from app.models import ForumPost, ForumReply
-        
-        # Class statistics
-        class_students = User.query.filter_by(
-            class_group_id=current_user.class_group_id,
-            role='Student'
-        ).count()
+        from app.models import ForumPost
         
-        # Assignment statistics
-        class_assignments = Assignment.query.join(User).filter(
-            User.class_group_id == current_user.class_group_id
-        ).all()
-        total_assignments = len(class_assignments)
-        graded_assignments = len([a for a in class_assignments if a.grade])
-        pending_assignments = total_assignments - graded_assignments
+        # Class, assignment and forum statistics (maintained counters)
+        summary = class_summary(current_user.class_group_id)
+        class_students = summary['student_count']
+        total_assignments = summary['assignment_count']
+        pending_assignments = summary['pending_grade_count']
+        graded_assignments = total_assignments - pending_assignments
         
         # Resource statistics
         class_resources = Resource.query.filter_by(
@@ -257,9 +405,7 @@ def analytics():
             class_group_id=current_user.class_group_id
         ).count()
         
-        forum_replies = ForumReply.query.join(ForumPost).filter(
-            ForumPost.class_group_id == current_user.class_group_id
-        ).count()
+        forum_replies = summary['forum_reply_count']
         
         # Payment statistics
         class_payments = Payment.query.filter_by(
@@ -269,11 +415,9 @@ def analytics():
         total_spent = sum(p.amount for p in class_payments)
         
         # Subscription status
-        subscription_active = current_user.class_group.is_active_premium
-        days_remaining = 0
-        if current_user.class_group.premium_expiry:
-            delta = current_user.class_group.premium_expiry - datetime.utcnow()
-            days_remaining = max(0, delta.days)
+        entitlement = get_current_entitlement()
+        subscription_active = entitlement['is_premium']
+        days_remaining = entitlement['days_remaining']
         
         return render_template('analytics.html',
                              role='Rep',
@@ -293,15 +437,10 @@ def analytics():
         # Get courses taught by this lecturer
         lecturer_courses = Course.query.filter_by(lecturer_id=current_user.id).all()
         
-        # Assignment statistics
-        total_assignments = 0
-        graded_assignments = 0
-        for course in lecturer_courses:
-            course_assignments = Assignment.query.filter_by(course_id=course.id).all()
-            total_assignments += len(course_assignments)
-            graded_assignments += len([a for a in course_assignments if a.grade])
-        
-        pending_assignments = total_assignments - graded_assignments
+        # Assignment statistics (maintained per-course counters)
+        total_assignments = sum(course.assignment_count for course in lecturer_courses)
+        pending_assignments = sum(course.pending_grade_count for course in lecturer_courses)
+        graded_assignments = total_assignments - pending_assignments
         
         # Attendance statistics
         attendance_sessions = AttendanceSession.query.filter_by(
@@ -466,6 +605,8 @@ def payment_callback():
                 
                 # Upgrade subscription using the new model
                 class_group.upgrade_subscription(plan_name, duration_semesters)
+                invalidate_class_entitlement(class_group.id)
+                invalidate_class_snapshot(class_group.id)
                 
                 # Send confirmation email
                 try:
@@ -493,7 +634,8 @@ Best regards,
 UniPortal Team'''
                     mail.send(msg)
                 except Exception as e:
-                    print(f"Email sending failed: {str(e)}")
+                    logger.warning('Payment confirmation email failed: %s', e,
+                                   extra={'event': 'email.failed', 'kind': 'payment_confirmation', 'user_id': current_user.id})
                 
                 expiry_date = class_group.subscription_expiry.strftime("%B %d, %Y") if class_group.subscription_expiry else "N/A"
                 flash(f'✅ Payment successful! {plan_name.title()} subscription activated until {expiry_date}', 'success')
@@ -575,10 +717,14 @@ def payment_webhook():
                 class_group.premium_expiry = new_expiry
             
             db.session.commit()
+            invalidate_class_entitlement(payment.class_group_id)
     
     return jsonify({'status': 'success'}), 200
 
+ATTENDANCE_SESSIONS_PER_PAGE = 20
+
 @main.route('/attendance_dashboard')
+@query_budget(10)
 @login_required
 def attendance_dashboard():
     """Professional attendance dashboard for lecturers and reps"""
@@ -597,21 +743,80 @@ def attendance_dashboard():
         # Get courses taught by this lecturer
         lecturer_courses = Course.query.filter_by(lecturer_id=current_user.id).all()
     
-    # Get attendance data for each course
-    attendance_data = []
-    for course in lecturer_courses:
-        sessions = AttendanceSession.query.filter_by(course_id=course.id).order_by(AttendanceSession.timestamp.desc()).all()
-        
-        for session in sessions:
-            records = AttendanceRecord.query.filter_by(session_id=session.id).all()
-            attendance_data.append({
-                'course': course,
-                'session': session,
-                'records': records,
-                'count': len(records)
-            })
+    course_ids = [course.id for course in lecturer_courses]
+    courses_by_id = {course.id: course for course in lecturer_courses}
+    page = request.args.get('page', 1, type=int)
+    
+    # Sessions with their record counts in one aggregate query, newest first
+    from sqlalchemy import func
+    record_count = func.count(AttendanceRecord.id).label('record_count')
+    sessions_page = db.session.query(AttendanceSession, record_count).outerjoin(
+        AttendanceRecord, AttendanceRecord.session_id == AttendanceSession.id
+    ).filter(
+        AttendanceSession.course_id.in_(course_ids)
+    ).group_by(AttendanceSession.id).order_by(
+        AttendanceSession.timestamp.desc(), AttendanceSession.id.desc()
+    ).paginate(page=page, per_page=ATTENDANCE_SESSIONS_PER_PAGE, error_out=False)
+    
+    attendance_data = [
+        {
+            'course': courses_by_id[session.course_id],
+            'session': session,
+            'count': count
+        }
+        for session, count in sessions_page.items
+    ]
+    
+    # Totals across all pages for the statistics cards
+    total_present = db.session.query(func.count(AttendanceRecord.id)).join(
+        AttendanceSession, AttendanceRecord.session_id == AttendanceSession.id
+    ).filter(AttendanceSession.course_id.in_(course_ids)).scalar() or 0
+    
+    return render_template('attendance_dashboard.html',
+                         attendance_data=attendance_data,
+                         lecturer_courses=lecturer_courses,
+                         pagination=sessions_page,
+                         total_sessions=sessions_page.total,
+                         total_present=total_present)
+
+@main.route('/attendance_session/<int:session_id>/records')
+@query_budget(6)
+@login_required
+def attendance_session_records(session_id):
+    """API endpoint returning the records of one attendance session (loaded when expanded)"""
+    if current_user.role not in ['Admin', 'Lecturer', 'Rep']:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    attendance_session = AttendanceSession.query.get_or_404(session_id)
+    course = attendance_session.course
     
-    return render_template('attendance_dashboard.html', attendance_data=attendance_data, lecturer_courses=lecturer_courses)
+    # Same course scoping as the dashboard itself
+    if current_user.role == 'Rep':
+        if course.class_group_id != current_user.class_group_id:
+            return jsonify({'error': 'Access denied'}), 403
+    elif course.lecturer_id != current_user.id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    from sqlalchemy.orm import joinedload
+    records = AttendanceRecord.query.options(
+        joinedload(AttendanceRecord.student)
+    ).filter_by(session_id=session_id).order_by(AttendanceRecord.timestamp.asc()).all()
+    
+    return jsonify({
+        'session_id': session_id,
+        'records': [
+            {
+                'id': record.id,
+                'student_name': record.student_name or record.student.username,
+                'student_email': record.student.email,
+                'student_initials': record.student.avatar_initials,
+                'index_number': record.index_number or 'N/A',
+                'timestamp': record.timestamp.strftime('%H:%M:%S'),
+                'status': record.status
+            }
+            for record in records
+        ]
+    })
 
 @main.route('/library')
 @login_required
@@ -682,7 +887,7 @@ def library():
                 }
                 api_books.append(book_data)
     except Exception as e:
-        print(f"Error fetching from Google Books API: {str(e)}")
+        logger.warning('Google Books API request failed: %s', e, extra={'event': 'books.api_failed'})
         flash('Could not fetch external books at this time.', 'warning')
     
     return render_template('library.html', 
@@ -691,7 +896,18 @@ def library():
                          search_query=search_query if search_query != 'subject:science' else '',
                          suggestions=suggestions)
 
+GRADING_PREFETCH_COUNT = 3
+
+def grading_queue(user):
+    """Ungraded assignments in the courses this user teaches (all courses for Admins)"""
+    query = Assignment.query.filter(Assignment.grade.is_(None))
+    if user.role != 'Admin':
+        taught_course_ids = db.session.query(Course.id).filter(Course.lecturer_id == user.id)
+        query = query.filter(Assignment.course_id.in_(taught_course_ids))
+    return query
+
 @main.route('/grading_room/<int:assignment_id>')
+@query_budget(10)
 @login_required
 @premium_required
 def grading_room(assignment_id):
@@ -703,18 +919,22 @@ def grading_room(assignment_id):
     # Get the current assignment
     assignment = Assignment.query.get_or_404(assignment_id)
     
-    # Get the next ungraded assignment in the queue
-    next_assignment = Assignment.query.filter(
-        Assignment.id > assignment_id,
-        Assignment.grade == None
-    ).order_by(Assignment.id.asc()).first()
+    # Next few ungraded submissions in this lecturer's queue (prefetched by the page)
+    from sqlalchemy.orm import joinedload
+    upcoming_assignments = grading_queue(current_user).options(
+        joinedload(Assignment.user)
+    ).filter(
+        Assignment.id > assignment_id
+    ).order_by(Assignment.id.asc()).limit(GRADING_PREFETCH_COUNT).all()
+    next_assignment = upcoming_assignments[0] if upcoming_assignments else None
     
-    # Get total ungraded count
-    ungraded_count = Assignment.query.filter(Assignment.grade == None).count()
+    # Get ungraded count for this lecturer's courses
+    ungraded_count = grading_queue(current_user).count()
     
     return render_template('grading_room.html', 
                          assignment=assignment, 
                          next_assignment=next_assignment,
+                         upcoming_assignments=upcoming_assignments,
                          ungraded_count=ungraded_count)
 
 @main.route('/settings', methods=['GET', 'POST'])
@@ -752,6 +972,7 @@ def settings():
                 flash('✅ Password updated successfully!', 'success')
             
             db.session.commit()
+            invalidate_user(current_user.id)
             flash('✅ Settings updated successfully!', 'success')
             return redirect(url_for('main.settings'))
         
@@ -765,8 +986,12 @@ def settings():
                 flash('You are not in any class.', 'info')
                 return redirect(url_for('main.settings'))
             
+            if current_user.role == 'Student':
+                bump_class_counters(current_user.class_group_id, student_count=-1)
             current_user.class_group_id = None
             db.session.commit()
+            invalidate_user(current_user.id)
+            revoke_user(current_user.id)
             flash('✅ You have left the class.', 'success')
             return redirect(url_for('main.settings'))
         
@@ -813,6 +1038,7 @@ def settings():
                 flash(f'✅ New codes generated! Student: {join_code} | Lecturer: {lecturer_code}', 'success')
             
             db.session.commit()
+            invalidate_class_snapshot(class_group.id)
             flash('✅ Class settings updated!', 'success')
             return redirect(url_for('main.settings'))
         
@@ -871,6 +1097,8 @@ def profile():
         current_user.email = email
         
         db.session.commit()
+        invalidate_user(current_user.id)
+        revoke_user(current_user.id)
         
         flash('✅ Profile updated successfully!', 'success')
         return redirect(url_for('main.profile'))
@@ -1022,6 +1250,8 @@ def register():
         )
         new_user.set_password(password)
         db.session.add(new_user)
+        if actual_role == 'Student':
+            bump_class_counters(class_group_id, student_count=1)
         db.session.commit()
         
         # If lecturer used a course code, assign them to that course
@@ -1031,6 +1261,7 @@ def register():
             if course:
                 course.lecturer_id = new_user.id
                 db.session.commit()
+                invalidate_class_fragments(course.class_group_id, 'courses')
                 flash(f'✅ You have been assigned to teach {course.name}', 'success')
         
         # Send verification email
@@ -1043,7 +1274,7 @@ def register():
             flash(f'✅ A verification code has been sent to {email}', 'success')
         except Exception as e:
             # If email fails, log the error but don't show code
-            print(f"Email sending failed: {str(e)}")
+            logger.warning('Verification email failed: %s', e, extra={'event': 'email.failed', 'kind': 'verification'})
             flash(f'⚠️ Email service temporarily unavailable. Please contact support.', 'error')
         
         # Store user ID in session for verification
@@ -1080,6 +1311,7 @@ def verify():
             user.is_verified = True
             user.verification_code = None  # Clear the code
             db.session.commit()
+            invalidate_user(user.id)
             
             # Clear session
             session.pop('unverified_user_id', None)
@@ -1124,7 +1356,8 @@ def resend_verification():
         mail.send(msg)
         flash(f'✅ New verification code sent to {user.email}', 'success')
     except Exception as e:
-        print(f"Email sending failed: {str(e)}")
+        logger.warning('Verification email failed: %s', e,
+                       extra={'event': 'email.failed', 'kind': 'verification_resend', 'user_id': user.id})
         flash(f'⚠️ Could not send email. Please try again later.', 'error')
     
     return redirect(url_for('main.verify'))
@@ -1155,76 +1388,49 @@ def dashboard():
         return redirect(url_for('main.student_dashboard'))
 
 @main.route('/student/dashboard')
+@query_budget(12)
 @login_required
 def student_dashboard():
     if current_user.role not in ['Student', 'Rep']:
         flash('Access denied', 'error')
         return redirect(url_for('main.dashboard'))
     
-    assignments = Assignment.query.filter_by(user_id=current_user.id).order_by(Assignment.created_at.desc()).all()
-    
-    # Get the latest broadcast
-    from app.models import Broadcast
-    broadcast = Broadcast.query.order_by(Broadcast.timestamp.desc()).first()
+    # First page of submissions; "My Grades" loads older ones from student_assignments_page
+    page = request_page(Assignment.query.filter_by(user_id=current_user.id), Assignment.created_at, Assignment.id)
     
-    # Get available courses for the student's class (with their resources)
+    # Class-wide fragments (cached per class)
+    broadcast = None
     courses = []
-    if current_user.class_group_id:
-        courses = Course.query.filter_by(class_group_id=current_user.class_group_id).all()
-    
-    # Get slides (Resources with category 'Lecture Slides') for student's class
-    # Keep this for backward compatibility with other parts of the dashboard
     slides = []
+    timetable_events = []
     if current_user.class_group_id:
-        slides = Resource.query.filter_by(
-            class_group_id=current_user.class_group_id,
-            category='Lecture Slides',
-            is_approved=True
-        ).order_by(Resource.created_at.desc()).all()
+        broadcast = get_class_latest_broadcast(current_user.class_group_id)
+        courses = get_class_courses(current_user.class_group_id)
+        slides = get_class_slides(current_user.class_group_id)
+        timetable_events = get_class_timetable(current_user.class_group_id)
+    else:
+        # No class yet - fall back to the latest global broadcast
+        from app.models import Broadcast
+        broadcast = Broadcast.query.order_by(Broadcast.timestamp.desc()).first()
     
-    # Calculate current average score for GPA Forecaster
+    # Calculate current average score for GPA Forecaster (over every graded submission, not just this page)
     current_average = 0.0
-    graded_assignments = [a for a in assignments if a.grade and a.grade.replace('.', '').replace('%', '').isdigit()]
+    grades = [grade for grade, in db.session.query(Assignment.grade).filter(
+        Assignment.user_id == current_user.id, Assignment.grade.isnot(None)
+    )]
+    graded_assignments = [grade for grade in grades if grade.replace('.', '').replace('%', '').isdigit()]
     if graded_assignments:
-        total_score = sum(float(a.grade.replace('%', '')) for a in graded_assignments)
+        total_score = sum(float(grade.replace('%', '')) for grade in graded_assignments)
         current_average = round(total_score / len(graded_assignments), 2)
     
-    # Get timetable events for the student's class
-    timetable_events = []
-    if current_user.class_group_id:
-        # Define day order for sorting
-        day_order = {'Monday': 1, 'Tuesday': 2, 'Wednesday': 3, 'Thursday': 4, 'Friday': 5, 'Saturday': 6, 'Sunday': 7}
-        events = TimetableEvent.query.filter_by(class_group_id=current_user.class_group_id).all()
-        # Sort by day and then by start_time
-        timetable_events = sorted(events, key=lambda e: (day_order.get(e.day, 8), e.start_time))
-    
-    # Calculate subscription status for banner (same logic as rep dashboard)
-    is_premium = False
-    days_remaining = 0
-    
-    if current_user.class_group:
-        # Check subscription_expiry first (new field)
-        if current_user.class_group.subscription_expiry:
-            delta = current_user.class_group.subscription_expiry - datetime.utcnow()
-            days_remaining = max(0, delta.days)
-            is_premium = days_remaining > 0
-        
-        # Check old premium_expiry for backward compatibility
-        elif current_user.class_group.premium_expiry:
-            delta = current_user.class_group.premium_expiry - datetime.utcnow()
-            days_remaining = max(0, delta.days)
-            is_premium = days_remaining > 0
-        
-        # If no expiry dates are set, treat as free plan (no banner)
-        else:
-            # Check if subscription_plan is set to something other than 'free'
-            if hasattr(current_user.class_group, 'subscription_plan') and current_user.class_group.subscription_plan != 'free':
-                is_premium = True  # Active subscription without expiry
-            else:
-                is_premium = True  # Don't show expired banner for free users
+    # Subscription status for banner
+    entitlement = get_current_entitlement()
+    is_premium = entitlement['plan_active']
+    days_remaining = entitlement['plan_days_remaining']
     
     return render_template('student_dashboard.html', 
-                         assignments=assignments, 
+                         page=page,
+                         assignments=page.items, 
                          broadcast=broadcast, 
                          slides=slides, 
                          courses=courses,
@@ -1233,6 +1439,16 @@ def student_dashboard():
                          is_premium=is_premium,
                          days_remaining=days_remaining)
 
+@main.route('/student/assignments/page')
+@login_required
+def student_assignments_page():
+    """Next page of the student's own submissions (HTML partial + cursor)"""
+    if current_user.role not in ['Student', 'Rep']:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    page = request_page(Assignment.query.filter_by(user_id=current_user.id), Assignment.created_at, Assignment.id)
+    return partial_response('partials/student_assignment_rows.html', page)
+
 @main.route('/lecturer/dashboard')
 @login_required
 def lecturer_dashboard():
@@ -1252,23 +1468,23 @@ def lecturer_dashboard():
     course = lecturer_courses[0]
     class_group = course.class_group
     
-    # Get assignments for this course only
-    assignments = Assignment.query.join(User).filter(
+    # Get assignments for this course only (read-only rows, see app/utils/read_models.py)
+    assignments = to_assignment_rows(assignment_rows_query().filter(
         User.class_group_id == class_group.id,
         Assignment.course_id == course.id
-    ).order_by(Assignment.created_at.desc()).all()
+    ).order_by(Assignment.created_at.desc()))
     
     # Get resources for this course only
-    resources = Resource.query.filter_by(
-        class_group_id=class_group.id,
-        course_id=course.id
-    ).order_by(Resource.created_at.desc()).all()
+    resources = to_resource_rows(resource_rows_query().filter(
+        Resource.class_group_id == class_group.id,
+        Resource.course_id == course.id
+    ).order_by(Resource.created_at.desc()))
     
-    # Get students in this class
-    students = User.query.filter_by(
+    # Get students in this class (ids are all the analytics need)
+    students = [student_id for student_id, in db.session.query(User.id).filter_by(
         class_group_id=class_group.id,
         role='Student'
-    ).all()
+    )]
     
     # Calculate course-specific stats
     total_assignments = len(assignments)
@@ -1278,24 +1494,10 @@ def lecturer_dashboard():
     # Get attendance sessions for this course
     attendance_sessions = AttendanceSession.query.filter_by(course_id=course.id).all()
     
-    # Calculate subscription status
-    is_premium = False
-    days_remaining = 0
-    
-    if class_group:
-        if class_group.subscription_expiry:
-            delta = class_group.subscription_expiry - datetime.utcnow()
-            days_remaining = max(0, delta.days)
-            is_premium = days_remaining > 0
-        elif class_group.premium_expiry:
-            delta = class_group.premium_expiry - datetime.utcnow()
-            days_remaining = max(0, delta.days)
-            is_premium = days_remaining > 0
-        else:
-            if hasattr(class_group, 'subscription_plan') and class_group.subscription_plan != 'free':
-                is_premium = True
-            else:
-                is_premium = True
+    # Subscription status
+    entitlement = get_class_entitlement(course.class_group_id)
+    is_premium = entitlement['plan_active']
+    days_remaining = entitlement['plan_days_remaining']
     
     # Calculate analytics data
     analytics = {
@@ -1364,78 +1566,45 @@ def rep_dashboard():
         db.session.add(wallet)
         db.session.commit()
     
-    # Get latest broadcast
     from app.models import Broadcast
-    broadcast = Broadcast.query.order_by(Broadcast.timestamp.desc()).first()
     
-    # Get all broadcasts for this rep's class
-    my_broadcasts = []
-    if current_user.class_group_id:
-        my_broadcasts = Broadcast.query.filter_by(class_group_id=current_user.class_group_id).order_by(Broadcast.timestamp.desc()).all()
-    
-    # Get courses for the rep's class (with their resources)
+    # Class-wide fragments (cached per class)
+    broadcast = None
     courses = []
+    slides = []
+    timetable_events = []
     if current_user.class_group_id:
-        courses = Course.query.filter_by(class_group_id=current_user.class_group_id).all()
+        broadcast = get_class_latest_broadcast(current_user.class_group_id)
+        courses = get_class_courses(current_user.class_group_id)
+        slides = get_class_slides(current_user.class_group_id)
+        timetable_events = get_class_timetable(current_user.class_group_id)
+    else:
+        broadcast = Broadcast.query.order_by(Broadcast.timestamp.desc()).first()
     
-    # Get slides (Resources with category 'Lecture Slides') for rep's class
-    # Keep this for backward compatibility with other parts of the dashboard
-    slides = []
+    # Get all broadcasts for this rep's class
+    my_broadcasts = []
     if current_user.class_group_id:
-        slides = Resource.query.filter_by(
-            class_group_id=current_user.class_group_id,
-            category='Lecture Slides',
-            is_approved=True
-        ).order_by(Resource.created_at.desc()).all()
+        my_broadcasts = Broadcast.query.filter_by(class_group_id=current_user.class_group_id).order_by(Broadcast.timestamp.desc()).all()
     
     # Calculate stats for dashboard
-    from app.models import User
-    total_students = User.query.filter_by(role='Student').count()
     files_uploaded = len(all_assignments)
-    broadcasts_count = Broadcast.query.count()
+    if current_user.class_group_id:
+        summary = class_summary(current_user.class_group_id)
+        total_students = summary['student_count']
+        broadcasts_count = summary['broadcast_count']
+    else:
+        from app.models import User
+        total_students = User.query.filter_by(role='Student').count()
+        broadcasts_count = Broadcast.query.count()
     
     # Get classes created by this rep
     from app.models import ClassGroup
     my_classes = ClassGroup.query.filter_by(created_by=current_user.id).all()
     
-    # Get available courses for the rep's class (for upload dropdown)
-    courses = []
-    if current_user.class_group_id:
-        class_group = ClassGroup.query.get(current_user.class_group_id)
-        if class_group:
-            courses = class_group.courses
-    
-    # Get timetable events for the rep's class
-    timetable_events = []
-    if current_user.class_group_id:
-        # Define day order for sorting
-        day_order = {'Monday': 1, 'Tuesday': 2, 'Wednesday': 3, 'Thursday': 4, 'Friday': 5, 'Saturday': 6, 'Sunday': 7}
-        events = TimetableEvent.query.filter_by(class_group_id=current_user.class_group_id).all()
-        # Sort by day and then by start_time
-        timetable_events = sorted(events, key=lambda e: (day_order.get(e.day, 8), e.start_time))
-    
-    # Calculate subscription status for banner
-    is_premium = False
-    days_remaining = 0
-    
-    if current_user.class_group:
-        # Check new subscription model first
-        if current_user.class_group.subscription_expiry:
-            delta = current_user.class_group.subscription_expiry - datetime.utcnow()
-            days_remaining = max(0, delta.days)
-            is_premium = days_remaining > 0
-        # Check old premium_expiry for backward compatibility
-        elif current_user.class_group.premium_expiry:
-            delta = current_user.class_group.premium_expiry - datetime.utcnow()
-            days_remaining = max(0, delta.days)
-            is_premium = days_remaining > 0
-        # If no expiry dates are set, treat as free plan (no banner)
-        else:
-            # Check if subscription_plan is set to something other than 'free'
-            if hasattr(current_user.class_group, 'subscription_plan') and current_user.class_group.subscription_plan != 'free':
-                is_premium = True  # Active subscription without expiry
-            else:
-                is_premium = True  # Don't show expired banner for free users
+    # Subscription status for banner
+    entitlement = get_current_entitlement()
+    is_premium = entitlement['plan_active']
+    days_remaining = entitlement['plan_days_remaining']
     
     return render_template('rep_dashboard.html', 
                          my_assignments=my_assignments, 
@@ -1517,6 +1686,8 @@ def create_class():
     # FIX: Add Rep to the class they just created (Ghost Rep bug fix)
     current_user.class_group_id = new_class.id
     db.session.commit()
+    invalidate_user(current_user.id)
+    revoke_user(current_user.id)
     
     flash(f'✅ Class created! Student Code: {join_code}', 'success')
     return redirect(url_for('main.rep_dashboard'))
@@ -1557,6 +1728,7 @@ def create_course():
     )
     db.session.add(new_course)
     db.session.commit()
+    invalidate_class_fragments(class_group.id, 'courses')
     
     flash(f'✅ Course "{course_name}" created! Lecturer Code: {lecturer_code}', 'success')
     return redirect(url_for('main.rep_dashboard'))
@@ -1589,10 +1761,14 @@ def claim_class():
         if current_user.is_authenticated:
             # Assign current user as lecturer for this course
             if current_user.role != 'Lecturer':
+                if current_user.role == 'Student':
+                    bump_class_counters(current_user.class_group_id, student_count=-1)
                 current_user.role = 'Lecturer'
             course.lecturer_id = current_user.id
             current_user.university_id = course.class_group.university_id
             db.session.commit()
+            invalidate_class_fragments(course.class_group_id, 'courses')
+            invalidate_user(current_user.id)
             flash(f'✅ You are now the lecturer for {course.name}!', 'success')
             return redirect(url_for('main.dashboard'))
         else:
@@ -1628,6 +1804,7 @@ def claim_class():
             # Assign as lecturer for this course
             course.lecturer_id = new_lecturer.id
             db.session.commit()
+            invalidate_class_fragments(course.class_group_id, 'courses')
             
             # Send verification email
             try:
@@ -1639,7 +1816,8 @@ def claim_class():
                 flash(f'✅ Lecturer account created for {course.name}! A verification code has been sent to {email}', 'success')
             except Exception as e:
                 # If email fails, log the error but don't show code
-                print(f"Email sending failed: {str(e)}")
+                logger.warning('Lecturer verification email failed: %s', e,
+                               extra={'event': 'email.failed', 'kind': 'lecturer_verification'})
                 flash(f'⚠️ Email service temporarily unavailable. Please contact support.', 'error')
             
             # Store in session for verification
@@ -1672,6 +1850,7 @@ def edit_broadcast(broadcast_id):
     
     broadcast.message = new_message.strip()
     db.session.commit()
+    invalidate_class_fragments(broadcast.class_group_id, 'broadcast')
     
     flash('Broadcast updated successfully!', 'success')
     return redirect(url_for('main.rep_dashboard'))
@@ -1692,8 +1871,11 @@ def delete_broadcast(broadcast_id):
         flash('You can only delete your own broadcasts.', 'error')
         return redirect(url_for('main.dashboard'))
     
+    class_group_id = broadcast.class_group_id
     db.session.delete(broadcast)
+    bump_class_counters(class_group_id, broadcast_count=-1)
     db.session.commit()
+    invalidate_class_fragments(class_group_id, 'broadcast')
     
     flash('Broadcast deleted successfully!', 'success')
     return redirect(url_for('main.rep_dashboard'))
@@ -1721,7 +1903,9 @@ def post_broadcast():
         class_group_id=current_user.class_group_id
     )
     db.session.add(broadcast)
+    bump_class_counters(current_user.class_group_id, broadcast_count=1)
     db.session.commit()
+    invalidate_class_fragments(current_user.class_group_id, 'broadcast')
     
     # Send emails to students - SYNCHRONOUS (immediate)
     try:
@@ -1737,8 +1921,9 @@ def post_broadcast():
             ).all()
             class_name = class_group.name if class_group else "Your Class"
             
-            print(f"[BROADCAST] Class: {class_name} (ID: {current_user.class_group_id})")
-            print(f"[BROADCAST] Found {len(students)} students with email enabled")
+            logger.info('Broadcast recipients', extra={'event': 'broadcast.recipients',
+                                                       'class_group_id': current_user.class_group_id,
+                                                       'recipients': len(students)})
         else:
             # Send to all students (for admin broadcasts)
             students = User.query.filter_by(
@@ -1746,7 +1931,8 @@ def post_broadcast():
                 receive_emails=True
             ).all()
             class_name = "All Students"
-            print(f"[BROADCAST] Sending to ALL students: {len(students)}")
+            logger.info('Broadcast recipients', extra={'event': 'broadcast.recipients', 'class_group_id': None,
+                                                       'recipients': len(students)})
         
         # Send email to each student
         sent_count = 0
@@ -1754,8 +1940,6 @@ def post_broadcast():
         
         for student in students:
             try:
-                print(f"[BROADCAST] Sending to {student.username} ({student.email})...")
-                
                 msg = Message(
                     f'📢 New Announcement from {sender_name}',
                     sender=('UniPortal', 'ko2527600@gmail.com'),
@@ -1810,27 +1994,27 @@ UniPortal Team'''
                 
                 mail.send(msg)
                 sent_count += 1
-                print(f"[BROADCAST] ✅ Sent to {student.email}")
+                logger.info('Broadcast email sent', extra={'event': 'broadcast.email_sent', 'user_id': student.id})
                 
             except Exception as e:
                 failed_count += 1
-                print(f"[BROADCAST] ❌ Failed to send to {student.email}: {str(e)}")
+                logger.warning('Broadcast email failed: %s', e,
+                               extra={'event': 'broadcast.email_failed', 'user_id': student.id})
                 continue
         
-        print(f"[BROADCAST] Summary: {sent_count} sent, {failed_count} failed")
+        logger.info('Broadcast emails done', extra={'event': 'broadcast.summary', 'broadcast_id': broadcast.id,
+                                                    'sent': sent_count, 'failed': failed_count})
         
         if sent_count > 0:
             flash(f'📢 Broadcast posted! Emails sent to {sent_count} student(s).', 'success')
         elif len(students) == 0:
             flash('📢 Broadcast posted! (No students in your class have email enabled)', 'info')
         else:
-            flash(f'📢 Broadcast posted! (Failed to send {failed_count} emails - check console)', 'warning')
+            flash(f'📢 Broadcast posted! (Failed to send {failed_count} emails - check the logs)', 'warning')
             
-    except Exception as e:
-        print(f"[BROADCAST] ❌ CRITICAL ERROR: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        flash('📢 Broadcast posted! (Email system error - check console)', 'warning')
+    except Exception:
+        logger.exception('Broadcast emails failed', extra={'event': 'broadcast.failed'})
+        flash('📢 Broadcast posted! (Email system error - check the logs)', 'warning')
     
     return redirect(url_for('main.dashboard'))
 
@@ -1858,16 +2042,17 @@ def submit_grade(assignment_id):
         return redirect(url_for('main.grading_room', assignment_id=assignment_id))
     
     # Update assignment with grade and feedback
+    was_pending = assignment.grade is None
     assignment.grade = grade.strip()
     assignment.feedback = feedback.strip() if feedback else None
+    count_grading(assignment, was_pending)
     db.session.commit()
     
     flash(f'✅ Grade {grade} assigned to {assignment.user.username}!', 'success')
     
-    # Find next ungraded assignment
-    next_assignment = Assignment.query.filter(
-        Assignment.id > assignment_id,
-        Assignment.grade == None
+    # Find next ungraded assignment in this lecturer's queue
+    next_assignment = grading_queue(current_user).filter(
+        Assignment.id > assignment_id
     ).order_by(Assignment.id.asc()).first()
     
     # Redirect to next assignment or back to dashboard
@@ -1895,8 +2080,10 @@ def grade_assignment(assignment_id):
         return redirect(url_for('main.admin_dashboard'))
     
     # Update assignment
+    was_pending = assignment.grade is None
     assignment.grade = grade.strip()
     assignment.feedback = feedback.strip() if feedback else None
+    count_grading(assignment, was_pending)
     db.session.commit()
     
     flash(f'Grade "{grade}" assigned to {assignment.user.username}\'s assignment successfully!', 'success')
@@ -1945,6 +2132,10 @@ def upload_slide():
         flash('Invalid file type. Allowed types: PDF, PPT, PPTX', 'error')
         return redirect(url_for('main.dashboard'))
     
+    if not can_store(current_user.class_group_id, uploaded_file_size(file)):
+        flash('🔒 This file exceeds your class upload limit or storage quota.', 'error')
+        return redirect(url_for('main.dashboard'))
+    
     filename = secure_filename(file.filename)
     # Create slides folder
     slides_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'slides')
@@ -1958,11 +2149,13 @@ def upload_slide():
     
     file_path = os.path.join(slides_folder, unique_filename)
     file.save(file_path)
+    file_size = saved_file_size(file_path)
     
     # Create slide record (using Resource model for library)
     resource = Resource(
         title=title.strip(),
         file_path=file_path,
+        file_size_bytes=file_size,
         author=current_user.username,
         description=description.strip() if description else None,
         category='Lecture Slides',
@@ -1971,8 +2164,11 @@ def upload_slide():
         course_id=int(course_id) if course_id else None,
         class_group_id=current_user.class_group_id  # CRUCIAL: Link to class
     )
+    resource.search_text = extract_text_from_file(file_path)
     db.session.add(resource)
+    bump_storage(current_user.class_group_id, file_size)
     db.session.commit()
+    invalidate_class_fragments(current_user.class_group_id, 'courses', 'slides')
     
     # Create Broadcast Notification
     if current_user.class_group_id:
@@ -1983,7 +2179,9 @@ def upload_slide():
             class_group_id=current_user.class_group_id
         )
         db.session.add(broadcast)
+        bump_class_counters(current_user.class_group_id, broadcast_count=1)
         db.session.commit()
+        invalidate_class_fragments(current_user.class_group_id, 'broadcast')
         
         # Send Email Notifications to all students in the class
         try:
@@ -2014,9 +2212,10 @@ Best regards,
 UniPortal Team'''
                         mail.send(msg)
                     except Exception as e:
-                        print(f"Failed to send email to {student.email}: {str(e)}")
-        except Exception as e:
-            print(f"Error sending notifications: {str(e)}")
+                        logger.warning('Resource email failed: %s', e,
+                                       extra={'event': 'email.failed', 'kind': 'new_resource', 'user_id': student.id})
+        except Exception:
+            logger.exception('Resource notifications failed', extra={'event': 'email.notify_failed'})
     
     flash('✅ Slide Uploaded Successfully!', 'success')
     return redirect(url_for('main.dashboard'))
@@ -2063,8 +2262,11 @@ def delete_slide(slide_id):
         os.remove(resource.file_path)
     
     # Delete from database
+    class_group_id = resource.class_group_id
+    bump_storage(class_group_id, -(resource.file_size_bytes or 0))
     db.session.delete(resource)
     db.session.commit()
+    invalidate_class_fragments(class_group_id, 'courses', 'slides')
     
     flash(f'Slide "{resource.title}" deleted successfully!', 'success')
     return redirect(url_for('main.dashboard'))
@@ -2099,6 +2301,10 @@ def upload_assignment():
         return redirect(url_for('main.dashboard'))
     
     if file and allowed_file(file.filename):
+        if not can_store(current_user.class_group_id, uploaded_file_size(file)):
+            flash('🔒 This file exceeds your class upload limit or storage quota.', 'error')
+            return redirect(url_for('main.rep_dashboard' if current_user.role == 'Rep' else 'main.student_dashboard'))
+        
         filename = secure_filename(file.filename)
         # Create user-specific folder
         user_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], str(current_user.id))
@@ -2106,12 +2312,14 @@ def upload_assignment():
         
         file_path = os.path.join(user_folder, filename)
         file.save(file_path)
+        file_size = saved_file_size(file_path)
         
         # Calculate file hash
         file_hash = calculate_file_hash(file_path)
         
-        # Check for plagiarism
-        similarity_score, matched_id = check_plagiarism(file_path, file_hash)
+        # Check for plagiarism (the extracted text is indexed for search too)
+        file_text = extract_text_from_file(file_path)
+        similarity_score, matched_id = check_plagiarism(file_path, file_hash, file_text)
         
         # Create assignment record with course_id
         assignment = Assignment(
@@ -2120,10 +2328,14 @@ def upload_assignment():
             file_hash=file_hash,
             similarity_score=similarity_score,
             matched_assignment_id=matched_id,
+            file_size_bytes=file_size,
             user_id=current_user.id,
             course_id=course_id
         )
+        assignment.search_text = file_text
         db.session.add(assignment)
+        count_assignment(assignment, current_user.class_group_id)
+        bump_storage(current_user.class_group_id, file_size)
         db.session.commit()
         
         if similarity_score > 50:
@@ -2178,7 +2390,9 @@ def lecturer_create_assignment():
             )
             
             db.session.add(broadcast)
+            bump_class_counters(course.class_group_id, broadcast_count=1)
             db.session.commit()
+            invalidate_class_fragments(course.class_group_id, 'broadcast')
             
             flash(f'✅ Assignment "{title}" created and announced to students!', 'success')
             return redirect(url_for('main.lecturer_dashboard'))
@@ -2226,6 +2440,11 @@ def lecturer_upload_slides():
                         failed_files.append(f"{file.filename} (invalid file type)")
                         continue
                     
+                    # Usage includes this batch's earlier files (bump_storage expires it)
+                    if not can_store(course.class_group_id, uploaded_file_size(file)):
+                        failed_files.append(f"{file.filename} (over upload limit or storage quota)")
+                        continue
+                    
                     # Generate secure filename
                     filename = secure_filename(file.filename)
                     timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
@@ -2238,6 +2457,7 @@ def lecturer_upload_slides():
                     # Save file
                     file_path = os.path.join(slides_folder, filename)
                     file.save(file_path)
+                    file_size = saved_file_size(file_path)
                     
                     # Create resource record
                     resource = Resource(
@@ -2248,10 +2468,13 @@ def lecturer_upload_slides():
                         uploader_id=current_user.id,
                         class_group_id=course.class_group_id,
                         course_id=course.id,
-                        is_approved=True  # Auto-approve lecturer uploads
+                        is_approved=True,  # Auto-approve lecturer uploads
+                        file_size_bytes=file_size
                     )
+                    resource.search_text = extract_text_from_file(file_path)
                     
                     db.session.add(resource)
+                    bump_storage(course.class_group_id, file_size)
                     uploaded_files.append(file.filename)
                     
                 except Exception as e:
@@ -2259,6 +2482,7 @@ def lecturer_upload_slides():
         
         try:
             db.session.commit()
+            invalidate_class_fragments(course.class_group_id, 'courses', 'slides')
             
             # Create announcement for uploaded slides
             if uploaded_files:
@@ -2272,7 +2496,9 @@ def lecturer_upload_slides():
                     course_id=course.id
                 )
                 db.session.add(broadcast)
+                bump_class_counters(course.class_group_id, broadcast_count=1)
                 db.session.commit()
+                invalidate_class_fragments(course.class_group_id, 'broadcast')
             
             # Show results
             if uploaded_files and not failed_files:
@@ -2297,8 +2523,17 @@ def admin_dashboard():
         flash('Access denied', 'error')
         return redirect(url_for('main.dashboard'))
     
-    assignments = Assignment.query.order_by(Assignment.created_at.desc()).all()
-    users = User.query.all()
+    # First page of submissions; older ones load from admin_assignments_page
+    page = admin_assignments_page_rows()
+    
+    # Grading Center: newest ungraded and recently graded, each capped
+    newest_first = (Assignment.created_at.desc(), Assignment.id.desc())
+    ungraded = to_assignment_rows(assignment_rows_query().filter(
+        Assignment.grade.is_(None)
+    ).order_by(*newest_first).limit(ADMIN_GRADING_LIST_SIZE))
+    graded = to_assignment_rows(assignment_rows_query().filter(
+        Assignment.grade.isnot(None)
+    ).order_by(*newest_first).limit(10))
     
     # Get latest broadcast
     from app.models import Broadcast
@@ -2336,8 +2571,9 @@ def admin_dashboard():
     alert_count = Assignment.query.filter(Assignment.similarity_score > 50).count()
     
     return render_template('admin_dashboard.html', 
-                         assignments=assignments, 
-                         users=users, 
+                         page=page, 
+                         ungraded=ungraded, 
+                         graded=graded, 
                          broadcast=broadcast, 
                          slides=slides,
                          courses=courses,
@@ -2348,6 +2584,23 @@ def admin_dashboard():
                          pending_count=pending_count,
                          alert_count=alert_count)
 
+ADMIN_GRADING_LIST_SIZE = 20
+
+def admin_assignments_page_rows():
+    """One keyset page of the submissions table as read-only rows"""
+    page = request_page(assignment_rows_query(), Assignment.created_at, Assignment.id)
+    page.items = to_assignment_rows(page.items)
+    return page
+
+@main.route('/admin/assignments/page')
+@login_required
+def admin_assignments_page():
+    """Next page of the admin submissions table (HTML partial + cursor)"""
+    if current_user.role not in ['Admin', 'Lecturer']:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    return partial_response('partials/admin_assignment_rows.html', admin_assignments_page_rows())
+
 @main.route('/download/<int:assignment_id>')
 @login_required
 def download_file(assignment_id):
@@ -2378,12 +2631,20 @@ def get_broadcast():
     """API endpoint to get the latest broadcast for the user's class group"""
     from app.models import Broadcast
     
-    # Get the latest broadcast for the user's class group
+    # Get the latest broadcast for the user's class group (cached per class)
     if current_user.class_group_id:
-        broadcast = Broadcast.query.filter_by(class_group_id=current_user.class_group_id).order_by(Broadcast.timestamp.desc()).first()
-    else:
-        # If no class group, get the latest global broadcast
-        broadcast = Broadcast.query.order_by(Broadcast.timestamp.desc()).first()
+        broadcast = get_class_latest_broadcast(current_user.class_group_id)
+        if broadcast:
+            return {
+                'message': broadcast['message'],
+                'timestamp': broadcast['timestamp'].strftime('%B %d, %Y at %H:%M'),
+                'author': broadcast['user']['username'],
+                'id': broadcast['id']
+            }
+        return {'message': None}
+    
+    # If no class group, get the latest global broadcast
+    broadcast = Broadcast.query.order_by(Broadcast.timestamp.desc()).first()
     
     if broadcast:
         return {
@@ -2398,17 +2659,19 @@ def get_broadcast():
 @main.route('/api/get_broadcast_history')
 @login_required
 def get_broadcast_history():
-    """API endpoint to get all broadcasts for the user's class group"""
+    """API endpoint to get broadcasts for the user's class group, newest first, one page per call"""
     from app.models import Broadcast
+    from sqlalchemy.orm import joinedload
     
-    # Get all broadcasts for the user's class group
+    query = Broadcast.query.options(joinedload(Broadcast.user))
     if current_user.class_group_id:
-        broadcasts = Broadcast.query.filter_by(class_group_id=current_user.class_group_id).order_by(Broadcast.timestamp.desc()).all()
-    else:
-        # If no class group, get all global broadcasts
-        broadcasts = Broadcast.query.order_by(Broadcast.timestamp.desc()).all()
+        query = query.filter_by(class_group_id=current_user.class_group_id)
+    # If no class group, page through all global broadcasts
+    
+    broadcasts = request_page(query, Broadcast.timestamp, Broadcast.id)
     
     return {
+        'next_cursor': broadcasts.next_cursor,
         'broadcasts': [
             {
                 'message': b.message,
@@ -2627,6 +2890,72 @@ def generate_groups():
                          class_group=class_group,
                          total_students=len(students))
 
+@main.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint (loopback, or METRICS_TOKEN as a bearer token)"""
+    from app.utils.metrics import registry, CONTENT_TYPE
+    
+    # Requests relayed by a reverse proxy also arrive from loopback
+    is_local = (request.remote_addr in current_app.config.get('METRICS_ALLOWED_IPS', ())
+                and 'X-Forwarded-For' not in request.headers)
+    token = current_app.config.get('METRICS_TOKEN')
+    has_token = bool(token) and request.headers.get('Authorization') == f'Bearer {token}'
+    if not (is_local or has_token):
+        return Response('Forbidden\n', status=403, mimetype='text/plain')
+    
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+@main.route('/admin/profiles')
+@login_required
+def admin_profiles():
+    """Endpoints with sampled profiler stacks (JSON)"""
+    if current_user.role != 'Admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    store = current_app.extensions['profiler_store']
+    endpoints = sorted(store.summary().items(), key=lambda item: item[1], reverse=True)
+    return jsonify({
+        'enabled': current_app.config.get('PROFILER_ENABLED', False),
+        'sample_rate': current_app.config.get('PROFILER_SAMPLE_RATE'),
+        'slow_threshold_ms': current_app.config.get('PROFILER_SLOW_THRESHOLD_MS'),
+        'endpoints': [
+            {
+                'endpoint': endpoint,
+                'samples': samples,
+                'download_url': url_for('main.admin_profile_download', endpoint=endpoint)
+            }
+            for endpoint, samples in endpoints
+        ]
+    })
+
+@main.route('/admin/profiles/<endpoint>.folded')
+@login_required
+def admin_profile_download(endpoint):
+    """Aggregated collapsed stacks for one endpoint (flamegraph.pl / speedscope input)"""
+    if current_user.role != 'Admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    samples = current_app.extensions['profiler_store'].load(endpoint)
+    if not samples:
+        return jsonify({'error': 'No samples for this endpoint'}), 404
+    
+    folded = ''.join(f'{stack} {count}\n' for stack, count in samples.most_common())
+    return Response(
+        folded,
+        mimetype='text/plain',
+        headers={'Content-Disposition': f'attachment; filename={secure_filename(endpoint)}.folded'}
+    )
+
+@main.route('/admin/profiles/clear', methods=['POST'])
+@login_required
+def admin_profiles_clear():
+    """Drop all stored profiler samples"""
+    if current_user.role != 'Admin':
+        return jsonify({'error': 'Access denied'}), 403
+    
+    current_app.extensions['profiler_store'].clear()
+    return jsonify({'success': True})
+
 @main.route('/run_archiver', methods=['POST'])
 @login_required
 def run_archiver():
@@ -2650,6 +2979,7 @@ def run_archiver():
     
     archived_count = 0
     failed_count = 0
+    released = {}  # class_group_id -> bytes moved out of class storage
     
     for assignment in assignments:
         try:
@@ -2672,10 +3002,18 @@ def run_archiver():
                 # File doesn't exist, just mark as archived
                 assignment.archive_link = f'/static/archive/missing_{assignment.filename}'
                 failed_count += 1
+            
+            # Cold storage does not count against the class quota
+            class_group_id = assignment.user.class_group_id
+            released[class_group_id] = released.get(class_group_id, 0) + (assignment.file_size_bytes or 0)
         except Exception as e:
-            print(f"Error archiving {assignment.filename}: {e}")
+            logger.error('Archiving assignment failed: %s', e,
+                         extra={'event': 'archive.failed', 'assignment_id': assignment.id})
             failed_count += 1
     
+    for class_group_id, size in released.items():
+        bump_storage(class_group_id, -size)
+    
     # Commit all changes
     db.session.commit()
     
@@ -2704,10 +3042,73 @@ def forum():
         flash('You must be in a class group to access the forum.', 'error')
         return redirect(url_for('main.dashboard'))
     
-    from app.models import ForumPost
-    posts = ForumPost.query.filter_by(class_group_id=current_user.class_group_id).order_by(ForumPost.timestamp.desc()).all()
+    page, reply_counts = forum_posts_page(current_user.class_group_id)
+    return render_template('forum_list.html', page=page, reply_counts=reply_counts)
+
+@main.route('/forum/page')
+@login_required
+def forum_page():
+    """Next page of forum posts (HTML partial + cursor)"""
+    if not current_user.class_group_id:
+        return jsonify({'error': 'Access denied'}), 403
     
-    return render_template('forum_list.html', posts=posts)
+    page, reply_counts = forum_posts_page(current_user.class_group_id)
+    return partial_response('partials/forum_posts.html', page, reply_counts=reply_counts)
+
+def forum_posts_page(class_group_id):
+    """One page of a class's posts with authors, plus {post_id: reply count} for that page"""
+    from sqlalchemy import func
+    from sqlalchemy.orm import joinedload
+    from app.models import ForumPost, ForumReply
+    
+    page = request_page(
+        ForumPost.query.options(joinedload(ForumPost.author)).filter_by(class_group_id=class_group_id),
+        ForumPost.timestamp, ForumPost.id
+    )
+    post_ids = [post.id for post in page]
+    reply_counts = dict(db.session.query(ForumReply.post_id, func.count(ForumReply.id)).filter(
+        ForumReply.post_id.in_(post_ids)
+    ).group_by(ForumReply.post_id).all()) if post_ids else {}
+    return page, reply_counts
+
+@main.route('/api/search')
+@query_budget(6)
+@login_required
+def search_api():
+    """Ranked full-text search across the user's class (forum, chat, slides, submissions)"""
+    from app.utils.chat import channel_id_for
+    from app.utils.search import search
+    
+    query = request.args.get('q', '').strip()
+    limit = request.args.get('limit', 20, type=int)
+    channel_id = channel_id_for(current_user.class_group_id, create=False) if current_user.class_group_id else None
+    results = search(current_user, query, limit=limit, channel_id=channel_id)
+    
+    return jsonify({
+        'query': query,
+        'results': [
+            {
+                'kind': result['kind'],
+                'id': result['source_id'],
+                'title': result['title'],
+                'snippet': result['snippet'],
+                'timestamp': result['created_at'].isoformat() if result['created_at'] else None,
+                'url': search_result_url(result)
+            }
+            for result in results
+        ]
+    })
+
+def search_result_url(result):
+    if result['kind'] == 'post':
+        return url_for('main.forum_post', post_id=result['source_id'])
+    if result['kind'] == 'reply':
+        return url_for('main.forum_post', post_id=result['parent_id'], _anchor=f"reply-{result['source_id']}")
+    if result['kind'] == 'resource':
+        return url_for('main.download_slide', slide_id=result['source_id'])
+    if result['kind'] == 'chat':
+        return url_for('main.class_chat', around=result['source_id'])
+    return url_for('main.preview_file', assignment_id=result['source_id'])
 
 @main.route('/forum/create', methods=['POST'])
 @login_required
@@ -2777,6 +3178,7 @@ def forum_reply(post_id):
         post_id=post_id
     )
     db.session.add(reply)
+    bump_class_counters(post.class_group_id, forum_reply_count=1)
     db.session.commit()
     
     flash('✅ Reply added!', 'success')
@@ -2923,6 +3325,7 @@ def manage_timetable():
         )
         db.session.add(event)
         db.session.commit()
+        invalidate_class_fragments(current_user.class_group_id, 'timetable')
         
         flash(f'✅ Timetable event added: {course_name} on {day}', 'success')
     
@@ -2947,6 +3350,7 @@ def manage_timetable():
         
         db.session.delete(event)
         db.session.commit()
+        invalidate_class_fragments(current_user.class_group_id, 'timetable')
         
         flash('✅ Timetable event deleted successfully!', 'success')
     
@@ -3202,6 +3606,7 @@ def activate_trial():
     class_group.trial_used = True
     class_group.premium_expiry = datetime.utcnow() + timedelta(days=14)
     db.session.commit()
+    invalidate_class_entitlement(class_group.id)
     
     flash('🎉 Free Trial Active! Your class has 14 days of premium access.', 'success')
     return redirect(url_for('main.rep_dashboard'))
@@ -3270,6 +3675,7 @@ def verify_payment(reference):
                     class_group.premium_expiry = datetime.utcnow() + timedelta(days=days_to_add)
                 
                 db.session.commit()
+                invalidate_class_entitlement(class_group.id)
                 
                 flash(f'✅ Subscription Extended! {plan_name} plan activated ({days_to_add} days).', 'success')
             else:
@@ -3277,8 +3683,8 @@ def verify_payment(reference):
         else:
             flash('❌ Could not verify payment. Please contact support.', 'error')
     
-    except Exception as e:
-        print(f"Payment verification error: {e}")
+    except Exception:
+        logger.exception('Payment verification error', extra={'event': 'payment.verify_failed'})
         flash('❌ Error verifying payment. Please try again or contact support.', 'error')
     
     return redirect(url_for('main.rep_dashboard'))
@@ -3342,8 +3748,8 @@ def subscribe():
         
         return jsonify({'success': True, 'message': 'Subscription saved successfully'})
     
-    except Exception as e:
-        print(f"Error saving push subscription: {e}")
+    except Exception:
+        logger.exception('Saving push subscription failed', extra={'event': 'push.subscribe_failed'})
         return jsonify({'error': 'Failed to save subscription'}), 500
 
 # Password Reset Routes
@@ -3435,7 +3841,7 @@ UniPortal Team'''
                 flash('✅ Password reset instructions have been sent to your email address.', 'success')
                 
             except Exception as e:
-                print(f"Error sending reset email: {str(e)}")
+                logger.warning('Password reset email failed: %s', e, extra={'event': 'email.failed', 'kind': 'password_reset'})
                 flash('❌ Error sending reset email. Please try again later.', 'error')
         else:
             # Don't reveal if email exists or not for security
@@ -3475,6 +3881,7 @@ def reset_password(token):
         # Reset password
         user.reset_password(new_password)
         db.session.commit()
+        invalidate_user(user.id)
         
         flash('✅ Your password has been reset successfully! You can now log in with your new password.', 'success')
         return redirect(url_for('main.login'))
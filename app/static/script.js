@@ -126,3 +126,29 @@ function confirmLogout(event) {
     
     return false;
 }
+
+// ========== LOAD MORE (KEYSET PAGINATION) ==========
+// Fetches {html, next_cursor} from the button's data-url and appends the rows
+function loadMore(button) {
+    const target = document.getElementById(button.dataset.target);
+    const url = new URL(button.dataset.url, window.location.origin);
+    url.searchParams.set('cursor', button.dataset.cursor);
+    button.disabled = true;
+
+    fetch(url)
+        .then(response => response.json())
+        .then(data => {
+            target.insertAdjacentHTML('beforeend', data.html);
+            if (data.next_cursor) {
+                button.dataset.cursor = data.next_cursor;
+                button.disabled = false;
+            } else {
+                button.parentElement.remove();
+            }
+            document.dispatchEvent(new CustomEvent('rowsloaded', { detail: { target: target.id } }));
+        })
+        .catch(error => {
+            console.error('Error loading more:', error);
+            button.disabled = false;
+        });
+}
@@ -4,6 +4,9 @@ Background tasks for email sending, notifications, etc.
 """
 from app import create_app, mail
 from flask_mail import Message
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Create app and get celery instance
 app = create_app()
@@ -175,7 +178,8 @@ UniPortal Team'''
                 mail.send(msg)
                 sent_count += 1
             except Exception as e:
-                print(f"Failed to send email to {student.email}: {str(e)}")
+                logger.warning('Broadcast email failed: %s', e,
+                               extra={'event': 'broadcast.email_failed', 'user_id': student.id})
                 continue
         
         return f"Broadcast emails sent to {sent_count} students"
@@ -194,6 +198,46 @@ def cleanup_old_files():
         return "Cleanup completed"
 
 
+@celery.task
+def reconcile_counters():
+    """
+    Repair drift in the denormalized class and course counters
+    Run this task hourly (scheduled via Celery Beat)
+    """
+    from app.utils.counters import reconcile_counters as reconcile
+    
+    with app.app_context():
+        repaired = reconcile()
+    return f"Counters reconciled: {repaired} row(s) repaired"
+
+
+@celery.task
+def reconcile_storage():
+    """
+    Re-measure uploaded files and repair class storage usage
+    Run this task daily (scheduled via Celery Beat)
+    """
+    from app.utils.storage import reconcile_storage as reconcile
+    
+    with app.app_context():
+        repaired = reconcile(app.config['UPLOAD_FOLDER'])
+    return f"Storage reconciled: {repaired} row(s) repaired"
+
+
+@celery.task
+def rebuild_search_file_text():
+    """
+    Extract and index the text of uploaded files not yet searchable
+    Run once after `python migrate.py` adds full-text search
+    """
+    from app.routes import extract_text_from_file
+    from app.utils.search import rebuild_file_text
+    
+    with app.app_context():
+        indexed = rebuild_file_text(extract_text_from_file, app.config['UPLOAD_FOLDER'])
+    return f"Search file text indexed for {indexed} document(s)"
+
+
 @celery.task
 def check_subscription_expiry():
     """
@@ -3,5 +3,6 @@ Utility modules for UniPortal
 """
 
 from .device_detection import device_detector
+from .cache import cache
 
-__all__ = ['device_detector']
\ No newline at end of file
+__all__ = ['device_detector', 'cache']
\ No newline at end of file
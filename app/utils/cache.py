@@ -0,0 +1,280 @@
+"""
+Cache Utility for UniPortal
+In-process LRU cache with an optional Redis backend for data that is
+identical for every member of a class (timetable, courses, slides, broadcasts)
+
+Each worker has its own LRU, so with several workers a delete is published
+over Redis pub/sub (CACHE_INVALIDATION_REDIS_URL, by default the Socket.IO
+Redis queue) and every worker drops its copy. The Redis backend is shared
+and needs no relay.
+"""
+
+import json
+import logging
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Sentinel for cache misses so that None can be cached
+MISSING = object()
+
+
+class LRUBackend:
+    """Thread-safe in-process LRU store with per-entry expiry"""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._store = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is None:
+                return MISSING
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._store[key]
+                return MISSING
+            self._store.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires_at = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._store[key] = (value, expires_at)
+            self._store.move_to_end(key)
+            while len(self._store) > self.max_entries:
+                self._store.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._store.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+
+
+class RedisBackend:
+    """Redis store shared by all workers; values are pickled"""
+
+    def __init__(self, url, key_prefix='uniportal:cache:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self.key_prefix + key)
+        except Exception as e:
+            logger.warning('Cache read error: %s', e, extra={'event': 'cache.error', 'operation': 'get'})
+            return MISSING
+        if raw is None:
+            return MISSING
+        return pickle.loads(raw)
+
+    def set(self, key, value, timeout=None):
+        try:
+            self.client.set(self.key_prefix + key, pickle.dumps(value), ex=timeout or None)
+        except Exception as e:
+            logger.warning('Cache write error: %s', e, extra={'event': 'cache.error', 'operation': 'set'})
+
+    def delete(self, *keys):
+        if not keys:
+            return
+        try:
+            self.client.delete(*[self.key_prefix + key for key in keys])
+        except Exception as e:
+            logger.warning('Cache delete error: %s', e, extra={'event': 'cache.error', 'operation': 'delete'})
+
+    def clear(self):
+        try:
+            for key in self.client.scan_iter(match=self.key_prefix + '*'):
+                self.client.delete(key)
+        except Exception as e:
+            logger.warning('Cache clear error: %s', e, extra={'event': 'cache.error', 'operation': 'clear'})
+
+
+class CacheInvalidations:
+    """Publishes deletes from a worker's LRU to every other worker over Redis pub/sub"""
+
+    def __init__(self, invalidate, url, channel):
+        self.invalidate = invalidate  # applies relayed deletes (None: everything) to this worker
+        self.url = url
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._client = None
+        self._thread = None
+
+    def _redis(self):
+        import redis
+
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def ensure_started(self):
+        # Started by the first cached value, so a preforking server subscribes once per worker
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._listen, name='uniportal-cache-invalidations', daemon=True)
+            self._thread.start()
+
+    def publish(self, keys):
+        import redis
+
+        try:
+            self._redis().publish(self.channel, json.dumps({'origin': self.origin, 'keys': keys}))
+        except redis.RedisError as e:
+            logger.warning('Cache invalidation publish failed: %s', e,
+                           extra={'event': 'cache.invalidation_failed', 'keys': len(keys) if keys else 'all'})
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Deletes missed while unsubscribed cannot be replayed; start empty
+                self.invalidate(None)
+                for message in pubsub.listen():
+                    data = json.loads(message['data'])
+                    if data['origin'] != self.origin:
+                        self.invalidate(data['keys'])
+            except Exception as e:
+                logger.warning('Cache invalidation relay disconnected: %s', e,
+                               extra={'event': 'cache.relay_disconnected'})
+                time.sleep(1)
+
+
+class Cache:
+    """
+    Small cache facade configured from the Flask app.
+    Uses Redis when CACHE_REDIS_URL is set, otherwise an in-process LRU
+    whose deletes are relayed to the other workers when there are several.
+    """
+
+    def __init__(self):
+        self.backend = LRUBackend()
+        self.relay = None
+        self.coherent = True  # a delete reaches every worker
+        self.default_timeout = 300
+        self.hits = 0
+        self.misses = 0
+        self._build_locks = {}
+        self._build_locks_guard = threading.Lock()
+        # Deletes seen while a key is being built, so a stale build is not stored
+        self._generations = {}  # key being built -> deletes of it so far
+        self._clears = 0
+
+    def init_app(self, app):
+        self.default_timeout = app.config.get('CACHE_DEFAULT_TIMEOUT', 300)
+        self.relay = None
+        self.coherent = True
+        redis_url = app.config.get('CACHE_REDIS_URL')
+        if redis_url:
+            self.backend = RedisBackend(redis_url)
+        else:
+            self.backend = LRUBackend(app.config.get('CACHE_MAX_ENTRIES', 2048))
+            relay_url = app.config.get('CACHE_INVALIDATION_REDIS_URL')
+            if relay_url:
+                self.relay = CacheInvalidations(self._invalidate, relay_url, app.config['SOCKETIO_CHANNEL'] + '-cache')
+            elif app.config.get('SOCKETIO_MESSAGE_QUEUE'):
+                # Several workers and no Redis to share deletes through
+                self.coherent = False
+                logger.warning('In-process cache with several workers and no Redis: a write invalidates only '
+                               'its own worker. Set CACHE_REDIS_URL or CACHE_INVALIDATION_REDIS_URL.',
+                               extra={'event': 'cache.incoherent'})
+        app.extensions['cache'] = self
+
+    def get(self, key):
+        value = self.backend.get(key)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, timeout=None):
+        if self.relay is not None:
+            self.relay.ensure_started()
+        self.backend.set(key, value, timeout or self.default_timeout)
+
+    def _invalidate(self, keys):
+        """Delete keys (None: everything) in this worker and mark their builds stale"""
+        with self._build_locks_guard:
+            if keys is None:
+                self._clears += 1
+            else:
+                for key in keys:
+                    if key in self._generations:
+                        self._generations[key] += 1
+        if keys is None:
+            self.backend.clear()
+        else:
+            self.backend.delete(*keys)
+
+    def delete(self, *keys):
+        """Delete keys in every worker"""
+        self._invalidate(keys)
+        if self.relay is not None and keys:
+            self.relay.publish(list(keys))
+
+    def delete_local(self, *keys):
+        """Delete keys in this worker only (for callers relaying the change themselves)"""
+        self._invalidate(keys)
+
+    def clear(self):
+        self._invalidate(None)
+        if self.relay is not None:
+            self.relay.publish(None)
+
+    def get_or_set(self, key, builder, timeout=None):
+        """
+        Return the cached value for key, building it on a miss.
+        Concurrent misses for the same key in this process wait for a
+        single build instead of all hitting the database. A build that
+        overlaps a delete of its key may have read the old rows, so it is
+        returned but not stored.
+        """
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        with self._build_locks_guard:
+            lock = self._build_locks.setdefault(key, threading.Lock())
+
+        with lock:
+            # Another request may have built it while we waited
+            value = self.backend.get(key)
+            if value is MISSING:
+                with self._build_locks_guard:
+                    started = (self._clears, self._generations.setdefault(key, 0))
+                try:
+                    value = builder()
+                finally:
+                    with self._build_locks_guard:
+                        current = (self._clears, self._generations.pop(key, 0))
+                if current == started:
+                    self.set(key, value, timeout)
+
+        with self._build_locks_guard:
+            self._build_locks.pop(key, None)
+
+        return value
+
+
+# Per-class dashboard fragments and the cache key used for each
+CLASS_FRAGMENTS = ('timetable', 'courses', 'slides', 'broadcast')
+
+
+def class_fragment_key(class_group_id, fragment):
+    """Cache key of one per-class fragment"""
+    return f'class:{class_group_id}:{fragment}'
+
+
+cache = Cache()
@@ -0,0 +1,523 @@
+"""
+Chat Utility for UniPortal
+Storage for the real-time class chat. Each class room maps to one
+ChatChannel and its messages live in chat_messages, keyed by
+(channel_id, id), instead of as replies to a "Class Chat" forum post.
+
+A room's channel never changes once created, so the mapping is cached per
+process and sending a message costs a single INSERT.
+
+Messages are written behind the broadcast: handle_message takes the next id
+up front (see next_message_id), emits the message, and hands the row
+to a ChatWriter that inserts everything queued in one statement every
+CHAT_FLUSH_INTERVAL_MS, or as soon as CHAT_FLUSH_BATCH_SIZE rows wait.
+The queue is flushed on exit (atexit, and SIGTERM in the server entry points
+that call flush_on_sigterm); a crash loses at most one interval of messages.
+
+History is served newest first in pages of HISTORY_PAGE_SIZE, scrolling back
+with a before-id cursor; chat_context() serves the page around one message
+so the client can jump to a search hit. The newest RECENT_MESSAGES_SIZE messages of each
+room are kept in a per-process ring buffer that the first history read
+fills and every send appends to, so joining a busy room costs no query.
+With several workers behind a Socket.IO message queue, sends are relayed to
+the other workers' buffers over Redis pub/sub; any other queue turns the
+buffer off and history is always read from the database.
+"""
+
+import atexit
+import json
+import logging
+import signal
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+ID_BLOCK_SIZE = 100
+HISTORY_PAGE_SIZE = 50
+RECENT_MESSAGES_SIZE = 100
+RELAY_SUBSCRIBE_TIMEOUT = 1  # seconds a worker's first history read waits for the relay
+
+_channel_ids = {}
+_id_lock = threading.Lock()
+_id_block = deque()  # reserved ids not handed out yet
+_id_block_size = ID_BLOCK_SIZE
+
+
+def channel_id_for(class_group_id, create=True):
+    """Channel id of a class room; None when it has none and create is False"""
+    from sqlalchemy.exc import IntegrityError
+    from app import db
+    from app.models import ChatChannel
+
+    channel_id = _channel_ids.get(class_group_id)
+    if channel_id is not None:
+        return channel_id
+
+    channel_id = db.session.query(ChatChannel.id).filter_by(class_group_id=class_group_id).scalar()
+    if channel_id is None and create:
+        channel = ChatChannel(class_group_id=class_group_id)
+        db.session.add(channel)
+        try:
+            db.session.commit()
+            channel_id = channel.id
+        except IntegrityError:
+            # Another worker created the room first
+            db.session.rollback()
+            channel_id = db.session.query(ChatChannel.id).filter_by(class_group_id=class_group_id).scalar()
+
+    if channel_id is not None:
+        _channel_ids[class_group_id] = channel_id
+    return channel_id
+
+
+def message_payload(message_id, content, timestamp, user_id, username, initials):
+    """Socket.IO payload of one chat message"""
+    return {
+        'id': message_id,
+        'msg': content,
+        'user': username,
+        'user_initials': initials,
+        'user_id': user_id,
+        'timestamp': timestamp.strftime('%H:%M'),
+        'full_timestamp': timestamp.strftime('%B %d, %Y at %H:%M'),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Message ids
+# ---------------------------------------------------------------------------
+
+def _reserve_ids(name, size, seed_column):
+    """
+    The next size ids, in increasing order, from the source every process
+    shares: the column's sequence on PostgreSQL, the id_sequences row
+    elsewhere (which starts after the table's current maximum the first time
+    it is used). Taken in its own transaction so the reservation holds even
+    if the caller rolls back.
+    """
+    from sqlalchemy import func, select, text
+    from sqlalchemy.exc import IntegrityError
+    from app import db
+    from app.models import IdSequence
+
+    if db.engine.dialect.name == 'postgresql':
+        with db.engine.begin() as conn:
+            return sorted(conn.execute(
+                text('SELECT nextval(pg_get_serial_sequence(:table, :column)) FROM generate_series(1, :size)'),
+                {'table': seed_column.table.name, 'column': seed_column.name, 'size': size}
+            ).scalars())
+
+    table = IdSequence.__table__
+    while True:
+        try:
+            with db.engine.begin() as conn:
+                updated = conn.execute(
+                    table.update().where(table.c.name == name).values(next_id=table.c.next_id + size)
+                ).rowcount
+                if updated:
+                    start = conn.execute(select(table.c.next_id).where(table.c.name == name)).scalar() - size
+                else:
+                    start = conn.execute(select(func.coalesce(func.max(seed_column), 0) + 1)).scalar()
+                    conn.execute(table.insert().values(name=name, next_id=start + size))
+                return list(range(start, start + size))
+        except IntegrityError:
+            # Another process created the sequence row; take a block from it
+            continue
+
+
+def next_message_id():
+    """
+    Next chat message id. History, its cursor and search all order by id,
+    so ids must follow send order across every process that sends. A single
+    Socket.IO process (no message queue) reserves a block at a time; behind
+    a message queue every id is drawn from the shared source, so two workers
+    never hand out interleaved ranges.
+    """
+    from app.models import ChatMessage
+
+    with _id_lock:
+        if not _id_block:
+            _id_block.extend(_reserve_ids(ChatMessage.__tablename__, _id_block_size, ChatMessage.id))
+        return _id_block.popleft()
+
+
+# ---------------------------------------------------------------------------
+# Write-behind persistence
+# ---------------------------------------------------------------------------
+
+class ChatWriter:
+    """Queue of chat rows inserted in batches by a background thread"""
+
+    def __init__(self, app, interval_ms=200, batch_size=100):
+        self.app = app
+        self.interval = interval_ms / 1000
+        self.batch_size = batch_size
+        self.written = 0
+        self._queue = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._closed = False
+
+    def _ensure_started(self):
+        # Started by the first message, so a preforking server starts one per worker
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='uniportal-chat-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def add(self, row, payload):
+        """Queue a message row (and its broadcast payload, for history reads)"""
+        with self._lock:
+            self._queue.append((row, payload))
+            full = len(self._queue) >= self.batch_size
+        if self._closed:
+            self.flush()
+            return
+        self._ensure_started()
+        if full:
+            self._wake.set()
+
+    def pending(self, channel_id):
+        """Payloads of a room's messages that are not in the database yet"""
+        with self._lock:
+            return [payload for row, payload in self._queue if row['channel_id'] == channel_id]
+
+    def flush(self):
+        """Insert everything queued; returns rows written"""
+        from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+        from app import db
+        from app.models import ChatMessage
+
+        with self._flush_lock:
+            with self._lock:
+                batch, self._queue = self._queue, []
+            if not batch:
+                return 0
+
+            rows = [row for row, payload in batch]
+            with self.app.app_context():
+                try:
+                    with db.engine.begin() as conn:
+                        conn.execute(ChatMessage.__table__.insert(), rows)
+                    written = len(rows)
+                except IntegrityError:
+                    # One bad row (e.g. a deleted user) must not sink the batch
+                    written = self._insert_each(rows)
+                except SQLAlchemyError as e:
+                    # Database unavailable or locked: keep the batch for the next flush
+                    logger.warning('Chat flush failed, retrying: %s', e,
+                                   extra={'event': 'chat.flush_failed', 'messages': len(rows)})
+                    with self._lock:
+                        self._queue[:0] = batch
+                    return 0
+
+            self.written += written
+            return written
+
+    def _insert_each(self, rows):
+        from sqlalchemy.exc import SQLAlchemyError
+        from app import db
+        from app.models import ChatMessage
+
+        written = 0
+        for row in rows:
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(ChatMessage.__table__.insert(), [row])
+                written += 1
+            except SQLAlchemyError as e:
+                logger.error('Dropping chat message: %s', e,
+                             extra={'event': 'chat.message_dropped', 'message_id': row['id']})
+        return written
+
+    def close(self):
+        """Stop the thread and write whatever is still queued"""
+        self._closed = True
+        self._wake.set()
+        for attempt in range(3):
+            self.flush()
+            if not self._queue:
+                return
+            time.sleep(self.interval)
+        logger.error('Chat writer closed with unsaved messages',
+                     extra={'event': 'chat.unsaved', 'messages': len(self._queue)})
+
+
+def persist_message(row, payload):
+    """
+    Write a chat message: queued when write-behind is on, else inserted now.
+    Either way it joins the room's recent-message buffer straight away.
+    """
+    from flask import current_app
+    from app import db
+    from app.models import ChatMessage
+
+    writer = current_app.extensions.get('chat_writer')
+    if writer is not None:
+        writer.add(row, payload)
+    else:
+        db.session.execute(ChatMessage.__table__.insert(), [row])
+        db.session.commit()
+    recent_messages.append(row['channel_id'], payload)
+
+    relay = current_app.extensions.get('chat_relay')
+    if relay is not None:
+        relay.publish(row['channel_id'], payload)
+
+
+def pending_messages(channel_id):
+    """Messages of a room still queued in this process's writer"""
+    from flask import current_app
+
+    writer = current_app.extensions.get('chat_writer')
+    return writer.pending(channel_id) if writer is not None else []
+
+
+# ---------------------------------------------------------------------------
+# History
+# ---------------------------------------------------------------------------
+
+class RecentMessages:
+    """Per-room ring buffer of the newest message payloads, oldest first"""
+
+    def __init__(self, size=RECENT_MESSAGES_SIZE):
+        self.size = size
+        self.enabled = True
+        self._rooms = {}  # channel id -> [deque of payloads, whether it holds the whole room]
+        self._lock = threading.Lock()
+
+    def fill(self, channel_id, messages, complete):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._rooms[channel_id] = [deque(messages, maxlen=self.size), complete and len(messages) <= self.size]
+
+    def append(self, channel_id, payload):
+        # Cold rooms stay cold; their first history read loads from the database
+        with self._lock:
+            room = self._rooms.get(channel_id)
+            if room is None:
+                return
+            if len(room[0]) == self.size:
+                room[1] = False
+            if room[0] and room[0][-1]['id'] > payload['id']:
+                # Relayed from another worker behind a later id; keep id order
+                messages = sorted([*room[0], payload], key=lambda message: message['id'])
+                room[0] = deque(messages[-self.size:], maxlen=self.size)
+            else:
+                room[0].append(payload)
+
+    def page(self, channel_id, before_id, limit):
+        """(messages, has_more) from the buffer, or None when it cannot answer"""
+        with self._lock:
+            room = self._rooms.get(channel_id)
+            if room is None:
+                return None
+            messages = [message for message in room[0] if before_id is None or message['id'] < before_id]
+            complete = room[1]
+        if len(messages) > limit:
+            return messages[-limit:], True
+        if complete:
+            return messages, False
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._rooms.clear()
+
+
+recent_messages = RecentMessages()
+
+
+class RecentMessagesRelay:
+    """Shares ring-buffer appends between workers over Redis pub/sub"""
+
+    def __init__(self, url, channel):
+        self.url = url
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self.subscribed = threading.Event()  # set while appends from other workers arrive
+        self._client = None
+        self._thread = None
+
+    def _redis(self):
+        import redis
+
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def ensure_started(self, timeout=None):
+        """Start the listener (once per worker); wait up to timeout seconds for it to subscribe"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._listen, name='uniportal-chat-relay', daemon=True)
+            self._thread.start()
+        if timeout:
+            self.subscribed.wait(timeout)
+        return self.subscribed.is_set()
+
+    def publish(self, channel_id, payload):
+        import redis
+
+        self.ensure_started()
+        message = json.dumps({'origin': self.origin, 'channel_id': channel_id, 'payload': payload})
+        try:
+            self._redis().publish(self.channel, message)
+        except redis.RedisError as e:
+            logger.warning('Chat relay publish failed: %s', e, extra={'event': 'chat.relay_failed'})
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis().pubsub()
+                pubsub.subscribe(self.channel)
+                # Sends are delivered once Redis confirms the subscription
+                while (pubsub.get_message(timeout=1.0) or {}).get('type') != 'subscribe':
+                    pass
+                # Sends missed while unsubscribed are in no buffer; reload from the database
+                recent_messages.clear()
+                self.subscribed.set()
+                for message in pubsub.listen():
+                    if message['type'] != 'message':
+                        continue
+                    data = json.loads(message['data'])
+                    if data['origin'] != self.origin:
+                        recent_messages.append(data['channel_id'], data['payload'])
+            except Exception as e:
+                self.subscribed.clear()
+                logger.warning('Chat relay disconnected: %s', e, extra={'event': 'chat.relay_disconnected'})
+                time.sleep(1)
+
+
+def _load_history(channel_id, before_id, limit, after_id=None):
+    """
+    Up to limit messages, oldest first, authors joined in: the newest before
+    before_id or, given after_id, the oldest after it
+    """
+    from app import db
+    from app.models import ChatMessage, User
+
+    query = db.session.query(
+        ChatMessage.id, ChatMessage.content, ChatMessage.timestamp, ChatMessage.user_id,
+        User.username, User.full_name
+    ).join(User, ChatMessage.user_id == User.id).filter(ChatMessage.channel_id == channel_id)
+    if after_id is not None:
+        rows = query.filter(ChatMessage.id > after_id).order_by(ChatMessage.id).limit(limit).all()
+    else:
+        if before_id is not None:
+            query = query.filter(ChatMessage.id < before_id)
+        rows = query.order_by(ChatMessage.id.desc()).limit(limit).all()[::-1]
+
+    return [
+        message_payload(row.id, row.content, row.timestamp, row.user_id,
+                        row.username, User.initials_for(row.full_name, row.username))
+        for row in rows
+    ]
+
+
+def chat_history(channel_id, before_id=None, limit=HISTORY_PAGE_SIZE):
+    """
+    One page of a room's history, oldest first, and whether older messages
+    exist. The newest page comes from the ring buffer once it is warm.
+    """
+    from flask import current_app
+
+    # Until the relay is subscribed, other workers' sends would be missing from
+    # a filled buffer; the first read waits briefly for it, then skips the fill
+    relay = current_app.extensions.get('chat_relay')
+    relayed = relay is None or relay.ensure_started(timeout=RELAY_SUBSCRIBE_TIMEOUT)
+
+    cached = recent_messages.page(channel_id, before_id, limit)
+    if cached is not None:
+        return cached
+
+    # A cold newest page loads enough to warm the buffer
+    fetch = limit if before_id is not None else max(limit, recent_messages.size)
+    messages = _load_history(channel_id, before_id, fetch + 1)
+    has_more = len(messages) > fetch
+    messages = messages[-fetch:]
+
+    if before_id is None:
+        # Sent messages the chat writer has not flushed yet
+        saved_ids = {message['id'] for message in messages}
+        queued = [message for message in pending_messages(channel_id) if message['id'] not in saved_ids]
+        if queued:
+            messages = sorted(messages + queued, key=lambda message: message['id'])
+        if relayed:
+            recent_messages.fill(channel_id, messages, complete=not has_more)
+
+    return messages[-limit:], has_more or len(messages) > limit
+
+
+def chat_context(channel_id, message_id, limit=HISTORY_PAGE_SIZE):
+    """
+    A page of history around message_id (a search hit), oldest first, as
+    (messages, has_older, has_newer); None when the room has no such message.
+    Scrolling back from it continues with chat_history(before_id=...).
+    """
+    older = limit // 2
+    newer = limit - older - 1
+
+    messages = _load_history(channel_id, message_id + 1, older + 2)
+    if not messages or messages[-1]['id'] != message_id:
+        return None
+    has_older = len(messages) > older + 1
+    messages = messages[-(older + 1):]
+
+    following = _load_history(channel_id, None, newer + 1, after_id=message_id)
+    has_newer = len(following) > newer
+    if not has_newer:
+        # Sent messages the chat writer has not flushed yet
+        saved_ids = {message['id'] for message in following}
+        following += sorted((message for message in pending_messages(channel_id)
+                             if message['id'] > message_id and message['id'] not in saved_ids),
+                            key=lambda message: message['id'])
+        has_newer = len(following) > newer
+    return messages + following[:newer], has_older, has_newer
+
+
+def _exit_on_sigterm(signum, frame):
+    # Turns SIGTERM into a normal exit so the atexit flush runs
+    sys.exit(128 + signum)
+
+
+def flush_on_sigterm():
+    """Exit normally on SIGTERM so the writer's queue is flushed; for the server entry points only"""
+    # Not in init_chat: scripts and worker pools that create the app keep the
+    # default, and a gunicorn worker's own handler is left alone
+    if threading.current_thread() is threading.main_thread() and signal.getsignal(signal.SIGTERM) is signal.SIG_DFL:
+        signal.signal(signal.SIGTERM, _exit_on_sigterm)
+
+
+def init_chat(app):
+    """Set up the cross-worker relay and, when CHAT_WRITE_BEHIND is set, the writer"""
+    global _id_block_size
+    message_queue = app.config.get('SOCKETIO_MESSAGE_QUEUE')
+    # Several workers send: a reserved block per process would interleave ids
+    _id_block_size = 1 if message_queue else ID_BLOCK_SIZE
+    if message_queue and message_queue.startswith(('redis://', 'rediss://')):
+        app.extensions['chat_relay'] = RecentMessagesRelay(message_queue, app.config['SOCKETIO_CHANNEL'] + '-chat')
+    elif message_queue:
+        recent_messages.enabled = False
+
+    if not app.config.get('CHAT_WRITE_BEHIND'):
+        return
+
+    writer = ChatWriter(
+        app,
+        interval_ms=app.config['CHAT_FLUSH_INTERVAL_MS'],
+        batch_size=app.config['CHAT_FLUSH_BATCH_SIZE'],
+    )
+    app.extensions['chat_writer'] = writer
+    atexit.register(writer.close)
@@ -0,0 +1,116 @@
+"""
+Counters Utility for UniPortal
+Denormalized per-class and per-course counters. Write paths bump them in the
+same transaction as the row they add or change; reconcile_counters() repairs
+any drift (e.g. students changing class) from a periodic Celery task.
+"""
+
+CLASS_COUNTERS = (
+    'student_count', 'assignment_count', 'pending_grade_count',
+    'broadcast_count', 'forum_reply_count'
+)
+COURSE_COUNTERS = ('assignment_count', 'pending_grade_count')
+
+
+def _bump(model, row_id, deltas):
+    """Atomic `col = col + delta` UPDATE; no read, no lost updates"""
+    from app import db
+
+    if not row_id:
+        return
+    changes = {
+        getattr(model, name): getattr(model, name) + delta
+        for name, delta in deltas.items() if delta
+    }
+    if changes:
+        db.session.query(model).filter(model.id == row_id).update(changes, synchronize_session=False)
+
+
+def bump_class_counters(class_group_id, **deltas):
+    from app.models import ClassGroup
+    _bump(ClassGroup, class_group_id, deltas)
+
+
+def bump_course_counters(course_id, **deltas):
+    from app.models import Course
+    _bump(Course, course_id, deltas)
+
+
+def class_summary(class_group_id):
+    """Counters of a class in one primary-key lookup (all zero without a class)"""
+    from app import db
+    from app.models import ClassGroup
+
+    columns = [getattr(ClassGroup, name) for name in CLASS_COUNTERS]
+    row = db.session.query(*columns).filter(ClassGroup.id == class_group_id).first() if class_group_id else None
+    if row is None:
+        return dict.fromkeys(CLASS_COUNTERS, 0)
+    return dict(zip(CLASS_COUNTERS, row))
+
+
+def count_assignment(assignment, class_group_id, sign=1):
+    """Add (or with sign=-1 remove) a submission from its class and course counters"""
+    pending = sign if assignment.grade is None else 0
+    bump_class_counters(class_group_id, assignment_count=sign, pending_grade_count=pending)
+    bump_course_counters(assignment.course_id, assignment_count=sign, pending_grade_count=pending)
+
+
+def count_grading(assignment, was_pending):
+    """A pending submission got its first grade"""
+    if not was_pending or assignment.grade is None:
+        return
+    bump_class_counters(assignment.user.class_group_id, pending_grade_count=-1)
+    bump_course_counters(assignment.course_id, pending_grade_count=-1)
+
+
+def reconcile_counters():
+    """
+    Recompute every counter from the source tables; returns rows repaired.
+    One `SET col = (SELECT COUNT(*) ...)` UPDATE per table, so a bump that
+    commits meanwhile is never overwritten by counts read before it.
+    """
+    from sqlalchemy import or_, select, update, func
+    from app import db
+    from app.models import ClassGroup, Course, User, Assignment, Broadcast, ForumPost, ForumReply
+
+    def class_assignments(*criteria):
+        return select(func.count(Assignment.id)).join(User, Assignment.user_id == User.id).where(
+            User.class_group_id == ClassGroup.id, *criteria
+        ).scalar_subquery()
+
+    def course_assignments(*criteria):
+        return select(func.count(Assignment.id)).where(
+            Assignment.course_id == Course.id, *criteria
+        ).scalar_subquery()
+
+    class_counts = {
+        'student_count': select(func.count(User.id)).where(
+            User.class_group_id == ClassGroup.id, User.role == 'Student'
+        ).scalar_subquery(),
+        'assignment_count': class_assignments(),
+        'pending_grade_count': class_assignments(Assignment.grade.is_(None)),
+        'broadcast_count': select(func.count(Broadcast.id)).where(
+            Broadcast.class_group_id == ClassGroup.id
+        ).scalar_subquery(),
+        'forum_reply_count': select(func.count(ForumReply.id)).join(
+            ForumPost, ForumReply.post_id == ForumPost.id
+        ).where(ForumPost.class_group_id == ClassGroup.id).scalar_subquery(),
+    }
+    course_counts = {
+        'assignment_count': course_assignments(),
+        'pending_grade_count': course_assignments(Assignment.grade.is_(None)),
+    }
+
+    repaired = 0
+    for model, counts in ((ClassGroup, class_counts), (Course, course_counts)):
+        # Wait for in-flight bumps (row locks, PostgreSQL) so the UPDATE's snapshot includes them
+        db.session.query(model.id).with_for_update().all()
+        repaired += db.session.execute(
+            update(model)
+            .where(or_(*[getattr(model, name) != count for name, count in counts.items()]))
+            .values({getattr(model, name): count for name, count in counts.items()})
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    db.session.commit()
+    return repaired
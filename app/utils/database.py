@@ -0,0 +1,82 @@
+"""
+Database Utility for UniPortal
+Environment-driven engine profiles: pooled Postgres for production and a
+hardened SQLite (WAL, busy timeout) for small installs, where the web app,
+Socket.IO handlers and the Celery worker all write to the same file
+"""
+
+import os
+
+DEFAULT_DATABASE_URL = 'sqlite:///uniportal.db'
+
+
+def _env_int(environ, name, default):
+    return int(environ.get(name, default))
+
+
+def database_config(environ=None):
+    """
+    SQLAlchemy settings for the database named by DATABASE_URL.
+
+    Postgres gets a sized connection pool with pre-ping and recycling.
+    SQLite gets a busy timeout and the PRAGMAs applied on every new
+    connection by init_database(); set SQLITE_HARDENED=0 to fall back to
+    SQLite's defaults.
+    """
+    environ = os.environ if environ is None else environ
+    url = environ.get('DATABASE_URL') or DEFAULT_DATABASE_URL
+
+    # Heroku-style URLs use the scheme SQLAlchemy 1.4+ no longer accepts
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+
+    config = {
+        'SQLALCHEMY_DATABASE_URI': url,
+        'SQLALCHEMY_ENGINE_OPTIONS': {},
+        'SQLITE_PRAGMAS': {},
+    }
+
+    if url.startswith('postgresql'):
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': _env_int(environ, 'DB_POOL_SIZE', 10),
+            'max_overflow': _env_int(environ, 'DB_MAX_OVERFLOW', 20),
+            'pool_timeout': _env_int(environ, 'DB_POOL_TIMEOUT', 30),
+            'pool_recycle': _env_int(environ, 'DB_POOL_RECYCLE', 1800),
+            'pool_pre_ping': True,
+        }
+    elif url.startswith('sqlite') and environ.get('SQLITE_HARDENED', '1') != '0':
+        busy_timeout_ms = _env_int(environ, 'SQLITE_BUSY_TIMEOUT_MS', 5000)
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            # Socket.IO handlers and request threads share the engine
+            'connect_args': {'timeout': busy_timeout_ms / 1000, 'check_same_thread': False},
+        }
+        config['SQLITE_PRAGMAS'] = {
+            'journal_mode': 'WAL',             # readers no longer block the writer
+            'busy_timeout': busy_timeout_ms,   # wait for the write lock instead of failing
+            'synchronous': 'NORMAL',           # safe with WAL, far fewer fsyncs
+        }
+
+    return config
+
+
+def init_database(app):
+    """Apply the SQLite PRAGMAs from the app config to every new connection"""
+    from sqlalchemy import event
+    from app import db
+
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if not pragmas:
+        return
+
+    with app.app_context():
+        engine = db.engine
+
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
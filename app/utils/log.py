@@ -0,0 +1,188 @@
+"""
+Log Utility for UniPortal
+Structured logging for everything under `app`. Modules log through
+`logging.getLogger(__name__)` with an `event` name and fields in `extra`:
+
+    logger.info('Message sent', extra={'event': 'chat.message', 'room': room})
+
+Records are put on a bounded queue by the calling thread and written to
+stdout (one JSON object per line, or plain text with LOG_FORMAT=text) by a
+listener thread, so a handler never waits on a terminal or log collector.
+When the queue is full records are dropped and counted rather than block.
+
+High-volume events are sampled: LOG_SAMPLE_RATES maps an event name to the
+fraction of its records kept (warnings and errors are always kept), and kept
+records carry that rate so counts can be scaled back up.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# LogRecord attributes; anything else on a record is an `extra` field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+def record_fields(record):
+    """The `extra` fields of a record"""
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(record_fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with the fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return line
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps the given fraction of records of each sampled event below WARNING"""
+
+    def __init__(self, rates, rng=random.random):
+        super().__init__()
+        self.rates = dict(rates)
+        self.rng = rng
+
+    def filter(self, record):
+        rate = self.rates.get(getattr(record, 'event', None))
+        if rate is None or record.levelno >= logging.WARNING:
+            return True
+        if rate < 1 and self.rng() >= rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking on a full queue"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Render the message and traceback here; the listener only sees plain data
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)  # waits for room, unlike records
+
+
+class AsyncLogging:
+    """The queue, its handler on the `app` logger and the listener thread writing it out"""
+
+    def __init__(self, logger, formatter, level=logging.INFO, queue_size=10000, sample_rates=None, stream=None):
+        self.logger = logger
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        if sample_rates:
+            self.handler.addFilter(SamplingFilter(sample_rates))
+        self.output = logging.StreamHandler(stream or sys.stdout)
+        self.output.setFormatter(formatter)
+        self.listener = None
+        self._lock = threading.Lock()
+
+        logger.setLevel(level)
+        logger.addHandler(self.handler)
+        logger.propagate = False
+
+    def start(self):
+        with self._lock:
+            if self.listener is None:
+                self.listener = _Listener(self.queue, self.output, respect_handler_level=True)
+                self.listener.start()
+
+    def stop(self):
+        """Write out what is queued and stop the listener"""
+        with self._lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+        if self.handler.dropped:
+            self.output.handle(logging.makeLogRecord({
+                'name': self.logger.name, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': 'Log records dropped on a full queue', 'event': 'log.dropped',
+                'dropped': self.handler.dropped,
+            }))
+
+    def after_fork(self):
+        # The listener thread does not survive fork (preloading servers); start one in the child
+        self._lock = threading.Lock()
+        self.listener = None
+        self.start()
+
+
+_async_logging = None
+
+
+def init_logging(app):
+    """Route the `app` logger (app.logger and every app.* module) through the async handler"""
+    global _async_logging
+    from flask.logging import default_handler
+
+    logger = logging.getLogger(app.import_name)
+    logger.removeHandler(default_handler)
+    if _async_logging is not None:
+        # Another create_app() in this process (Celery tasks, scripts) already set it up
+        app.extensions['logging'] = _async_logging
+        return
+
+    formatter = TextFormatter() if app.config['LOG_FORMAT'] == 'text' else JsonFormatter()
+    async_logging = AsyncLogging(
+        logger,
+        formatter,
+        level=app.config['LOG_LEVEL'],
+        queue_size=app.config['LOG_QUEUE_SIZE'],
+        sample_rates=app.config['LOG_SAMPLE_RATES'],
+    )
+    async_logging.start()
+    app.extensions['logging'] = _async_logging = async_logging
+    atexit.register(async_logging.stop)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=async_logging.after_fork)
@@ -0,0 +1,329 @@
+"""
+Metrics Utility for UniPortal
+Prometheus text-format metrics for Flask endpoints, Socket.IO events and
+Celery tasks, plus database pool and cache gauges.
+
+Request and Socket.IO metrics live in the serving process. Celery tasks run
+in separate worker processes, so their metrics are kept in a Redis hash
+(the broker by default) that the web process reads when /metrics is scraped.
+"""
+
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class LocalStore:
+    """Thread-safe in-process sample store"""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def incr_many(self, increments):
+        with self._lock:
+            for key, amount in increments:
+                self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class RedisStore:
+    """Sample store shared by every process through one Redis hash"""
+
+    def __init__(self, url, hash_key='uniportal:metrics'):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.hash_key = hash_key
+
+    def incr_many(self, increments):
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key, amount in increments:
+                pipe.hincrbyfloat(self.hash_key, json.dumps(key), amount)
+            pipe.execute()
+        except Exception as e:
+            logger.warning('Metrics write error: %s', e, extra={'event': 'metrics.error', 'operation': 'write'})
+
+    def snapshot(self):
+        try:
+            raw = self.client.hgetall(self.hash_key)
+        except Exception as e:
+            logger.warning('Metrics read error: %s', e, extra={'event': 'metrics.error', 'operation': 'read'})
+            return {}
+        snapshot = {}
+        for field, value in raw.items():
+            name, labels, suffix = json.loads(field)
+            snapshot[(name, tuple(labels), suffix)] = float(value)
+        return snapshot
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(), store=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.store = store
+
+    def _label_values(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _samples(self, snapshot):
+        return sorted((labels, suffix, value) for (name, labels, suffix), value in snapshot.items()
+                      if name == self.name)
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.store.incr_many([((self.name, self._label_values(labels), ''), amount)])
+
+    def render(self, snapshot):
+        lines = self.header()
+        for labels, _, value in self._samples(snapshot):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), store=None, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames, store)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        label_values = self._label_values(labels)
+        index = bisect_left(self.buckets, value)
+        bucket = self.buckets[index] if index < len(self.buckets) else float('inf')
+        self.store.incr_many([
+            ((self.name, label_values, f'bucket:{bucket}'), 1),
+            ((self.name, label_values, 'sum'), value),
+            ((self.name, label_values, 'count'), 1),
+        ])
+
+    def render(self, snapshot):
+        series = {}
+        for labels, suffix, value in self._samples(snapshot):
+            series.setdefault(labels, {})[suffix] = value
+
+        lines = self.header()
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bucket in self.buckets + (float('inf'),):
+                cumulative += values.get(f'bucket:{bucket}', 0)
+                le = ('le', _format_value(bucket))
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {_format_value(cumulative)}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(values.get("sum", 0))}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {_format_value(values.get("count", 0))}')
+        return lines
+
+
+class GaugeFunction(Metric):
+    """Gauge (or counter) read from a callback at scrape time"""
+
+    def __init__(self, name, documentation, callback, type='gauge'):
+        super().__init__(name, documentation)
+        self.callback = callback
+        self.type = type
+
+    def render(self, snapshot):
+        lines = self.header()
+        for labels, value in self.callback():
+            names = tuple(labels)
+            lines.append(f'{self.name}{_format_labels(names, tuple(labels[n] for n in names))} {_format_value(value)}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        snapshots = {}
+        lines = []
+        for metric in self.metrics:
+            store = metric.store
+            if store is not None and id(store) not in snapshots:
+                snapshots[id(store)] = store.snapshot()
+            try:
+                lines.extend(metric.render(snapshots.get(id(store), {})))
+            except Exception as e:
+                logger.warning('Metrics render error: %s', e,
+                               extra={'event': 'metrics.error', 'operation': 'render', 'metric': metric.name})
+        return '\n'.join(lines) + '\n'
+
+
+local_store = LocalStore()
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    'uniportal_http_request_duration_seconds', 'Flask request latency by endpoint.',
+    ('endpoint', 'method'), local_store))
+http_requests = registry.register(Counter(
+    'uniportal_http_requests_total', 'Flask requests by endpoint and status.',
+    ('endpoint', 'method', 'status'), local_store))
+
+socketio_event_duration = registry.register(Histogram(
+    'uniportal_socketio_event_duration_seconds', 'Socket.IO handler latency by event.',
+    ('event',), local_store))
+socketio_events = registry.register(Counter(
+    'uniportal_socketio_events_total', 'Socket.IO events handled.',
+    ('event',), local_store))
+socketio_event_errors = registry.register(Counter(
+    'uniportal_socketio_event_errors_total', 'Socket.IO handlers that raised.',
+    ('event',), local_store))
+
+# Store replaced by the shared Redis store in init_metrics when available
+celery_task_duration = registry.register(Histogram(
+    'uniportal_celery_task_duration_seconds', 'Celery task run time.',
+    ('task',), local_store, buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)))
+celery_tasks = registry.register(Counter(
+    'uniportal_celery_tasks_total', 'Celery tasks finished by final state.',
+    ('task', 'state'), local_store))
+celery_task_failures = registry.register(Counter(
+    'uniportal_celery_task_failures_total', 'Celery task failures by exception type.',
+    ('task', 'exception'), local_store))
+
+
+def track_event_metrics(event):
+    """Count and time a Socket.IO event handler"""
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return handler(*args, **kwargs)
+            except Exception:
+                socketio_event_errors.inc(event=event)
+                raise
+            finally:
+                socketio_events.inc(event=event)
+                socketio_event_duration.observe(time.perf_counter() - started, event=event)
+        return wrapper
+    return decorator
+
+
+def _register_gauges(app):
+    from app import db
+    from app.utils.cache import cache
+
+    def pool_stats():
+        with app.app_context():
+            pool = db.engine.pool
+        stats = []
+        for stat in ('size', 'checkedout', 'overflow', 'checkedin'):
+            reader = getattr(pool, stat, None)
+            if callable(reader):
+                stats.append(({'stat': stat}, reader()))
+        return stats
+
+    def cache_hit_ratio():
+        lookups = cache.hits + cache.misses
+        return [({}, cache.hits / lookups if lookups else 0)]
+
+    registry.register(GaugeFunction(
+        'uniportal_db_pool_connections', 'SQLAlchemy connection pool state.', pool_stats))
+    registry.register(GaugeFunction(
+        'uniportal_cache_hits_total', 'Cache lookups served from the cache.',
+        lambda: [({}, cache.hits)], type='counter'))
+    registry.register(GaugeFunction(
+        'uniportal_cache_misses_total', 'Cache lookups that missed.',
+        lambda: [({}, cache.misses)], type='counter'))
+    registry.register(GaugeFunction(
+        'uniportal_cache_hit_ratio', 'Share of cache lookups that hit since start.', cache_hit_ratio))
+
+
+def _connect_celery_signals():
+    from celery import signals
+
+    started = {}
+
+    @signals.task_prerun.connect(weak=False)
+    def task_started(task_id=None, **kwargs):
+        started[task_id] = time.perf_counter()
+
+    @signals.task_postrun.connect(weak=False)
+    def task_finished(task_id=None, task=None, state=None, **kwargs):
+        began = started.pop(task_id, None)
+        name = getattr(task, 'name', 'unknown')
+        if began is not None:
+            celery_task_duration.observe(time.perf_counter() - began, task=name)
+        celery_tasks.inc(task=name, state=state or 'UNKNOWN')
+
+    @signals.task_failure.connect(weak=False)
+    def task_failed(sender=None, exception=None, **kwargs):
+        celery_task_failures.inc(task=getattr(sender, 'name', 'unknown'),
+                                 exception=type(exception).__name__)
+
+
+def init_metrics(app):
+    """Hook request timing, Celery signals and gauges into the app"""
+    from flask import g, request
+
+    redis_url = app.config.get('METRICS_REDIS_URL')
+    if redis_url:
+        try:
+            shared = RedisStore(redis_url)
+            for metric in (celery_task_duration, celery_tasks, celery_task_failures):
+                metric.store = shared
+        except ImportError:
+            logger.warning('redis not installed, Celery metrics stay per-process', extra={'event': 'metrics.no_redis'})
+
+    if not getattr(registry, '_app_hooks_installed', False):
+        registry._app_hooks_installed = True
+        _connect_celery_signals()
+        _register_gauges(app)
+
+    @app.before_request
+    def start_request_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'
+            http_request_duration.observe(time.perf_counter() - started,
+                                          endpoint=endpoint, method=request.method)
+            http_requests.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        return response
@@ -0,0 +1,114 @@
+"""
+Pagination Utility for UniPortal
+Keyset (seek) pagination for list endpoints. Pages are ordered newest first
+on (timestamp, id) and continue from an opaque cursor holding the last row's
+key, so the database seeks straight into the list's index instead of
+counting past OFFSET rows - a deep page costs the same as the first one.
+
+Cursors are the last row's key, not a position, so rows added while a user
+scrolls never shift or repeat the pages that follow.
+"""
+
+import base64
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Cursor that was tampered with or did not come from encode_cursor"""
+
+
+def encode_cursor(timestamp, row_id):
+    raw = f'{timestamp.isoformat()}|{row_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(timestamp, id) from a cursor; raises InvalidCursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, _, row_id = raw.partition('|')
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {cursor!r}') from e
+
+
+def page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Requested page size clamped to 1..maximum"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+class KeysetPage:
+    """One page of rows plus the cursor of the page after it (None on the last)"""
+
+    def __init__(self, items, next_cursor, limit):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.limit = limit
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_paginate(query, timestamp_column, id_column, cursor=None, limit=DEFAULT_PAGE_SIZE, key=None):
+    """
+    Newest-first page of query after cursor.
+
+    key maps a result row to its (timestamp, id); by default both are read
+    from the row by column name. Pass it when the query returns tuples.
+    """
+    from sqlalchemy import and_, or_
+
+    if cursor:
+        after_timestamp, after_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            timestamp_column < after_timestamp,
+            and_(timestamp_column == after_timestamp, id_column < after_id)
+        ))
+
+    rows = query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1).all()
+    items = rows[:limit]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        if key is None:
+            next_cursor = encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
+        else:
+            next_cursor = encode_cursor(*key(last))
+    return KeysetPage(items, next_cursor, limit)
+
+
+def request_page(query, timestamp_column, id_column, default=DEFAULT_PAGE_SIZE, key=None):
+    """keyset_paginate driven by the request's ?cursor= and ?limit= arguments"""
+    from flask import request
+
+    return keyset_paginate(
+        query, timestamp_column, id_column,
+        cursor=request.args.get('cursor'),
+        limit=page_size(request.args.get('limit'), default=default),
+        key=key,
+    )
+
+
+def partial_response(template, page, **context):
+    """JSON body for "load more" requests: the rendered rows and the next cursor"""
+    from flask import jsonify, render_template
+
+    return jsonify({
+        'html': render_template(template, page=page, **context),
+        'next_cursor': page.next_cursor,
+    })
@@ -0,0 +1,212 @@
+"""
+Presence Utility for UniPortal
+Who is connected to each class chat room. Every Socket.IO connection
+(tab) is recorded under its room, and a user counts as online while any of
+their connections is, so extra tabs and reconnects don't flap the list.
+
+Rooms touched by a join, leave or disconnect are marked dirty, and a
+background task emits `presence` (count and members) to each dirty room at
+most once per PRESENCE_DEBOUNCE_MS - and only when the member list changed.
+
+The registry is in-process for a single worker. Behind a Redis Socket.IO
+message queue it lives in Redis instead, one hash per room; every worker
+refreshes a heartbeat key, and connections of a worker whose heartbeat
+expired (crashed, killed) are dropped on the next read.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+WORKER_ID = uuid.uuid4().hex
+
+
+def _member_list(entries):
+    """Unique users from (user id, username) connection entries, by name"""
+    users = {user_id: username for user_id, username in entries}
+    return [{'user_id': user_id, 'user': username}
+            for user_id, username in sorted(users.items(), key=lambda item: item[1].lower())]
+
+
+class LocalPresence:
+    """Registry for a single worker"""
+
+    def __init__(self):
+        self._rooms = {}  # room -> {sid: (user id, username)}
+        self._lock = threading.Lock()
+
+    def add(self, room, sid, user_id, username):
+        with self._lock:
+            self._rooms.setdefault(room, {})[sid] = (user_id, username)
+
+    def remove(self, room, sid):
+        with self._lock:
+            connections = self._rooms.get(room, {})
+            connections.pop(sid, None)
+            if not connections:
+                self._rooms.pop(room, None)
+
+    def members(self, room):
+        with self._lock:
+            return _member_list(self._rooms.get(room, {}).values())
+
+    def heartbeat(self):
+        pass
+
+
+class RedisPresence:
+    """Registry shared by every worker through Redis"""
+
+    def __init__(self, url, prefix='uniportal-presence', worker_ttl=60):
+        import redis
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.worker_ttl = worker_ttl
+        self._beat_at = 0
+
+    def _room_key(self, room):
+        return f'{self.prefix}:room:{room}'
+
+    def _worker_key(self, worker_id):
+        return f'{self.prefix}:worker:{worker_id}'
+
+    def add(self, room, sid, user_id, username):
+        self.heartbeat()
+        self.client.hset(self._room_key(room), f'{WORKER_ID}:{sid}', json.dumps([user_id, username]))
+
+    def remove(self, room, sid):
+        self.client.hdel(self._room_key(room), f'{WORKER_ID}:{sid}')
+
+    def members(self, room):
+        connections = self.client.hgetall(self._room_key(room))
+        if not connections:
+            return []
+
+        workers = sorted({field.split(':', 1)[0] for field in connections})
+        alive = {worker for worker, beat in zip(workers, self.client.mget(
+            [self._worker_key(worker) for worker in workers])) if beat}
+        dead = [field for field in connections if field.split(':', 1)[0] not in alive]
+        if dead:
+            self.client.hdel(self._room_key(room), *dead)
+
+        return _member_list(tuple(json.loads(entry)) for field, entry in connections.items()
+                            if field.split(':', 1)[0] in alive)
+
+    def heartbeat(self):
+        now = time.monotonic()
+        if now - self._beat_at >= self.worker_ttl / 3:
+            self.client.set(self._worker_key(WORKER_ID), 1, ex=self.worker_ttl)
+            self._beat_at = now
+
+
+class PresenceTracker:
+    """Registry plus debounced `presence` broadcasts for changed rooms"""
+
+    def __init__(self, registry, emit, debounce=1.0):
+        self.registry = registry
+        self.emit = emit
+        self.debounce = debounce
+        self._sid_rooms = {}  # sid -> rooms it joined, on this worker
+        self._dirty = set()
+        self._last_sent = {}  # room -> member list last emitted
+        self._lock = threading.Lock()
+
+    def join(self, room, sid, user_id, username):
+        self.registry.add(room, sid, user_id, username)
+        with self._lock:
+            self._sid_rooms.setdefault(sid, set()).add(room)
+            self._dirty.add(room)
+
+    def leave(self, room, sid):
+        self.registry.remove(room, sid)
+        with self._lock:
+            self._sid_rooms.get(sid, set()).discard(room)
+            self._dirty.add(room)
+
+    def disconnect(self, sid):
+        with self._lock:
+            rooms = self._sid_rooms.pop(sid, set())
+            self._dirty.update(rooms)
+        for room in rooms:
+            self.registry.remove(room, sid)
+
+    def snapshot(self, room):
+        """{'room', 'count', 'users'} for one room"""
+        users = self.registry.members(room)
+        return {'room': room, 'count': len(users), 'users': users}
+
+    def online_count(self, room):
+        return len(self.registry.members(room))
+
+    def tick(self):
+        """Emit the presence of dirty rooms whose member list changed; returns rooms emitted"""
+        self.registry.heartbeat()
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+
+        emitted = 0
+        for room in dirty:
+            snapshot = self.snapshot(room)
+            if snapshot['users'] == self._last_sent.get(room):
+                continue  # a second tab or a reconnect
+            if snapshot['users']:
+                self._last_sent[room] = snapshot['users']
+            else:
+                self._last_sent.pop(room, None)
+            self.emit(room, snapshot)
+            emitted += 1
+        return emitted
+
+
+def _emit_presence(room, snapshot):
+    from app import socketio
+
+    socketio.emit('presence', snapshot, to=room)
+
+
+def _run_ticks(tracker):
+    from app import socketio
+
+    while True:
+        socketio.sleep(tracker.debounce)
+        try:
+            tracker.tick()
+        except Exception:
+            logger.exception('Presence tick failed', extra={'event': 'presence.tick_failed'})
+
+
+_ticker_lock = threading.Lock()
+_ticker_started = False
+
+
+def presence():
+    """This process's tracker, starting its ticker on first use (once per worker)"""
+    global _ticker_started
+    from flask import current_app
+    from app import socketio
+
+    tracker = current_app.extensions['presence']
+    with _ticker_lock:
+        if not _ticker_started:
+            socketio.start_background_task(_run_ticks, tracker)
+            _ticker_started = True
+    return tracker
+
+
+def init_presence(app):
+    """In-process registry, or Redis when Socket.IO runs behind a Redis queue"""
+    url = app.config.get('PRESENCE_REDIS_URL')
+    if url:
+        registry = RedisPresence(url, prefix=app.config['SOCKETIO_CHANNEL'] + '-presence',
+                                 worker_ttl=app.config['PRESENCE_WORKER_TTL_SECONDS'])
+    else:
+        registry = LocalPresence()
+
+    app.extensions['presence'] = PresenceTracker(
+        registry, _emit_presence, debounce=app.config['PRESENCE_DEBOUNCE_MS'] / 1000
+    )
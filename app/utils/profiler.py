@@ -0,0 +1,220 @@
+"""
+Profiler Utility for UniPortal
+Sampling profiler WSGI middleware. A single background thread samples the
+stacks of in-flight requests; a request's samples are kept when it was
+picked by PROFILER_SAMPLE_RATE or ran longer than PROFILER_SLOW_THRESHOLD_MS,
+and are stored as collapsed stacks per Flask endpoint for flamegraph tools.
+
+The middleware is only installed when PROFILER_ENABLED is set, so a
+disabled profiler adds nothing to the request path. Under eventlet or gevent
+every in-flight request shares one OS thread, so requests are tracked by
+greenlet: a suspended one is sampled where it is waiting, the running one
+from the thread's current frame.
+"""
+
+import logging
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_ENVIRON_KEY = 'uniportal.endpoint'
+MAX_STACK_DEPTH = 64
+
+
+def _native_modules():
+    """threading and time as they were before any eventlet monkey patching"""
+    try:
+        from eventlet.patcher import original
+        return original('threading'), original('time')
+    except ImportError:
+        import threading
+        return threading, time
+
+
+def _green_threads():
+    """Whether requests run on greenlets sharing OS threads (eventlet or gevent patching)"""
+    try:
+        from eventlet.patcher import is_monkey_patched
+        if is_monkey_patched('thread'):
+            return True
+    except ImportError:
+        pass
+    try:
+        from gevent.monkey import is_module_patched
+        return is_module_patched('threading')
+    except ImportError:
+        return False
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    path = code.co_filename.replace('\\', '/').split('/')
+    return f"{'/'.join(path[-2:])}:{code.co_name}"
+
+
+def collapse_stack(frame):
+    """Root-first 'a;b;c' stack of a frame, as used by flamegraph.pl and speedscope"""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+def _safe_name(endpoint):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint or 'unmatched')
+
+
+class ProfileStore:
+    """Collapsed stacks per endpoint, one append-only file per endpoint and process"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _files(self, endpoint=None):
+        if not os.path.isdir(self.directory):
+            return
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.folded'):
+                continue
+            if endpoint is None or name.rsplit('.', 2)[0] == _safe_name(endpoint):
+                yield os.path.join(self.directory, name)
+
+    def add(self, endpoint, samples):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{_safe_name(endpoint)}.{os.getpid()}.folded')
+        with open(path, 'a') as f:
+            for stack, count in samples.items():
+                f.write(f'{stack} {count}\n')
+
+    @staticmethod
+    def _read(path):
+        with open(path) as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if stack and count.isdigit():
+                    yield stack, int(count)
+
+    def load(self, endpoint):
+        """Samples for an endpoint merged across requests and worker processes"""
+        merged = Counter()
+        for path in self._files(endpoint):
+            for stack, count in self._read(path):
+                merged[stack] += count
+        return merged
+
+    def summary(self):
+        """{endpoint: total samples} for every profiled endpoint"""
+        totals = Counter()
+        for path in self._files():
+            endpoint = os.path.basename(path).rsplit('.', 2)[0]
+            totals[endpoint] += sum(count for _, count in self._read(path))
+        return dict(totals)
+
+    def clear(self):
+        for path in list(self._files()):
+            os.remove(path)
+
+
+class SamplingProfiler:
+    """Background thread sampling the stacks of registered request threads or greenlets"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._active = {}
+        self._threading, self._time = _native_modules()
+        self._green = _green_threads()
+        self._lock = self._threading.Lock()
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = self._threading.Thread(target=self._run, name='uniportal-profiler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._time.sleep(self.interval)
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, green, samples in self._active.values():
+                    # A suspended greenlet keeps its own frame; the running one
+                    # (and a plain thread) is the OS thread's current frame
+                    frame = green.gr_frame if green is not None else None
+                    if frame is None:
+                        frame = frames.get(ident)
+                    if frame is not None:
+                        samples[collapse_stack(frame)] += 1
+
+    def begin(self, token):
+        """Start sampling the calling thread (or greenlet) under token"""
+        green = None
+        if self._green:
+            import greenlet
+            green = greenlet.getcurrent()
+        samples = Counter()
+        with self._lock:
+            self._active[token] = (self._threading.get_ident(), green, samples)
+        self._ensure_started()
+        return samples
+
+    def end(self, token):
+        with self._lock:
+            _, _, samples = self._active.pop(token, (None, None, Counter()))
+        return samples
+
+
+class ProfilerMiddleware:
+    """WSGI middleware keeping samples of picked or slow requests"""
+
+    def __init__(self, wsgi_app, store, sample_rate=0.01, slow_threshold_ms=1000, interval_ms=5):
+        self.wsgi_app = wsgi_app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.profiler = SamplingProfiler(interval_ms / 1000)
+
+    def __call__(self, environ, start_response):
+        token = id(environ)
+        picked = random.random() < self.sample_rate
+        started = time.perf_counter()
+        self.profiler.begin(token)
+        try:
+            return self.wsgi_app(environ, start_response)
+        finally:
+            samples = self.profiler.end(token)
+            elapsed = time.perf_counter() - started
+            if samples and (picked or elapsed >= self.slow_threshold):
+                try:
+                    self.store.add(environ.get(ENDPOINT_ENVIRON_KEY), samples)
+                except OSError as e:
+                    logger.warning('Profiler write error: %s', e, extra={'event': 'profiler.error'})
+
+
+def init_profiler(app):
+    """Install the middleware when PROFILER_ENABLED is set"""
+    store = ProfileStore(app.config['PROFILER_OUTPUT_DIR'])
+    app.extensions['profiler_store'] = store
+
+    if not app.config.get('PROFILER_ENABLED'):
+        return
+
+    @app.before_request
+    def tag_profiled_endpoint():
+        from flask import request
+        request.environ[ENDPOINT_ENVIRON_KEY] = request.endpoint
+
+    app.wsgi_app = ProfilerMiddleware(
+        app.wsgi_app,
+        store,
+        sample_rate=app.config.get('PROFILER_SAMPLE_RATE', 0.01),
+        slow_threshold_ms=app.config.get('PROFILER_SLOW_THRESHOLD_MS', 1000),
+        interval_ms=app.config.get('PROFILER_INTERVAL_MS', 5),
+    )
@@ -0,0 +1,147 @@
+"""
+Query Stats Utility for UniPortal
+Counts SQL statements and database time per request and per Socket.IO event,
+flags statements repeated often enough to be an N+1, and enforces declared
+query budgets when the app runs in test mode
+"""
+
+import time
+from collections import Counter
+from functools import wraps
+from flask import current_app, g, has_app_context, request
+
+N_PLUS_ONE_THRESHOLD = 5
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in test mode when a route or event issues more queries than declared"""
+
+
+class QueryStats:
+    """Statements issued while handling one request or Socket.IO event"""
+
+    def __init__(self, label):
+        self.label = label
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """Statements run at least threshold times - likely lazy loads in a loop"""
+        return [(statement, count) for statement, count in self.statements.most_common()
+                if count >= threshold]
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get('query_start_time')
+    if not start_times:
+        return
+    elapsed = time.perf_counter() - start_times.pop()
+    if has_app_context():
+        stats = g.get('_query_stats')
+        if stats is not None:
+            stats.record(statement, elapsed)
+
+
+def current_query_stats():
+    """Stats of the request or event being handled, or None when not tracking"""
+    return g.get('_query_stats') if has_app_context() else None
+
+
+def query_stats_enabled(app):
+    return app.debug or app.testing or app.config.get('QUERY_STATS_ENABLED', False)
+
+
+def start_query_stats(label):
+    stats = QueryStats(label)
+    g._query_stats = stats
+    return stats
+
+
+def finish_query_stats(stats, budget=None):
+    """Log the totals, warn about likely N+1s and enforce the budget in test mode"""
+    g.pop('_query_stats', None)
+    app = current_app._get_current_object()
+    threshold = app.config.get('QUERY_STATS_N_PLUS_ONE_THRESHOLD', N_PLUS_ONE_THRESHOLD)
+
+    app.logger.info('%s: %d queries in %.1f ms', stats.label, stats.count, stats.duration_ms,
+                    extra={'event': 'db.query_stats', 'label': stats.label, 'queries': stats.count,
+                           'duration_ms': round(stats.duration_ms, 1)})
+    for statement, count in stats.repeated(threshold):
+        app.logger.warning('Possible N+1 in %s: statement ran %d times: %s',
+                           stats.label, count, ' '.join(statement.split())[:300],
+                           extra={'event': 'db.n_plus_one', 'label': stats.label, 'count': count})
+
+    if budget is not None and app.testing and stats.count > budget:
+        raise QueryBudgetExceeded(
+            f'{stats.label} issued {stats.count} queries (budget {budget})'
+        )
+
+
+def query_budget(max_queries):
+    """
+    Declare the most queries a route may issue. Checked in test mode only.
+    Place directly under @main.route so the budget sits on the registered view.
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def track_event_queries(event, budget=None):
+    """Collect query stats around a Socket.IO event handler"""
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(*args, **kwargs):
+            if not query_stats_enabled(current_app):
+                return handler(*args, **kwargs)
+            stats = start_query_stats(f'socket:{event}')
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                finish_query_stats(stats, budget)
+        return wrapper
+    return decorator
+
+
+def init_query_stats(app):
+    """Register the engine listeners and the per-request hooks"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def begin_request_query_stats():
+        if query_stats_enabled(app):
+            start_query_stats(request.endpoint or request.path)
+
+    @app.after_request
+    def end_request_query_stats(response):
+        stats = g.get('_query_stats')
+        if stats is None:
+            return response
+
+        response.headers['X-Query-Count'] = str(stats.count)
+        response.headers['X-Query-Time-Ms'] = f'{stats.duration_ms:.1f}'
+        response.headers['Server-Timing'] = f'db;dur={stats.duration_ms:.1f};desc="{stats.count} queries"'
+
+        view = app.view_functions.get(request.endpoint)
+        finish_query_stats(stats, getattr(view, 'query_budget', None))
+        return response
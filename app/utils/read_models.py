@@ -0,0 +1,79 @@
+"""
+Read Models Utility for UniPortal
+Compact, read-only rows for list pages. The queries select only the
+columns a template prints and map each result into a namedtuple with
+__slots__ = (), so a long table builds no ORM instances, identity-map
+entries or change-tracking state.
+
+Rows keep the attribute names of the models (assignment.user.username,
+assignment.course.name), so a template renders either without changes.
+They are snapshots: use the ORM models for anything that writes.
+"""
+
+import os
+from collections import namedtuple
+
+
+class UserRef(namedtuple('UserRef', 'id username email full_name')):
+    __slots__ = ()
+
+    @property
+    def avatar_initials(self):
+        from app.models import User
+        return User.initials_for(self.full_name, self.username)
+
+
+class CourseRef(namedtuple('CourseRef', 'id name')):
+    __slots__ = ()
+
+
+class AssignmentRow(namedtuple('AssignmentRow', (
+        'id filename created_at grade feedback similarity_score course_id user_id user course'))):
+    __slots__ = ()
+
+
+class ResourceRow(namedtuple('ResourceRow', (
+        'id title file_path description category created_at uploader_id course_id'))):
+    __slots__ = ()
+
+    @property
+    def filename(self):
+        return os.path.basename(self.file_path)
+
+
+def assignment_rows_query():
+    """Submissions with their student and course, projected to the listed columns"""
+    from app import db
+    from app.models import Assignment, User, Course
+
+    return db.session.query(
+        Assignment.id, Assignment.filename, Assignment.created_at, Assignment.grade,
+        Assignment.feedback, Assignment.similarity_score, Assignment.course_id, Assignment.user_id,
+        User.username, User.email, User.full_name, Course.name.label('course_name')
+    ).join(User, Assignment.user_id == User.id).outerjoin(Course, Assignment.course_id == Course.id)
+
+
+def to_assignment_rows(rows):
+    return [
+        AssignmentRow(
+            row.id, row.filename, row.created_at, row.grade, row.feedback, row.similarity_score,
+            row.course_id, row.user_id,
+            UserRef(row.user_id, row.username, row.email, row.full_name),
+            CourseRef(row.course_id, row.course_name) if row.course_name is not None else None
+        )
+        for row in rows
+    ]
+
+
+def resource_rows_query():
+    from app import db
+    from app.models import Resource
+
+    return db.session.query(
+        Resource.id, Resource.title, Resource.file_path, Resource.description, Resource.category,
+        Resource.created_at, Resource.uploader_id, Resource.course_id
+    )
+
+
+def to_resource_rows(rows):
+    return [ResourceRow(*row) for row in rows]
@@ -0,0 +1,497 @@
+"""
+Search Utility for UniPortal
+Class-scoped full-text search over forum posts and replies, resources and
+the text extracted from uploaded slides and submissions, and room-scoped
+search over class chat messages.
+
+Every searchable row has a SearchDocument that a flush listener keeps in
+step with it, so write paths never touch the index by hand - they only set
+`search_text` on a new Resource or Assignment to index its file contents.
+The text index itself belongs to the database: an external-content FTS5
+table fed by triggers on SQLite, a generated tsvector column with a GIN
+index on Postgres. Anything else falls back to an unranked LIKE scan.
+
+Chat messages are written in batches outside the ORM, so they have no
+SearchDocument; the same kind of index sits directly on chat_messages and
+its triggers (or generated column) pick up every insert.
+"""
+
+import html
+import itertools
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+MAX_TERMS = 8
+MAX_RESULTS = 50
+MAX_FILE_TEXT = 200000  # characters of extracted text kept per file
+
+# Snippet highlight markers, swapped for <mark> after HTML escaping
+_START, _STOP = '\x02', '\x03'
+
+_SQLITE_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_documents_fts USING fts5("
+    "title, body, file_text, content='search_documents', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(rowid, title, body, file_text) "
+    "VALUES (new.id, new.title, new.body, new.file_text); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(search_documents_fts, rowid, title, body, file_text) "
+    "VALUES ('delete', old.id, old.title, old.body, old.file_text); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN "
+    "INSERT INTO search_documents_fts(search_documents_fts, rowid, title, body, file_text) "
+    "VALUES ('delete', old.id, old.title, old.body, old.file_text); "
+    "INSERT INTO search_documents_fts(rowid, title, body, file_text) "
+    "VALUES (new.id, new.title, new.body, new.file_text); END",
+)
+
+_POSTGRES_DDL = (
+    "ALTER TABLE search_documents ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(body, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(file_text, '')), 'C')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_search_documents_vector ON search_documents USING GIN (search_vector)",
+)
+
+
+_SQLITE_CHAT_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chat_messages_fts USING fts5("
+    "content, content='chat_messages', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS chat_messages_ai AFTER INSERT ON chat_messages BEGIN "
+    "INSERT INTO chat_messages_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS chat_messages_ad AFTER DELETE ON chat_messages BEGIN "
+    "INSERT INTO chat_messages_fts(chat_messages_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS chat_messages_au AFTER UPDATE ON chat_messages BEGIN "
+    "INSERT INTO chat_messages_fts(chat_messages_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO chat_messages_fts(rowid, content) VALUES (new.id, new.content); END",
+    # Index messages written before the triggers existed
+    "INSERT INTO chat_messages_fts(chat_messages_fts) VALUES ('rebuild')",
+)
+
+_POSTGRES_CHAT_DDL = (
+    "ALTER TABLE chat_messages ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', content)) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_chat_messages_vector ON chat_messages USING GIN (search_vector)",
+)
+
+
+def _create_index(connection, sqlite_ddl, postgres_ddl):
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        try:
+            for statement in sqlite_ddl:
+                connection.execute(text(statement))
+        except OperationalError as e:
+            logger.warning('FTS5 unavailable, using LIKE fallback: %s', e, extra={'event': 'search.no_fts5'})
+    elif dialect == 'postgresql':
+        for statement in postgres_ddl:
+            connection.execute(text(statement))
+
+
+def create_text_index(connection):
+    """Create the dialect's text index over search_documents (idempotent)"""
+    _create_index(connection, _SQLITE_FTS_DDL, _POSTGRES_DDL)
+
+
+def create_chat_text_index(connection):
+    """Create the dialect's text index over chat_messages (idempotent)"""
+    _create_index(connection, _SQLITE_CHAT_FTS_DDL, _POSTGRES_CHAT_DDL)
+
+
+# ---------------------------------------------------------------------------
+# Keeping documents in step with their rows
+# ---------------------------------------------------------------------------
+
+def _post_document(post):
+    return {
+        'class_group_id': post.class_group_id, 'owner_id': post.user_id, 'parent_id': None,
+        'title': post.title, 'body': post.content, 'created_at': post.timestamp,
+    }
+
+
+# Builders run in after_flush, where a new row's relationships do not load
+# yet; the class is resolved from the foreign keys instead
+
+def _reply_document(reply):
+    from app import db
+    from app.models import ForumPost
+
+    # Thread titles are shown from the parent post, not indexed on every reply
+    post = db.session.get(ForumPost, reply.post_id) if reply.post_id else None
+    return {
+        'class_group_id': post.class_group_id if post else None,
+        'owner_id': reply.user_id, 'parent_id': reply.post_id,
+        'title': None, 'body': reply.content, 'created_at': reply.timestamp,
+    }
+
+
+def _resource_document(resource):
+    if not resource.is_approved:
+        return None
+    return {
+        'class_group_id': resource.class_group_id, 'owner_id': resource.uploader_id, 'parent_id': None,
+        'title': resource.title, 'body': resource.description, 'created_at': resource.created_at,
+    }
+
+
+def _assignment_document(assignment):
+    from app import db
+    from app.models import User
+
+    class_group_id = db.session.query(User.class_group_id).filter(
+        User.id == assignment.user_id
+    ).scalar() if assignment.user_id else None
+    return {
+        'class_group_id': class_group_id,
+        'owner_id': assignment.user_id, 'parent_id': None,
+        'title': assignment.filename, 'body': None, 'created_at': assignment.created_at,
+    }
+
+
+def _indexed_models():
+    """{model: (kind, document builder, columns whose change reindexes)}"""
+    from app.models import ForumPost, ForumReply, Resource, Assignment
+
+    return {
+        ForumPost: ('post', _post_document, ('title', 'content', 'class_group_id')),
+        ForumReply: ('reply', _reply_document, ('content', 'post_id')),
+        Resource: ('resource', _resource_document, ('title', 'description', 'is_approved', 'class_group_id')),
+        Assignment: ('assignment', _assignment_document, ('filename',)),
+    }
+
+
+def _changed(obj, columns):
+    from sqlalchemy import inspect
+
+    state = inspect(obj)
+    return getattr(obj, 'search_text', None) is not None or any(
+        state.attrs[name].history.has_changes() for name in columns
+    )
+
+
+def _sync_documents(session, flush_context):
+    """after_flush: write the documents of every indexed row this flush touched"""
+    from app.models import SearchDocument, User
+
+    models = _indexed_models()
+    table = SearchDocument.__table__
+    connection = session.connection()
+
+    def key(kind, obj):
+        return (table.c.kind == kind) & (table.c.source_id == obj.id)
+
+    for obj in session.deleted:
+        entry = models.get(type(obj))
+        if entry:
+            connection.execute(table.delete().where(key(entry[0], obj)))
+
+    for obj in list(session.new) + list(session.dirty):
+        entry = models.get(type(obj))
+        if not entry or obj.id is None:
+            continue
+        kind, build, columns = entry
+        is_new = obj in session.new
+        if not is_new and not _changed(obj, columns):
+            continue
+
+        document = build(obj)
+        if document is None:
+            if not is_new:
+                connection.execute(table.delete().where(key(kind, obj)))
+            continue
+
+        file_text = getattr(obj, 'search_text', None)
+        if file_text is not None:
+            document['file_text'] = file_text[:MAX_FILE_TEXT]
+            obj.search_text = None
+
+        updated = 0
+        if not is_new:
+            updated = connection.execute(table.update().where(key(kind, obj)).values(**document)).rowcount
+        if not updated:
+            connection.execute(table.insert().values(kind=kind, source_id=obj.id, **document))
+
+    for obj in session.dirty:
+        if isinstance(obj, User) and _changed(obj, ('class_group_id',)):
+            # Submissions are searched within their owner's class; follow a move or a leave
+            connection.execute(table.update().where(
+                (table.c.kind == 'assignment') & (table.c.owner_id == obj.id)
+            ).values(class_group_id=obj.class_group_id))
+
+
+def init_search(app):
+    """Keep search documents in step with every session flush"""
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    if not event.contains(Session, 'after_flush', _sync_documents):
+        event.listen(Session, 'after_flush', _sync_documents)
+
+
+# ---------------------------------------------------------------------------
+# Querying
+# ---------------------------------------------------------------------------
+
+def search_terms(query):
+    return re.findall(r'\w+', (query or '').lower())[:MAX_TERMS]
+
+
+def _highlight(snippet):
+    """HTML-escape a snippet and turn the match markers into <mark> tags"""
+    escaped = html.escape(snippet or '')
+    return escaped.replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+
+_backends = {}
+
+
+def _backend(connection, fts_table='search_documents_fts'):
+    """'fts5', 'postgresql' or 'like' for this database and index, looked up once per engine"""
+    key = (str(connection.engine.url), fts_table)
+    if key in _backends:
+        return _backends[key]
+
+    backend = 'like'
+    if connection.dialect.name == 'postgresql':
+        backend = 'postgresql'
+    elif connection.dialect.name == 'sqlite':
+        from sqlalchemy import text
+        found = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE name = :name"
+        ), {'name': fts_table}).first()
+        if found:
+            backend = 'fts5'
+    if backend != 'like':
+        # A missing index may still be created by `python migrate.py`
+        _backends[key] = backend
+    return backend
+
+
+_SQLITE_SEARCH = """
+SELECT d.kind, d.source_id, d.parent_id, d.title, d.created_at,
+       snippet(search_documents_fts, -1, :start, :stop, '…', 16) AS snippet,
+       bm25(search_documents_fts, 10.0, 4.0, 1.0) AS rank
+FROM search_documents_fts
+JOIN search_documents d ON d.id = search_documents_fts.rowid
+WHERE search_documents_fts MATCH :match
+  AND d.class_group_id = :class_group_id
+  AND (d.kind != 'assignment' OR :see_submissions OR d.owner_id = :user_id)
+ORDER BY rank
+LIMIT :limit
+"""
+
+_POSTGRES_SEARCH = """
+SELECT kind, source_id, parent_id, title, created_at, rank,
+       ts_headline('english', coalesce(body, '') || ' ' || coalesce(file_text, ''), query, :headline) AS snippet
+FROM (
+    SELECT d.kind, d.source_id, d.parent_id, d.title, d.created_at, d.body, d.file_text, q.query,
+           ts_rank(d.search_vector, q.query) AS rank
+    FROM search_documents d, to_tsquery('english', :match) AS q(query)
+    WHERE d.class_group_id = :class_group_id
+      AND d.search_vector @@ q.query
+      AND (d.kind != 'assignment' OR :see_submissions OR d.owner_id = :user_id)
+    ORDER BY rank DESC
+    LIMIT :limit
+) AS top
+ORDER BY rank DESC
+"""
+
+
+def _like_search(terms, params):
+    """Unranked fallback for databases without a text index"""
+    from sqlalchemy import or_
+    from app.models import SearchDocument as D
+
+    query = D.query.filter(D.class_group_id == params['class_group_id'])
+    if not params['see_submissions']:
+        query = query.filter(or_(D.kind != 'assignment', D.owner_id == params['user_id']))
+    for term in terms:
+        pattern = f'%{term}%'
+        query = query.filter(or_(D.title.ilike(pattern), D.body.ilike(pattern), D.file_text.ilike(pattern)))
+
+    rows = []
+    for doc in query.order_by(D.created_at.desc()).limit(params['limit']).all():
+        text_ = ' '.join(filter(None, (doc.body, doc.file_text)))
+        rows.append({
+            'kind': doc.kind, 'source_id': doc.source_id, 'parent_id': doc.parent_id,
+            'title': doc.title, 'created_at': doc.created_at, 'snippet': _like_snippet(text_, terms[0]),
+        })
+    return rows
+
+
+def _like_snippet(text_, term):
+    """Up to 160 characters around the first match of term, marked"""
+    at = text_.lower().find(term)
+    start = max(0, at - 60) if at >= 0 else 0
+    snippet = text_[start:start + 160]
+    if at >= 0:
+        at -= start
+        snippet = snippet[:at] + _START + snippet[at:at + len(term)] + _STOP + snippet[at + len(term):]
+    return snippet
+
+
+def search(user, query, limit=20, channel_id=None):
+    """
+    Ranked matches for query within the user's class, best first.
+
+    Submissions are only visible to their owner and to class staff. Each
+    result carries an HTML-safe snippet with the matched terms in <mark>.
+    With the class room's channel_id, matching chat messages (kind 'chat',
+    titled with their author) are interleaved with the documents, newest
+    first, since they have no rank to compare.
+    """
+    from sqlalchemy import DateTime, text
+    from app import db
+
+    terms = search_terms(query)
+    if not terms or not user.class_group_id:
+        return []
+
+    params = {
+        'class_group_id': user.class_group_id,
+        'user_id': user.id,
+        'see_submissions': user.role in ('Admin', 'Lecturer', 'Rep'),
+        'limit': max(1, min(limit, MAX_RESULTS)),
+    }
+
+    connection = db.session.connection()
+    backend = _backend(connection)
+    if backend == 'fts5':
+        # Quoted terms are never parsed as FTS5 syntax; the last one is a prefix
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        rows = [dict(row._mapping) for row in connection.execute(
+            text(_SQLITE_SEARCH).columns(created_at=DateTime), dict(params, match=match, start=_START, stop=_STOP))]
+    elif backend == 'postgresql':
+        match = ' & '.join(terms[:-1] + [terms[-1] + ':*'])
+        headline = f'StartSel={_START}, StopSel={_STOP}, MaxWords=30, MinWords=10'
+        rows = [dict(row._mapping) for row in connection.execute(
+            text(_POSTGRES_SEARCH).columns(created_at=DateTime), dict(params, match=match, headline=headline))]
+    else:
+        rows = _like_search(terms, params)
+
+    # Replies are titled after their thread
+    parent_ids = {row['parent_id'] for row in rows if row['kind'] == 'reply' and row['parent_id']}
+    if parent_ids:
+        from app.models import ForumPost
+        titles = dict(db.session.query(ForumPost.id, ForumPost.title).filter(ForumPost.id.in_(parent_ids)))
+        for row in rows:
+            if row['kind'] == 'reply':
+                row['title'] = titles.get(row['parent_id'])
+
+    if channel_id is not None:
+        messages = [{
+            'kind': 'chat', 'source_id': row['id'], 'parent_id': None, 'title': row['username'],
+            'created_at': row['timestamp'], 'snippet': row['snippet'],
+        } for row in _chat_rows(channel_id, terms, params['limit'])]
+        merged = []
+        for pair in itertools.zip_longest(rows, messages):
+            merged.extend(row for row in pair if row is not None)
+        rows = merged[:params['limit']]
+
+    for row in rows:
+        row['snippet'] = _highlight(row['snippet'])
+        row.pop('rank', None)
+    return rows
+
+
+_SQLITE_CHAT_SEARCH = """
+SELECT m.id, m.user_id, m.timestamp, u.username,
+       snippet(chat_messages_fts, 0, :start, :stop, '…', 16) AS snippet
+FROM chat_messages_fts
+JOIN chat_messages m ON m.id = chat_messages_fts.rowid
+JOIN users u ON u.id = m.user_id
+WHERE chat_messages_fts MATCH :match
+  AND m.channel_id = :channel_id
+ORDER BY m.id DESC
+LIMIT :limit
+"""
+
+_POSTGRES_CHAT_SEARCH = """
+SELECT id, user_id, timestamp, username, ts_headline('english', content, query, :headline) AS snippet
+FROM (
+    SELECT m.id, m.user_id, m.timestamp, m.content, u.username, q.query
+    FROM chat_messages m JOIN users u ON u.id = m.user_id, to_tsquery('english', :match) AS q(query)
+    WHERE m.channel_id = :channel_id
+      AND m.search_vector @@ q.query
+    ORDER BY m.id DESC
+    LIMIT :limit
+) AS top
+ORDER BY id DESC
+"""
+
+
+def _chat_rows(channel_id, terms, limit):
+    """Matching messages of one room, newest first, with raw snippets"""
+    from sqlalchemy import DateTime, text
+    from app import db
+    from app.models import ChatMessage, User
+
+    params = {'channel_id': channel_id, 'limit': max(1, min(limit, MAX_RESULTS))}
+    connection = db.session.connection()
+    backend = _backend(connection, 'chat_messages_fts')
+    if backend == 'fts5':
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        rows = [dict(row._mapping) for row in connection.execute(
+            text(_SQLITE_CHAT_SEARCH).columns(timestamp=DateTime), dict(params, match=match, start=_START, stop=_STOP))]
+    elif backend == 'postgresql':
+        match = ' & '.join(terms[:-1] + [terms[-1] + ':*'])
+        headline = f'StartSel={_START}, StopSel={_STOP}, MaxWords=30, MinWords=10'
+        rows = [dict(row._mapping) for row in connection.execute(
+            text(_POSTGRES_CHAT_SEARCH).columns(timestamp=DateTime), dict(params, match=match, headline=headline))]
+    else:
+        like = db.session.query(
+            ChatMessage.id, ChatMessage.user_id, ChatMessage.timestamp, ChatMessage.content, User.username
+        ).join(User, ChatMessage.user_id == User.id).filter(ChatMessage.channel_id == channel_id)
+        for term in terms:
+            like = like.filter(ChatMessage.content.ilike(f'%{term}%'))
+        rows = [dict(row._mapping, snippet=_like_snippet(row.content, terms[0]))
+                for row in like.order_by(ChatMessage.id.desc()).limit(params['limit'])]
+    return rows
+
+
+def search_chat(channel_id, query, limit=20):
+    """
+    Messages of one chat room matching query, newest first. Each hit has
+    the message id (for chat_context), author, time and an HTML-safe
+    snippet with the matched terms in <mark>. Callers check room access.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    return [{
+        'id': row['id'],
+        'user_id': row['user_id'],
+        'user': row['username'],
+        'timestamp': row['timestamp'].strftime('%H:%M'),
+        'full_timestamp': row['timestamp'].strftime('%B %d, %Y at %H:%M'),
+        'snippet': _highlight(row['snippet']),
+    } for row in _chat_rows(channel_id, terms, limit)]
+
+
+def rebuild_file_text(extract, upload_folder):
+    """Extract and index file text for every resource and submission still missing it"""
+    import os
+    from app import db
+    from app.models import SearchDocument, Resource, Assignment
+    from app.utils.storage import _disk_path
+
+    models = {'resource': Resource, 'assignment': Assignment}
+    pending = SearchDocument.query.filter(
+        SearchDocument.kind.in_(list(models)), SearchDocument.file_text.is_(None)
+    ).all()
+
+    for indexed, document in enumerate(pending, 1):
+        row = models[document.kind].query.get(document.source_id)
+        path = _disk_path(row.file_path, upload_folder) if row else None
+        document.file_text = (extract(path) if path and os.path.exists(path) else '')[:MAX_FILE_TEXT]
+        if indexed % 100 == 0:
+            db.session.commit()
+    db.session.commit()
+    return len(pending)
@@ -0,0 +1,187 @@
+"""
+Socket Sessions Utility for UniPortal
+The authenticated identity of each Socket.IO connection, resolved from
+current_user once at `connect` and kept per sid, so chat events authorize
+against it without the login manager's loader or lazy attributes.
+
+A snapshot lives until its connection closes or the user's sessions are
+revoked (they left their class, or renamed themselves): revoke_user() takes
+each of their connections out of the rooms it joined and drops its
+snapshot, and the client is sent `session_revoked` so it rejoins under a
+fresh one. The worker's cached user snapshot is dropped first, so that
+fresh one is read from the database rather than the pre-change snapshot.
+Behind a Redis Socket.IO message queue revocations are published to every
+worker, since the connections may live on another one.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class SocketUser:
+    """What chat events need to know about a connected user"""
+
+    __slots__ = ('user_id', 'username', 'initials', 'class_group_id')
+
+    def __init__(self, user_id, username, initials, class_group_id):
+        self.user_id = user_id
+        self.username = username
+        self.initials = initials
+        self.class_group_id = class_group_id
+
+
+class SocketSessions:
+    """Snapshots and joined rooms of this worker's connections"""
+
+    def __init__(self):
+        self._users = {}  # sid -> SocketUser
+        self._rooms = {}  # sid -> rooms joined
+        self._sids = {}   # user id -> sids
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        return self._users.get(sid)
+
+    def add(self, sid, user):
+        with self._lock:
+            self._users[sid] = user
+            self._sids.setdefault(user.user_id, set()).add(sid)
+
+    def joined(self, sid, room):
+        with self._lock:
+            self._rooms.setdefault(sid, set()).add(room)
+
+    def left(self, sid, room):
+        with self._lock:
+            self._rooms.get(sid, set()).discard(room)
+
+    def remove(self, sid):
+        """Forget a closed connection; returns the rooms it had joined"""
+        with self._lock:
+            user = self._users.pop(sid, None)
+            if user is not None:
+                sids = self._sids.get(user.user_id, set())
+                sids.discard(sid)
+                if not sids:
+                    self._sids.pop(user.user_id, None)
+            return self._rooms.pop(sid, set())
+
+    def revoke(self, user_id):
+        """Drop a user's snapshots; returns [(sid, rooms joined)] of their connections"""
+        with self._lock:
+            revoked = []
+            for sid in self._sids.pop(user_id, set()):
+                self._users.pop(sid, None)
+                revoked.append((sid, self._rooms.pop(sid, set())))
+            return revoked
+
+
+sessions = SocketSessions()
+
+
+def socket_user():
+    """The current connection's snapshot, resolved on first use; None when anonymous"""
+    from flask import current_app, request
+    from flask_login import current_user
+
+    user = sessions.get(request.sid)
+    if user is None and current_user.is_authenticated:
+        user = SocketUser(current_user.id, current_user.username, current_user.avatar_initials,
+                          current_user.class_group_id)
+        sessions.add(request.sid, user)
+        relay = current_app.extensions.get('socket_session_relay')
+        if relay is not None:
+            relay.ensure_started()
+    return user
+
+
+def _revoke_local(app, user_id):
+    from app import socketio
+    from app.utils.user_cache import drop_local_user_snapshot
+
+    # The rejoin resolves current_user again; it must not see this worker's old copy
+    drop_local_user_snapshot(user_id)
+    revoked = sessions.revoke(user_id)
+    for sid, rooms in revoked:
+        for room in rooms:
+            socketio.server.leave_room(sid, room, namespace='/')
+            app.extensions['presence'].leave(room, sid)
+        socketio.emit('session_revoked', {}, to=sid)
+    if revoked:
+        app.extensions['typing_aggregator'].forget(user_id)
+
+
+class SessionRevocations:
+    """Publishes revocations to every worker over Redis pub/sub"""
+
+    def __init__(self, app, url, channel):
+        self.app = app
+        self.url = url
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._client = None
+        self._thread = None
+
+    def _redis(self):
+        import redis
+
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def ensure_started(self):
+        # Started on first use, so a preforking server subscribes once per worker
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._listen, name='uniportal-socket-sessions', daemon=True)
+            self._thread.start()
+
+    def publish(self, user_id):
+        import redis
+
+        self.ensure_started()
+        try:
+            self._redis().publish(self.channel, json.dumps({'origin': self.origin, 'user_id': user_id}))
+        except redis.RedisError as e:
+            logger.warning('Socket session revocation publish failed: %s', e,
+                           extra={'event': 'socket.revoke_failed', 'user_id': user_id})
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    data = json.loads(message['data'])
+                    if data['origin'] != self.origin:
+                        _revoke_local(self.app, data['user_id'])
+            except Exception as e:
+                logger.warning('Socket session relay disconnected: %s', e,
+                               extra={'event': 'socket.relay_disconnected'})
+                time.sleep(1)
+
+
+def revoke_user(user_id):
+    """Re-resolve a user's connections after their class or name changed"""
+    from flask import current_app
+
+    if not user_id:
+        return
+    app = current_app._get_current_object()
+    _revoke_local(app, user_id)
+    relay = app.extensions.get('socket_session_relay')
+    if relay is not None:
+        relay.publish(user_id)
+
+
+def init_socket_sessions(app):
+    """Relay revocations between workers when Socket.IO runs behind a Redis queue"""
+    message_queue = app.config.get('SOCKETIO_MESSAGE_QUEUE')
+    if message_queue and message_queue.startswith(('redis://', 'rediss://')):
+        app.extensions['socket_session_relay'] = SessionRevocations(
+            app, message_queue, app.config['SOCKETIO_CHANNEL'] + '-sessions'
+        )
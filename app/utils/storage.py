@@ -0,0 +1,111 @@
+"""
+Storage Utility for UniPortal
+Per-class storage accounting. File sizes are recorded on Assignment and
+Resource rows when they are written and ClassGroup.storage_used_mb is bumped
+in the same transaction, so quota checks never touch the disk.
+reconcile_storage() walks the files from a periodic Celery task and repairs
+sizes and usage that drifted (files removed by hand, students changing class).
+
+Archived assignments live in cold storage and do not count against a class.
+"""
+
+import os
+
+BYTES_PER_MB = 1024 * 1024
+
+
+def bytes_to_mb(size_bytes):
+    return (size_bytes or 0) / BYTES_PER_MB
+
+
+def uploaded_file_size(file):
+    """Size in bytes of an uploaded FileStorage, without reading it into memory"""
+    stream = file.stream
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+
+def saved_file_size(file_path):
+    """Size in bytes of a file on disk (0 when it is gone)"""
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+
+def can_store(class_group_id, size_bytes):
+    """Whether a class may store another file of this size - one primary-key read"""
+    from app.models import ClassGroup
+
+    if not class_group_id:
+        return True
+    class_group = ClassGroup.query.get(class_group_id)
+    return class_group is None or class_group.check_upload_permission(bytes_to_mb(size_bytes))
+
+
+def bump_storage(class_group_id, size_bytes):
+    """Add (or with a negative size, release) storage for a class"""
+    from sqlalchemy.orm.util import identity_key
+    from app import db
+    from app.models import ClassGroup
+    from app.utils.counters import _bump
+
+    _bump(ClassGroup, class_group_id, {'storage_used_mb': bytes_to_mb(size_bytes)})
+
+    # A loaded ClassGroup would keep the old usage; the next quota check of a
+    # multi-file upload reloads it instead
+    loaded = db.session.identity_map.get(identity_key(ClassGroup, class_group_id)) if class_group_id else None
+    if loaded is not None:
+        db.session.expire(loaded, ['storage_used_mb'])
+
+
+def _disk_path(file_path, upload_folder):
+    """Resolve stored paths; lecturer slide uploads store a bare filename"""
+    if os.path.isabs(file_path) or os.path.exists(file_path):
+        return file_path
+    return os.path.join(upload_folder, 'slides', file_path)
+
+
+def reconcile_storage(upload_folder):
+    """Re-measure every stored file and recompute class usage; returns rows repaired"""
+    from collections import defaultdict
+    from app import db
+    from app.models import ClassGroup, User, Assignment, Resource
+
+    used = defaultdict(int)
+    repaired = 0
+
+    # Lock the class rows (PostgreSQL) until the commit: an upload's bump waits
+    # and lands on the recomputed usage, and one committed before is measured
+    class_groups = ClassGroup.query.order_by(ClassGroup.id).with_for_update().all()
+
+    assignments = db.session.query(Assignment, User.class_group_id).join(
+        User, Assignment.user_id == User.id
+    ).all()
+    for assignment, class_group_id in assignments:
+        size = saved_file_size(assignment.file_path)
+        if assignment.file_size_bytes != size:
+            assignment.file_size_bytes = size
+            repaired += 1
+        if class_group_id and assignment.archive_link is None:
+            used[class_group_id] += size
+
+    for resource in Resource.query.all():
+        size = saved_file_size(_disk_path(resource.file_path, upload_folder))
+        if resource.file_size_bytes != size:
+            resource.file_size_bytes = size
+            repaired += 1
+        if resource.class_group_id:
+            used[resource.class_group_id] += size
+
+    for class_group in class_groups:
+        actual = bytes_to_mb(used.get(class_group.id, 0))
+        if class_group.storage_used_mb is None or abs(class_group.storage_used_mb - actual) > 1e-6:
+            class_group.storage_used_mb = actual
+            repaired += 1
+
+    db.session.commit()
+    return repaired
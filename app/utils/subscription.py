@@ -0,0 +1,148 @@
+"""
+Subscription Utility for UniPortal
+Resolves a class's premium entitlement once per request and caches it
+across requests until the next moment the result could change. A payment
+or trial invalidates it on every worker (see cache.py); when the cache
+cannot reach every worker it is only kept for the request.
+"""
+
+from datetime import datetime
+from flask import g, has_request_context
+from .cache import cache, MISSING
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Returned for users without a class
+NO_CLASS_ENTITLEMENT = {
+    'class_group_id': None,
+    'subscription_plan': None,
+    'premium_expiry': None,
+    'subscription_expiry': None,
+    'is_premium': False,
+    'days_remaining': 0,
+    'plan_active': False,
+    'plan_days_remaining': 0,
+}
+
+
+def _entitlement_key(class_group_id):
+    return f'class:{class_group_id}:entitlement'
+
+
+def _days_left(expiry, now):
+    """Whole days until expiry (0 once expired)"""
+    return max(0, (expiry - now).days)
+
+
+def _seconds_until_change(expiry, now):
+    """Seconds until days_remaining for this expiry next changes"""
+    remaining = (expiry - now).total_seconds()
+    if remaining <= 0:
+        return None  # Already expired - nothing changes any more
+    return remaining % SECONDS_PER_DAY or SECONDS_PER_DAY
+
+
+def compute_entitlement(class_group_id, premium_expiry, subscription_expiry, subscription_plan, now=None):
+    """
+    Build the entitlement for a class.
+
+    is_premium / days_remaining follow premium_expiry and gate premium
+    features. plan_active / plan_days_remaining drive the dashboard banner:
+    subscription_expiry first, then premium_expiry, and classes with no
+    expiry at all are treated as active so no expired banner is shown.
+    """
+    now = now or datetime.utcnow()
+
+    is_premium = premium_expiry is not None and premium_expiry > now
+    days_remaining = _days_left(premium_expiry, now) if premium_expiry else 0
+
+    banner_expiry = subscription_expiry or premium_expiry
+    if banner_expiry:
+        plan_days_remaining = _days_left(banner_expiry, now)
+        plan_active = plan_days_remaining > 0
+    else:
+        plan_days_remaining = 0
+        plan_active = True
+
+    return {
+        'class_group_id': class_group_id,
+        'subscription_plan': subscription_plan,
+        'premium_expiry': premium_expiry,
+        'subscription_expiry': subscription_expiry,
+        'is_premium': is_premium,
+        'days_remaining': days_remaining,
+        'plan_active': plan_active,
+        'plan_days_remaining': plan_days_remaining,
+    }
+
+
+def entitlement_ttl(entitlement, now=None):
+    """Cache lifetime that never outlives the next change of the entitlement"""
+    now = now or datetime.utcnow()
+    ttl = cache.default_timeout
+    for expiry in (entitlement['premium_expiry'], entitlement['subscription_expiry']):
+        if expiry:
+            seconds = _seconds_until_change(expiry, now)
+            if seconds is not None:
+                ttl = min(ttl, seconds)
+    return max(1, int(ttl))
+
+
+def _load_entitlement(class_group_id):
+    from app import db
+    from app.models import ClassGroup
+
+    row = db.session.query(
+        ClassGroup.premium_expiry,
+        ClassGroup.subscription_expiry,
+        ClassGroup.subscription_plan
+    ).filter(ClassGroup.id == class_group_id).first()
+
+    if row is None:
+        return dict(NO_CLASS_ENTITLEMENT)
+
+    return compute_entitlement(class_group_id, row.premium_expiry, row.subscription_expiry, row.subscription_plan)
+
+
+def get_class_entitlement(class_group_id):
+    """Entitlement of a class, resolved at most once per request"""
+    if not class_group_id:
+        return NO_CLASS_ENTITLEMENT
+
+    per_request = None
+    if has_request_context():
+        per_request = g.setdefault('_class_entitlements', {})
+        if class_group_id in per_request:
+            return per_request[class_group_id]
+
+    if not cache.coherent:
+        # A payment handled by another worker could not invalidate a copy kept here
+        entitlement = _load_entitlement(class_group_id)
+    else:
+        key = _entitlement_key(class_group_id)
+        entitlement = cache.get(key)
+        if entitlement is MISSING:
+            entitlement = _load_entitlement(class_group_id)
+            cache.set(key, entitlement, entitlement_ttl(entitlement))
+
+    if per_request is not None:
+        per_request[class_group_id] = entitlement
+    return entitlement
+
+
+def get_current_entitlement():
+    """Entitlement of the logged-in user's class"""
+    from flask_login import current_user
+
+    if not current_user.is_authenticated:
+        return NO_CLASS_ENTITLEMENT
+    return get_class_entitlement(current_user.class_group_id)
+
+
+def invalidate_class_entitlement(class_group_id):
+    """Drop the cached entitlement after a subscription write"""
+    if not class_group_id:
+        return
+    cache.delete(_entitlement_key(class_group_id))
+    if has_request_context():
+        g.setdefault('_class_entitlements', {}).pop(class_group_id, None)
@@ -0,0 +1,129 @@
+"""
+Typing Indicators Utility for UniPortal
+Coalesces chat typing events. Instead of rebroadcasting every `typing`
+event to the whole room (n typists x n recipients frames), handle_typing
+records the state here and a background task emits one `typing_users` list
+per changed room every TYPING_BROADCAST_INTERVAL_MS.
+
+Per user, repeated "still typing" events inside TYPING_MIN_UPDATE_INTERVAL_MS
+are dropped, and an indicator expires after TYPING_TTL_SECONDS without a
+refresh (closed tab, lost connection).
+
+Each worker aggregates its own connections and tags its lists with an
+origin id, so clients behind a Socket.IO message queue merge the lists of
+every worker.
+"""
+
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+ORIGIN = uuid.uuid4().hex
+
+
+class TypingAggregator:
+    """Who is typing in each room, emitted as one list per room per tick"""
+
+    def __init__(self, emit, interval=0.5, min_update_interval=1.0, ttl=5.0, clock=time.monotonic):
+        self.emit = emit
+        self.interval = interval
+        self.min_update_interval = min_update_interval
+        self.ttl = ttl
+        self.clock = clock
+        self._rooms = {}  # room -> {user id: [username, expires at, accepted at]}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def update(self, room, user_id, username, is_typing):
+        """Record a typing event; returns False when it was throttled"""
+        now = self.clock()
+        with self._lock:
+            users = self._rooms.setdefault(room, {})
+            entry = users.get(user_id)
+            if not is_typing:
+                if entry is not None:
+                    del users[user_id]
+                    self._dirty.add(room)
+                return True
+            if entry is not None and now - entry[2] < self.min_update_interval:
+                return False
+            users[user_id] = [username, now + self.ttl, now]
+            if entry is None:
+                self._dirty.add(room)
+            return True
+
+    def forget(self, user_id):
+        """Drop a user from every room (disconnect)"""
+        with self._lock:
+            for room, users in self._rooms.items():
+                if users.pop(user_id, None) is not None:
+                    self._dirty.add(room)
+
+    def tick(self):
+        """Expire stale indicators and emit each changed room's list; returns rooms emitted"""
+        now = self.clock()
+        with self._lock:
+            for room, users in self._rooms.items():
+                expired = [user_id for user_id, entry in users.items() if entry[1] <= now]
+                for user_id in expired:
+                    del users[user_id]
+                if expired:
+                    self._dirty.add(room)
+
+            changed = {
+                room: [{'user_id': user_id, 'user': entry[0]} for user_id, entry in self._rooms.get(room, {}).items()]
+                for room in self._dirty
+            }
+            self._dirty.clear()
+            self._rooms = {room: users for room, users in self._rooms.items() if users}
+
+        for room, users in changed.items():
+            self.emit(room, users)
+        return len(changed)
+
+
+def _emit_typing_users(room, users):
+    from app import socketio
+
+    socketio.emit('typing_users', {'origin': ORIGIN, 'users': users}, to=room)
+
+
+def _run_ticks(aggregator):
+    from app import socketio
+
+    while True:
+        socketio.sleep(aggregator.interval)
+        try:
+            aggregator.tick()
+        except Exception:
+            logger.exception('Typing indicator tick failed', extra={'event': 'typing.tick_failed'})
+
+
+_ticker_lock = threading.Lock()
+_ticker_started = False
+
+
+def typing_aggregator():
+    """This process's aggregator, starting its ticker on first use (once per worker)"""
+    global _ticker_started
+    from flask import current_app
+    from app import socketio
+
+    aggregator = current_app.extensions['typing_aggregator']
+    with _ticker_lock:
+        if not _ticker_started:
+            socketio.start_background_task(_run_ticks, aggregator)
+            _ticker_started = True
+    return aggregator
+
+
+def init_typing(app):
+    app.extensions['typing_aggregator'] = TypingAggregator(
+        _emit_typing_users,
+        interval=app.config['TYPING_BROADCAST_INTERVAL_MS'] / 1000,
+        min_update_interval=app.config['TYPING_MIN_UPDATE_INTERVAL_MS'] / 1000,
+        ttl=app.config['TYPING_TTL_SECONDS'],
+    )
@@ -0,0 +1,106 @@
+"""
+User Cache Utility for UniPortal
+Short-lived snapshots of the logged-in user and their class so the login
+manager does not query the users table on every request and Socket.IO event.
+
+A role or class change must reach every worker at once, so snapshots are
+only kept while a delete reaches them all (a shared Redis cache, or the
+invalidation relay in cache.py); otherwise each lookup reads the database.
+"""
+
+from .cache import cache, MISSING
+
+# Columns kept in the snapshot. Secrets (password hash, verification and
+# reset tokens) are left out and load from the database only when accessed.
+USER_SNAPSHOT_COLUMNS = (
+    'id', 'username', 'email', 'full_name', 'receive_emails', 'role',
+    'is_verified', 'university_id', 'class_group_id', 'created_at'
+)
+
+
+def _user_key(user_id):
+    return f'user:{user_id}:snapshot'
+
+
+def _class_key(class_group_id):
+    return f'class:{class_group_id}:snapshot'
+
+
+def _timeout():
+    from flask import current_app
+    return current_app.config.get('USER_CACHE_TIMEOUT', 60)
+
+
+def load_cached_user(user_id):
+    """
+    Return the User for user_id, from the snapshot cache when possible.
+    Cached users are merged into the session without a query, so routes can
+    still modify and commit current_user as usual.
+    """
+    from app import db
+    from app.models import User
+    from sqlalchemy.orm import make_transient_to_detached
+
+    if not cache.coherent:
+        return db.session.get(User, user_id)
+
+    key = _user_key(user_id)
+    snapshot = cache.get(key)
+
+    if snapshot is MISSING:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        cache.set(key, {column: getattr(user, column) for column in USER_SNAPSHOT_COLUMNS}, _timeout())
+        return user
+
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def get_class_snapshot(class_group_id):
+    """Name, codes and plan of a class without loading the ORM row"""
+    if not class_group_id:
+        return None
+
+    def build():
+        from app import db
+        from app.models import ClassGroup
+
+        row = db.session.query(
+            ClassGroup.id,
+            ClassGroup.name,
+            ClassGroup.code,
+            ClassGroup.join_code,
+            ClassGroup.university_id,
+            ClassGroup.created_by,
+            ClassGroup.subscription_plan,
+            ClassGroup.subscription_expiry
+        ).filter(ClassGroup.id == class_group_id).first()
+        return dict(row._mapping) if row else None
+
+    if not cache.coherent:
+        return build()
+    return cache.get_or_set(_class_key(class_group_id), build, _timeout())
+
+
+def invalidate_user(user_id):
+    """Drop a user's snapshot on every worker after a profile, role or class change"""
+    if user_id:
+        cache.delete(_user_key(user_id))
+
+
+def drop_local_user_snapshot(user_id):
+    """
+    Drop this worker's copy of a user's snapshot, for code that reaches every
+    worker through its own relay (see socket_sessions.revoke_user)
+    """
+    if user_id:
+        cache.delete_local(_user_key(user_id))
+
+
+def invalidate_class_snapshot(class_group_id):
+    """Drop a class snapshot after a rename, code or subscription change"""
+    if class_group_id:
+        cache.delete(_class_key(class_group_id))
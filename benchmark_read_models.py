@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Read-model benchmark
+Renders the admin submissions table from full ORM objects (joinedload of
+the student and course) and from the projected read-model rows in
+app/utils/read_models.py, and reports peak Python memory and query + render
+time for each path.
+
+Usage:
+    python benchmark_read_models.py
+    python benchmark_read_models.py --rows 20000 --repeat 10
+
+Runs against a throwaway SQLite file; nothing touches the real database.
+
+Options:
+    --rows N        submissions to seed and render in one table (default 5000)
+    --repeat N      timed runs per path, best one reported (default 5)
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+TEMPLATE = 'partials/admin_assignment_rows.html'
+
+
+def seed(app, rows):
+    """A class with 50 students and 5 courses sharing `rows` submissions"""
+    from werkzeug.security import generate_password_hash
+    from app import db
+    from app.models import University, ClassGroup, User, Course, Assignment
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        university = University(name='Benchmark University', domain='bench.test')
+        db.session.add(university)
+        db.session.flush()
+
+        class_group = ClassGroup(name='Benchmark', code='BM-100', join_code='BM100',
+                                 lecturer_code='LECBM100', university_id=university.id)
+        db.session.add(class_group)
+        db.session.flush()
+
+        # One hash shared by every student; hashing 50 passwords would dominate seeding
+        password_hash = generate_password_hash('benchmark')
+        students = [
+            User(username=f'student{i}', email=f'student{i}@bench.test', full_name=f'Student Number{i}',
+                 role='Student', university_id=university.id, class_group_id=class_group.id,
+                 is_verified=True, password_hash=password_hash)
+            for i in range(50)
+        ]
+        courses = [Course(name=f'Course {i}', lecturer_code=f'BMC{i:03d}', class_group_id=class_group.id)
+                   for i in range(5)]
+        db.session.add_all(students + courses)
+        db.session.flush()
+
+        for i in range(rows):
+            db.session.add(Assignment(
+                filename=f'submission_{i}.pdf', file_path=f'submission_{i}.pdf',
+                user_id=students[i % len(students)].id,
+                course_id=courses[i % len(courses)].id if i % 7 else None,
+                grade=f'{i % 100}' if i % 3 else None,
+                similarity_score=float(i % 90),
+            ))
+        db.session.commit()
+
+
+def orm_page():
+    from sqlalchemy.orm import joinedload
+    from app.models import Assignment
+
+    return Assignment.query.options(
+        joinedload(Assignment.user), joinedload(Assignment.course)
+    ).order_by(Assignment.created_at.desc(), Assignment.id.desc()).all()
+
+
+def read_model_page():
+    from app.models import Assignment
+    from app.utils.read_models import assignment_rows_query, to_assignment_rows
+
+    return to_assignment_rows(assignment_rows_query().order_by(
+        Assignment.created_at.desc(), Assignment.id.desc()
+    ))
+
+
+def measure(app, load, repeat):
+    """(best seconds, peak bytes) to load the rows and render the table"""
+    from flask import render_template
+    from app import db
+
+    best = None
+    peak = 0
+    for run in range(repeat + 1):
+        with app.test_request_context('/admin'):
+            gc.collect()
+            # The first (untimed) run compiles the template and warms the caches
+            tracing = run == 1
+            if tracing:
+                tracemalloc.start()
+            started = time.perf_counter()
+            render_template(TEMPLATE, page=load())
+            elapsed = time.perf_counter() - started
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            db.session.remove()
+        if run:
+            best = elapsed if best is None else min(best, elapsed)
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ORM vs read-model list rendering benchmark')
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    options = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='uniportal-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+
+    from app import create_app
+    app = create_app()
+
+    print(f"🔄 Seeding {options.rows} submissions...")
+    seed(app, options.rows)
+
+    results = {
+        'ORM (joinedload)': measure(app, orm_page, options.repeat),
+        'Read model rows': measure(app, read_model_page, options.repeat),
+    }
+
+    print(f"\n📊 {options.rows} rows, best of {options.repeat}")
+    print("=" * 56)
+    print(f"{'path':<20}{'time ms':>12}{'peak MB':>12}{'KB/row':>12}")
+    for name, (seconds, peak) in results.items():
+        print(f"{name:<20}{seconds * 1000:>12.1f}{peak / 1024 / 1024:>12.2f}"
+              f"{peak / 1024 / max(options.rows, 1):>12.2f}")
+
+    (orm_time, orm_peak), (row_time, row_peak) = results.values()
+    print(f"\n✅ Read models: {orm_time / row_time:.1f}x faster, "
+          f"{orm_peak / max(row_peak, 1):.1f}x less peak memory")
+
+
+if __name__ == '__main__':
+    main()
@@ -20,6 +20,14 @@ celery.conf.beat_schedule = {
         'task': 'app.tasks.check_subscription_expiry',
         'schedule': crontab(hour=9, minute=0),  # Run daily at 9:00 AM
     },
+    'reconcile-counters-hourly': {
+        'task': 'app.tasks.reconcile_counters',
+        'schedule': crontab(minute=15),  # Run hourly at :15
+    },
+    'reconcile-storage-daily': {
+        'task': 'app.tasks.reconcile_storage',
+        'schedule': crontab(hour=3, minute=30),  # Run daily at 3:30 AM
+    },
 }
 
 celery.conf.timezone = 'UTC'
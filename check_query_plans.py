@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Check that the hot dashboard queries use their indexes
+Runs EXPLAIN on each query against the configured database and fails when
+the planner does not pick the expected index. Run after `python migrate.py`.
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+from app import create_app, db
+from app.models import (
+    User, Course, Assignment, Resource, Broadcast, ForumPost, ForumReply, ChatMessage,
+    AttendanceSession, AttendanceRecord, Payment
+)
+
+
+def hot_queries():
+    """(description, query, expected index) for each hot filter path"""
+    return [
+        ("Class members",
+         User.query.filter_by(class_group_id=1),
+         'ix_users_class_group_id'),
+        ("Lecturer's courses",
+         Course.query.filter_by(lecturer_id=1),
+         'ix_courses_lecturer_id'),
+        ("Grading queue",
+         Assignment.query.filter(Assignment.course_id.in_([1, 2]), Assignment.grade.is_(None))
+         .order_by(Assignment.id.asc()),
+         'ix_assignments_course_grade_id'),
+        ("Student submissions",
+         Assignment.query.filter_by(user_id=1).order_by(Assignment.created_at.desc()),
+         'ix_assignments_user_created'),
+        ("Class slides",
+         Resource.query.filter_by(class_group_id=1, category='Lecture Slides', is_approved=True)
+         .order_by(Resource.created_at.desc()),
+         'ix_resources_class_category_approved_created'),
+        ("Course slides",
+         Resource.query.filter(Resource.course_id.in_([1, 2]), Resource.category == 'Lecture Slides',
+                               Resource.is_approved == True),
+         'ix_resources_course_category_approved'),
+        ("Latest class broadcast",
+         Broadcast.query.filter_by(class_group_id=1).order_by(Broadcast.timestamp.desc()).limit(1),
+         'ix_broadcasts_class_timestamp'),
+        ("Class forum",
+         ForumPost.query.filter_by(class_group_id=1).order_by(ForumPost.timestamp.desc()),
+         'ix_forum_posts_class_timestamp'),
+        ("Forum thread replies",
+         ForumReply.query.filter_by(post_id=1).order_by(ForumReply.timestamp.desc()).limit(50),
+         'ix_forum_replies_post_timestamp'),
+        ("Chat history",
+         ChatMessage.query.filter_by(channel_id=1).order_by(ChatMessage.id.desc()).limit(50),
+         'ix_chat_messages_channel_id'),
+        ("Chat scroll-back",
+         ChatMessage.query.filter(ChatMessage.channel_id == 1, ChatMessage.id < 500)
+         .order_by(ChatMessage.id.desc()).limit(51),
+         'ix_chat_messages_channel_id'),
+        ("Chat jump to context (newer half)",
+         ChatMessage.query.filter(ChatMessage.channel_id == 1, ChatMessage.id > 500)
+         .order_by(ChatMessage.id).limit(25),
+         'ix_chat_messages_channel_id'),
+        ("Admin submissions page",
+         Assignment.query.order_by(Assignment.created_at.desc(), Assignment.id.desc()).limit(21),
+         'ix_assignments_created_id'),
+        ("Class payments page",
+         Payment.query.filter_by(class_group_id=1).order_by(Payment.created_at.desc(), Payment.id.desc()).limit(21),
+         'ix_payments_class_created'),
+        ("Active attendance session",
+         AttendanceSession.query.filter_by(course_id=1, is_active=True),
+         'ix_attendance_sessions_course_active'),
+        ("Attendance already marked",
+         AttendanceRecord.query.filter_by(session_id=1, student_id=1),
+         'ix_attendance_records_session_student'),
+    ]
+
+
+def explain(query):
+    """Plan text for a query on the current database"""
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+
+    with db.engine.connect() as conn:
+        if db.engine.dialect.name == 'postgresql':
+            # Tiny dev tables make a sequential scan look cheaper
+            conn.execute(text('SET enable_seqscan = off'))
+            rows = conn.execute(text(f'EXPLAIN {sql}'))
+            return '\n'.join(row[0] for row in rows)
+
+        rows = conn.execute(text(f'EXPLAIN QUERY PLAN {sql}'))
+        return '\n'.join(str(row[-1]) for row in rows)
+
+
+def check_query_plans():
+    app = create_app()
+
+    with app.app_context():
+        print(f"🔍 Query plans on {db.engine.dialect.name}")
+        print("=" * 60)
+
+        failures = 0
+        for description, query, index_name in hot_queries():
+            plan = explain(query)
+            if index_name in plan:
+                print(f"✅ {description}: {index_name}")
+            else:
+                failures += 1
+                print(f"❌ {description}: expected {index_name}")
+                for line in plan.splitlines():
+                    print(f"   {line}")
+
+        print("=" * 60)
+        if failures:
+            print(f"💥 {failures} query plan(s) missed their index - run python migrate.py")
+            return False
+        print("🎉 All hot queries use their indexes")
+        return True
+
+
+if __name__ == '__main__':
+    if not check_query_plans():
+        sys.exit(1)
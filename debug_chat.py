@@ -10,7 +10,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app, db
-from app.models import User, ClassGroup, ForumPost, ForumReply
+from app.models import User, ClassGroup, ChatChannel, ChatMessage
 
 def debug_chat():
     """Debug chat functionality"""
@@ -43,20 +43,17 @@ def debug_chat():
                 member_count = User.query.filter_by(class_group_id=group.id).count()
                 print(f"   Members: {member_count}")
                 
-                # Check if there's a chat post for this class
-                chat_post = ForumPost.query.filter_by(
-                    class_group_id=group.id,
-                    title='Class Chat'
-                ).first()
+                # Check if this class has a chat room yet
+                channel = ChatChannel.query.filter_by(class_group_id=group.id).first()
                 
-                if chat_post:
-                    message_count = ForumReply.query.filter_by(post_id=chat_post.id).count()
+                if channel:
+                    message_count = ChatMessage.query.filter_by(channel_id=channel.id).count()
                     print(f"   Chat Messages: {message_count}")
                     
                     # Show recent messages
-                    recent_messages = ForumReply.query.filter_by(
-                        post_id=chat_post.id
-                    ).order_by(ForumReply.timestamp.desc()).limit(5).all()
+                    recent_messages = ChatMessage.query.filter_by(
+                        channel_id=channel.id
+                    ).order_by(ChatMessage.id.desc()).limit(5).all()
                     
                     if recent_messages:
                         print("   Recent Messages:")
@@ -65,7 +62,7 @@ def debug_chat():
                     else:
                         print("   No messages yet")
                 else:
-                    print("   No chat post created yet")
+                    print("   No chat room created yet")
             
             print("\n🔧 Troubleshooting Tips:")
             print("1. Make sure users are in the same class group")
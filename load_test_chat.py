@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Chat persistence load test
+Sends chat messages from concurrent senders through the same path as the
+Socket.IO `message` handler, once with a commit per message and once with
+the write-behind ChatWriter, and reports send throughput, send latency and
+whether every message reached the database.
+
+Usage:
+    python load_test_chat.py                     # both modes, side by side
+    python load_test_chat.py --mode write-behind
+    LOAD_TEST_DATABASE_URL=postgresql://.../uniportal_load python load_test_chat.py
+
+Each mode drops and recreates every table, so it only runs against a
+throwaway SQLite file or a scratch database named by LOAD_TEST_DATABASE_URL.
+
+Options:
+    --seconds N     duration of each run (default 10)
+    --senders N     concurrent senders (default 8)
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+MODES = ('commit-per-message', 'write-behind')
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def seed(app):
+    """A class with a student and its chat room"""
+    from app import db
+    from app.models import University, ClassGroup, User
+    from app.utils.chat import channel_id_for
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        university = University(name='Load Test University', domain='load.test')
+        db.session.add(university)
+        db.session.flush()
+
+        class_group = ClassGroup(name='Load Test', code='LT-100', join_code='LT100',
+                                 lecturer_code='LECLT100', university_id=university.id)
+        db.session.add(class_group)
+        db.session.flush()
+
+        student = User(username='loadtest', email='loadtest@load.test', full_name='Load Test',
+                       role='Student', university_id=university.id, class_group_id=class_group.id,
+                       is_verified=True)
+        student.set_password('loadtest')
+        db.session.add(student)
+        db.session.commit()
+
+        return class_group.id, student.id, channel_id_for(class_group.id)
+
+
+def run_mode(args):
+    """Worker process: one mode end to end, so each starts with fresh chat caches"""
+    mode, url, seconds, senders = args
+    os.environ['DATABASE_URL'] = url
+    os.environ['CHAT_WRITE_BEHIND'] = '1' if mode == 'write-behind' else '0'
+
+    from datetime import datetime
+    from sqlalchemy.exc import OperationalError
+    from app import create_app, db
+    from app.models import ChatMessage
+    from app.utils.chat import message_payload, next_message_id, persist_message
+
+    app = create_app()
+    class_group_id, user_id, channel_id = seed(app)
+
+    latencies, failures = [], []
+    lock = threading.Lock()
+    deadline = time.time() + seconds
+
+    def sender(number):
+        local_latencies, local_failures = [], 0
+        with app.app_context():
+            while time.time() < deadline:
+                started = time.perf_counter()
+                try:
+                    # handle_message: id, payload, broadcast, persist
+                    row = {'id': next_message_id(), 'channel_id': channel_id, 'user_id': user_id,
+                           'content': f'load test message from sender {number}', 'timestamp': datetime.utcnow()}
+                    payload = message_payload(row['id'], row['content'], row['timestamp'],
+                                              user_id, 'loadtest', 'LT')
+                    persist_message(row, payload)
+                    local_latencies.append(time.perf_counter() - started)
+                except OperationalError:
+                    db.session.rollback()
+                    local_failures += 1
+        with lock:
+            latencies.extend(local_latencies)
+            failures.append(local_failures)
+
+    threads = [threading.Thread(target=sender, args=(number,)) for number in range(senders)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Shutdown path: whatever is still queued must reach the database
+    writer = app.extensions.get('chat_writer')
+    flush_started = time.perf_counter()
+    if writer is not None:
+        writer.close()
+    drain = time.perf_counter() - flush_started
+
+    with app.app_context():
+        stored = ChatMessage.query.count()
+
+    return mode, latencies, sum(failures), stored, drain
+
+
+def print_summary(results, seconds):
+    print(f"\n📊 Chat persistence, {seconds}s per mode")
+    print("=" * 84)
+    print(f"{'mode':<22}{'msgs/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'failed':>8}{'stored':>9}{'drain ms':>10}")
+    for mode, latencies, failed, stored, drain in results:
+        print(f"{mode:<22}{len(latencies) / seconds:>10.1f}"
+              f"{_percentile(latencies, 50) * 1000:>9.2f}"
+              f"{_percentile(latencies, 95) * 1000:>9.2f}"
+              f"{_percentile(latencies, 99) * 1000:>9.2f}"
+              f"{failed:>8}{stored:>9}{drain * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chat persistence load test')
+    parser.add_argument('--seconds', type=int, default=10)
+    parser.add_argument('--senders', type=int, default=8)
+    parser.add_argument('--mode', choices=MODES, help='run one mode only')
+    options = parser.parse_args()
+
+    modes = [options.mode] if options.mode else list(MODES)
+    url = os.environ.get('LOAD_TEST_DATABASE_URL')
+    workdir = tempfile.mkdtemp(prefix='uniportal-chat-load-')
+
+    print(f"🔄 {options.senders} sender(s) for {options.seconds}s per mode")
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for mode in modes:
+        mode_url = url or 'sqlite:///' + os.path.join(workdir, f'{mode}.db')
+        with context.Pool(1) as pool:
+            results.append(pool.apply(run_mode, ((mode, mode_url, options.seconds, options.senders),)))
+
+    print_summary(results, options.seconds)
+
+    lost = [(mode, len(latencies) - stored) for mode, latencies, failed, stored, drain in results
+            if stored != len(latencies)]
+    if lost:
+        for mode, missing in lost:
+            print(f"\n❌ {mode}: {missing} acknowledged message(s) missing from the database")
+        sys.exit(1)
+    print("\n✅ Every acknowledged message was persisted")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Database lock-contention load test
+Runs web-like readers, chat writers and Celery-like updaters in separate
+processes against a throwaway database and reports throughput, latency and
+"database is locked" errors.
+
+Usage:
+    python load_test_database.py                 # hardened SQLite profile
+    python load_test_database.py --legacy        # SQLite defaults, for comparison
+    python load_test_database.py --compare       # both, side by side
+    LOAD_TEST_DATABASE_URL=postgresql://.../uniportal_load python load_test_database.py
+
+The test drops and recreates every table, so it only runs against a
+throwaway SQLite file or a scratch database named by LOAD_TEST_DATABASE_URL.
+
+Options:
+    --seconds N     duration of each run (default 15)
+    --workers N     processes per role (default 4)
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+ROLES = ('reader', 'chat_writer', 'task_updater')
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def seed(url, legacy):
+    """Create the schema and a class with a student, a chat room and assignments"""
+    from app import create_app, db
+    from app.models import University, ClassGroup, User, ChatChannel, Assignment
+
+    os.environ['DATABASE_URL'] = url
+    # WAL mode is stored in the file, so seed legacy runs without it too
+    os.environ['SQLITE_HARDENED'] = '0' if legacy else '1'
+    app = create_app()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        university = University(name='Load Test University', domain='load.test')
+        db.session.add(university)
+        db.session.flush()
+
+        class_group = ClassGroup(name='Load Test', code='LT-100', join_code='LT100',
+                                 lecturer_code='LECLT100', university_id=university.id)
+        db.session.add(class_group)
+        db.session.flush()
+
+        student = User(username='loadtest', email='loadtest@load.test', role='Student',
+                       university_id=university.id, class_group_id=class_group.id, is_verified=True)
+        student.set_password('loadtest')
+        db.session.add(student)
+        db.session.flush()
+
+        channel = ChatChannel(class_group_id=class_group.id)
+        db.session.add(channel)
+
+        for i in range(200):
+            db.session.add(Assignment(filename=f'load_{i}.pdf', file_path=f'load_{i}.pdf',
+                                      user_id=student.id))
+        db.session.commit()
+
+        return {'user_id': student.id, 'channel_id': channel.id, 'class_group_id': class_group.id}
+
+
+def run_role(args):
+    """Worker process: run one role until the deadline and report its results"""
+    role, url, legacy, seconds, ids = args
+    os.environ['DATABASE_URL'] = url
+    if legacy:
+        os.environ['SQLITE_HARDENED'] = '0'
+
+    from sqlalchemy.exc import OperationalError
+    from app import create_app, db
+    from app.models import Assignment, ChatMessage, User
+
+    app = create_app()
+    latencies, errors, locked = [], 0, 0
+    deadline = time.time() + seconds
+
+    with app.app_context():
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                if role == 'reader':
+                    # Dashboard: class assignments joined to their students
+                    Assignment.query.join(User).filter(
+                        User.class_group_id == ids['class_group_id']
+                    ).order_by(Assignment.created_at.desc()).limit(50).all()
+                elif role == 'chat_writer':
+                    # Socket.IO send_message persisting a chat message
+                    db.session.add(ChatMessage(content='load test message', user_id=ids['user_id'],
+                                               channel_id=ids['channel_id']))
+                    db.session.commit()
+                else:
+                    # Celery task updating an assignment
+                    assignment = Assignment.query.order_by(db.func.random()).first()
+                    assignment.similarity_score = (assignment.similarity_score or 0) + 1
+                    db.session.commit()
+                latencies.append(time.perf_counter() - started)
+            except OperationalError as e:
+                db.session.rollback()
+                if 'locked' in str(e).lower() or 'busy' in str(e).lower():
+                    locked += 1
+                else:
+                    errors += 1
+
+    return role, latencies, locked, errors
+
+
+def run_profile(url, legacy, seconds, workers):
+    ids = seed(url, legacy)
+    jobs = [(role, url, legacy, seconds, ids) for role in ROLES for _ in range(workers)]
+
+    with multiprocessing.get_context('spawn').Pool(len(jobs)) as pool:
+        results = pool.map(run_role, jobs)
+
+    summary = {}
+    for role, latencies, locked, errors in results:
+        entry = summary.setdefault(role, {'latencies': [], 'locked': 0, 'errors': 0})
+        entry['latencies'].extend(latencies)
+        entry['locked'] += locked
+        entry['errors'] += errors
+    return summary
+
+
+def print_summary(title, summary, seconds):
+    print(f"\n📊 {title}")
+    print("=" * 72)
+    print(f"{'role':<14}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'locked':>9}{'errors':>9}")
+    for role in ROLES:
+        entry = summary[role]
+        latencies = entry['latencies']
+        print(f"{role:<14}{len(latencies) / seconds:>10.1f}"
+              f"{_percentile(latencies, 50) * 1000:>10.1f}"
+              f"{_percentile(latencies, 95) * 1000:>10.1f}"
+              f"{_percentile(latencies, 99) * 1000:>10.1f}"
+              f"{entry['locked']:>9}{entry['errors']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Database lock-contention load test')
+    parser.add_argument('--seconds', type=int, default=15)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--legacy', action='store_true', help='SQLite defaults instead of the hardened profile')
+    parser.add_argument('--compare', action='store_true', help='run legacy and hardened SQLite back to back')
+    options = parser.parse_args()
+
+    url = os.environ.get('LOAD_TEST_DATABASE_URL')
+    if url:
+        profiles = [('Scratch database', url, False)]
+    else:
+        workdir = tempfile.mkdtemp(prefix='uniportal-load-')
+        legacy_run = ('SQLite defaults', 'sqlite:///' + os.path.join(workdir, 'legacy.db'), True)
+        hardened_run = ('Hardened SQLite (WAL)', 'sqlite:///' + os.path.join(workdir, 'hardened.db'), False)
+        if options.compare:
+            profiles = [legacy_run, hardened_run]
+        elif options.legacy:
+            profiles = [legacy_run]
+        else:
+            profiles = [hardened_run]
+
+    print(f"🔄 {options.workers} process(es) per role for {options.seconds}s per profile")
+
+    total_locked = 0
+    for title, profile_url, legacy in profiles:
+        summary = run_profile(profile_url, legacy, options.seconds, options.workers)
+        print_summary(title, summary, options.seconds)
+        if not legacy:
+            total_locked += sum(entry['locked'] for entry in summary.values())
+
+    if total_locked:
+        print(f"\n❌ {total_locked} 'database is locked' error(s) with the tuned profile")
+        sys.exit(1)
+    print("\n✅ No lock errors with the tuned profile")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Socket.IO chat load test
+Connects python-socketio clients as real logged-in students to a running
+server, joins them to their class rooms, sends chat messages and typing
+events at the given rates, and reports end-to-end delivery latency (send to
+receipt by every other member of the room) and the server's CPU and memory.
+
+Runs on one Linux box: the clients and the server share a clock, and CPU is
+read from /proc for every process listening on the server's port.
+
+Usage:
+    python run.py                                      # or: gunicorn --worker-class eventlet -w 1 --bind 127.0.0.1:5000 wsgi:app
+    python load_test_socketio.py --setup               # create the test classes and students once
+    python load_test_socketio.py --rooms 5 --users-per-room 40 --seconds 60
+    python load_test_socketio.py --url http://127.0.0.1:5001 --message-rate 0.2 --typing-rate 1
+
+--setup writes to the database named by DATABASE_URL, so run it with the
+same DATABASE_URL as the server. Test students are named lt_<room>_<n> and
+share the password `loadtest`; never run --setup against production.
+
+Options:
+    --rooms N            class rooms to load (default 5)
+    --users-per-room N   students connected per room (default 20)
+    --seconds N          duration of the send phase (default 30)
+    --message-rate R     messages per second per student (default 0.1)
+    --typing-rate R      typing events per second per student (default 0.5)
+    --transport T        websocket or polling (default websocket)
+    --server-pid PID     process(es) to measure, comma separated (default: whoever listens on the port)
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+PASSWORD = 'loadtest'
+MARKER = 'lt'
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+# ---------------------------------------------------------------------------
+# Test data
+# ---------------------------------------------------------------------------
+
+def setup_users(rooms, users_per_room):
+    """Create (or reuse) the load-test classes and students"""
+    from app import create_app, db
+    from app.models import University, ClassGroup, User
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        university = University.query.filter_by(domain='load.test').first()
+        if university is None:
+            university = University(name='Load Test University', domain='load.test')
+            db.session.add(university)
+            db.session.flush()
+
+        for room in range(rooms):
+            code = f'LT{room:03d}'
+            class_group = ClassGroup.query.filter_by(join_code=code).first()
+            if class_group is None:
+                class_group = ClassGroup(name=f'Load Test {room}', code=f'LT-{room}', join_code=code,
+                                         lecturer_code=f'LEC{code}', university_id=university.id)
+                db.session.add(class_group)
+                db.session.flush()
+
+            for number in range(users_per_room):
+                email = f'lt_{room}_{number}@load.test'
+                if User.query.filter_by(email=email).first() is None:
+                    student = User(username=f'lt_{room}_{number}', email=email, role='Student',
+                                   university_id=university.id, class_group_id=class_group.id,
+                                   is_verified=True)
+                    student.set_password(PASSWORD)
+                    db.session.add(student)
+            db.session.commit()
+        print(f"✅ {rooms} room(s) x {users_per_room} student(s) ready")
+
+
+# ---------------------------------------------------------------------------
+# Server CPU from /proc
+# ---------------------------------------------------------------------------
+
+def _listening_inodes(port):
+    inodes = set()
+    for table in ('/proc/net/tcp', '/proc/net/tcp6'):
+        try:
+            with open(table) as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    local_port = int(fields[1].rsplit(':', 1)[1], 16)
+                    if local_port == port and fields[3] == '0A':  # LISTEN
+                        inodes.add(fields[9])
+        except OSError:
+            continue
+    return inodes
+
+
+def server_pids(port):
+    """Every process holding the listening socket (gunicorn master and workers)"""
+    inodes = {f'socket:[{inode}]' for inode in _listening_inodes(port)}
+    pids = []
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            for fd in os.listdir(f'/proc/{pid}/fd'):
+                if os.readlink(f'/proc/{pid}/fd/{fd}') in inodes:
+                    pids.append(int(pid))
+                    break
+        except OSError:
+            continue
+    return pids
+
+
+def cpu_seconds(pids):
+    total = 0.0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            total += (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')  # utime + stime
+        except OSError:
+            continue
+    return total
+
+
+def rss_mb(pids):
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total / 1024
+
+
+# ---------------------------------------------------------------------------
+# Clients
+# ---------------------------------------------------------------------------
+
+class LoadClient:
+    """One logged-in student with a Socket.IO connection to their room"""
+
+    def __init__(self, base_url, email, transport, stats):
+        self.base_url = base_url
+        self.email = email
+        self.transport = transport
+        self.stats = stats
+        self.room = None
+        self.client = None
+
+    def connect(self):
+        import requests
+        import socketio
+
+        session = requests.Session()
+        response = session.post(f'{self.base_url}/login', data={'email': self.email, 'password': PASSWORD},
+                                allow_redirects=False)
+        if response.status_code != 302 or 'session' not in session.cookies:
+            raise RuntimeError(f'login failed for {self.email}')
+
+        self.room = self.email.split('_')[1]
+        self.client = socketio.Client(http_session=session, reconnection=False)
+        self.client.on('message', self.on_message)
+        self.client.connect(self.base_url, transports=[self.transport])
+        self.client.emit('join', {'room': self.stats.room_ids[self.room]})
+
+    def on_message(self, data):
+        received = time.time()
+        parts = data.get('msg', '').split(':')
+        if len(parts) == 4 and parts[0] == MARKER and data.get('user') != self.email.split('@')[0]:
+            self.stats.delivered(received - float(parts[3]))
+
+    def run(self, deadline, message_rate, typing_rate, rng):
+        """Send messages and typing events as two Poisson processes until the deadline"""
+        room = self.stats.room_ids[self.room]
+        next_message = time.time() + (rng.expovariate(message_rate) if message_rate else float('inf'))
+        next_typing = time.time() + (rng.expovariate(typing_rate) if typing_rate else float('inf'))
+        sequence = 0
+        while True:
+            now = time.time()
+            wake = min(next_message, next_typing, deadline)
+            if wake > now:
+                time.sleep(wake - now)
+            if wake >= deadline:
+                break
+            try:
+                if next_message <= next_typing:
+                    sequence += 1
+                    self.client.emit('message', {'room': room, 'msg': f'{MARKER}:{self.room}:{sequence}:{time.time()}'})
+                    self.stats.sent(self.room)
+                    next_message += rng.expovariate(message_rate)
+                else:
+                    self.client.emit('typing', {'room': room, 'typing': True})
+                    self.stats.typing_sent()
+                    next_typing += rng.expovariate(typing_rate)
+            except Exception:
+                self.stats.error()
+
+    def close(self):
+        if self.client is not None and self.client.connected:
+            self.client.disconnect()
+
+
+class Stats:
+    def __init__(self, room_ids, users_per_room):
+        self.room_ids = room_ids  # room index (as in the email) -> class group id
+        self.users_per_room = users_per_room
+        self.latencies = []
+        self.messages = {}
+        self.typing = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def sent(self, room):
+        with self._lock:
+            self.messages[room] = self.messages.get(room, 0) + 1
+
+    def typing_sent(self):
+        with self._lock:
+            self.typing += 1
+
+    def delivered(self, latency):
+        with self._lock:
+            self.latencies.append(latency)
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    def expected_deliveries(self, connected_per_room):
+        return sum(count * max(connected_per_room.get(room, 0) - 1, 0) for room, count in self.messages.items())
+
+
+def room_ids(rooms):
+    """Class group id of each load-test room, by join code"""
+    from app import create_app
+    from app.models import ClassGroup
+
+    app = create_app()
+    with app.app_context():
+        groups = ClassGroup.query.filter(ClassGroup.join_code.in_([f'LT{room:03d}' for room in range(rooms)])).all()
+        return {str(int(group.join_code[2:])): str(group.id) for group in groups}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Socket.IO chat load test')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--rooms', type=int, default=5)
+    parser.add_argument('--users-per-room', type=int, default=20)
+    parser.add_argument('--seconds', type=int, default=30)
+    parser.add_argument('--message-rate', type=float, default=0.1)
+    parser.add_argument('--typing-rate', type=float, default=0.5)
+    parser.add_argument('--transport', choices=('websocket', 'polling'), default='websocket')
+    parser.add_argument('--server-pid', help='comma-separated pids to measure')
+    parser.add_argument('--setup', action='store_true', help='create the test classes and students, then exit')
+    parser.add_argument('--seed', type=int, default=1)
+    options = parser.parse_args()
+
+    if options.setup:
+        setup_users(options.rooms, options.users_per_room)
+        return
+
+    ids = room_ids(options.rooms)
+    if len(ids) < options.rooms:
+        print("❌ Test rooms missing; run with --setup first (same DATABASE_URL as the server)")
+        sys.exit(1)
+
+    stats = Stats(ids, options.users_per_room)
+    clients = [LoadClient(options.url, f'lt_{room}_{number}@load.test', options.transport, stats)
+               for room in range(options.rooms) for number in range(options.users_per_room)]
+
+    port = urlparse(options.url).port or 80
+    pids = [int(pid) for pid in options.server_pid.split(',')] if options.server_pid else server_pids(port)
+    if not pids:
+        print(f"⚠️  No process found listening on port {port}; server CPU will not be reported")
+
+    print(f"🔌 Connecting {len(clients)} client(s) to {options.url} ({options.transport})...")
+    connected = []
+    started = time.time()
+    for client in clients:
+        try:
+            client.connect()
+            connected.append(client)
+        except Exception as e:
+            print(f"   ❌ {client.email}: {e}")
+    print(f"   {len(connected)}/{len(clients)} connected in {time.time() - started:.1f}s")
+    if not connected:
+        sys.exit(1)
+
+    time.sleep(1)  # let the joins land before the first message
+
+    connected_per_room = {}
+    for client in connected:
+        connected_per_room[client.room] = connected_per_room.get(client.room, 0) + 1
+
+    print(f"📨 Sending for {options.seconds}s: {options.message_rate} msg/s and "
+          f"{options.typing_rate} typing/s per student")
+    cpu_before, wall_before = cpu_seconds(pids), time.time()
+    deadline = wall_before + options.seconds
+    rng = random.Random(options.seed)
+    senders = [threading.Thread(target=client.run, args=(deadline, options.message_rate, options.typing_rate,
+                                                         random.Random(rng.random())))
+               for client in connected]
+    for sender in senders:
+        sender.start()
+    for sender in senders:
+        sender.join()
+    time.sleep(2)  # let the last deliveries arrive
+    cpu_used, wall = cpu_seconds(pids) - cpu_before, time.time() - wall_before
+    memory = rss_mb(pids)
+
+    for client in connected:
+        client.close()
+
+    sent = sum(stats.messages.values())
+    expected = stats.expected_deliveries(connected_per_room)
+    latencies = stats.latencies
+
+    print(f"\n📊 {len(connected)} clients in {len(connected_per_room)} room(s), {options.seconds}s")
+    print("=" * 60)
+    print(f"Messages sent        {sent:>10}   ({sent / options.seconds:.1f}/s)")
+    print(f"Typing events sent   {stats.typing:>10}   ({stats.typing / options.seconds:.1f}/s)")
+    print(f"Deliveries           {len(latencies):>10} / {expected} expected "
+          f"({len(latencies) / max(expected, 1) * 100:.1f}%)")
+    print(f"Send errors          {stats.errors:>10}")
+    print(f"Delivery latency ms  p50 {_percentile(latencies, 50) * 1000:.1f}  "
+          f"p95 {_percentile(latencies, 95) * 1000:.1f}  p99 {_percentile(latencies, 99) * 1000:.1f}  "
+          f"max {max(latencies, default=0) * 1000:.1f}")
+    if pids:
+        print(f"Server CPU           {cpu_used / wall * 100:>9.1f}%  (pids {', '.join(map(str, pids))}; "
+              f"100% = one core)")
+        print(f"Server RSS           {memory:>9.1f} MB")
+
+    if len(latencies) < expected:
+        print(f"\n⚠️  {expected - len(latencies)} delivery(ies) missing")
+        sys.exit(1)
+    print("\n✅ Every message reached every other member of its room")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Typing indicator fan-out load test
+Replays keystroke-driven `typing` events from the students of one large
+class chat on a virtual clock, and counts the frames the server sends:
+once rebroadcasting every event to the room (the old handler) and once
+through the TypingAggregator used by handle_typing now.
+
+Usage:
+    python load_test_typing.py
+    python load_test_typing.py --members 200 --typists 30 --seconds 120
+
+Options:
+    --members N       students connected to the room (default 200)
+    --typists N       of them typing on and off (default 20)
+    --seconds N       simulated duration (default 60)
+    --keystroke-ms N  time between keystrokes while typing (default 150)
+    --seed N          random seed (default 1)
+"""
+
+import argparse
+import heapq
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.typing_indicators import TypingAggregator
+
+ROOM = '1'
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def keystroke_events(typists, seconds, keystroke_ms, rng):
+    """(time, user id, typing) events: bursts of keystrokes, then a stop"""
+    events = []
+    for user_id in range(1, typists + 1):
+        t = rng.uniform(0, 5)
+        while t < seconds:
+            burst_end = t + rng.uniform(2, 10)
+            while t < min(burst_end, seconds):
+                events.append((t, user_id, True))
+                t += keystroke_ms / 1000 * rng.uniform(0.5, 1.5)
+            events.append((t, user_id, False))
+            t += rng.uniform(2, 15)  # reading, thinking
+    heapq.heapify(events)
+    return [heapq.heappop(events) for _ in range(len(events))]
+
+
+def legacy_frames(events, members):
+    """Old handler: every event to everyone else in the room"""
+    return len(events), len(events) * (members - 1)
+
+
+def aggregated_frames(events, members, seconds, interval, min_update_interval, ttl):
+    clock = VirtualClock()
+    emitted = []
+    aggregator = TypingAggregator(lambda room, users: emitted.append(len(users)), interval=interval,
+                                  min_update_interval=min_update_interval, ttl=ttl, clock=clock)
+
+    accepted = 0
+    next_tick = interval
+    for t, user_id, typing in events:
+        while next_tick <= t:
+            clock.now = next_tick
+            aggregator.tick()
+            next_tick += interval
+        clock.now = t
+        accepted += aggregator.update(ROOM, user_id, f'student{user_id}', typing)
+    while next_tick <= seconds + ttl + interval:
+        clock.now = next_tick
+        aggregator.tick()
+        next_tick += interval
+
+    return accepted, len(emitted), len(emitted) * members
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Typing indicator fan-out load test')
+    parser.add_argument('--members', type=int, default=200)
+    parser.add_argument('--typists', type=int, default=20)
+    parser.add_argument('--seconds', type=int, default=60)
+    parser.add_argument('--keystroke-ms', type=int, default=150)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--interval-ms', type=int, default=500, help='TYPING_BROADCAST_INTERVAL_MS')
+    parser.add_argument('--min-update-ms', type=int, default=1000, help='TYPING_MIN_UPDATE_INTERVAL_MS')
+    parser.add_argument('--ttl', type=float, default=5, help='TYPING_TTL_SECONDS')
+    options = parser.parse_args()
+
+    events = keystroke_events(options.typists, options.seconds, options.keystroke_ms, random.Random(options.seed))
+    old_events, old_frames = legacy_frames(events, options.members)
+    accepted, broadcasts, new_frames = aggregated_frames(
+        events, options.members, options.seconds,
+        options.interval_ms / 1000, options.min_update_ms / 1000, options.ttl
+    )
+
+    print(f"📊 {options.typists} of {options.members} students typing for {options.seconds}s "
+          f"({len(events)} typing events)")
+    print("=" * 64)
+    print(f"{'':<28}{'handled':>12}{'broadcasts':>12}{'frames':>12}")
+    print(f"{'Rebroadcast every event':<28}{old_events:>12}{old_events:>12}{old_frames:>12}")
+    print(f"{'Throttled + aggregated':<28}{accepted:>12}{broadcasts:>12}{new_frames:>12}")
+    print(f"\nFrames per second: {old_frames / options.seconds:,.0f} -> {new_frames / options.seconds:,.0f}")
+
+    if new_frames >= old_frames:
+        print("\n❌ Aggregation did not reduce the emitted frames")
+        sys.exit(1)
+    print(f"\n✅ {old_frames / max(new_frames, 1):.1f}x fewer frames")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Apply pending database migrations
+Creates missing tables and runs every migration in app/migrations.py that
+this database has not seen yet. Safe to run repeatedly.
+
+Usage:
+    python migrate.py           # apply pending migrations
+    python migrate.py --status  # list applied and pending migrations
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.migrations import MIGRATIONS, applied_versions, upgrade
+
+
+def show_status():
+    applied = applied_versions(db.engine)
+    print("📋 Migrations")
+    print("=" * 60)
+    for version, description, _ in sorted(MIGRATIONS):
+        marker = "✅" if version in applied else "⏳"
+        print(f"{marker} {version}: {description}")
+
+
+def main():
+    app = create_app()
+
+    with app.app_context():
+        if '--status' in sys.argv[1:]:
+            show_status()
+            return
+
+        print(f"🔄 Migrating {db.engine.url.render_as_string(hide_password=True)}")
+        print("=" * 60)
+        try:
+            count = upgrade(db.engine)
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            sys.exit(1)
+
+        if count:
+            print(f"\n🎉 Applied {count} migration(s)")
+        else:
+            print("✨ Database is up to date")
+
+
+if __name__ == '__main__':
+    main()
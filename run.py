@@ -60,6 +60,10 @@ if __name__ == '__main__':
     # Setup database on first run
     setup_database()
     
+    # Flush queued chat messages when stopped with SIGTERM
+    from app.utils.chat import flush_on_sigterm
+    flush_on_sigterm()
+    
     # Get local IP address
     import socket
     import sys
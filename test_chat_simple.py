@@ -10,7 +10,8 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app, db
-from app.models import User, ClassGroup, ForumPost, ForumReply
+from app.models import User, ClassGroup, ChatMessage
+from app.utils.chat import channel_id_for
 
 def test_chat_message():
     """Test creating a chat message manually"""
@@ -34,31 +35,15 @@ def test_chat_message():
                 print("❌ User not in any class group")
                 return
             
-            # Get or create chat post
-            chat_post = ForumPost.query.filter_by(
-                class_group_id=user.class_group_id,
-                title='Class Chat'
-            ).first()
-            
-            if not chat_post:
-                print("📝 Creating Class Chat post...")
-                chat_post = ForumPost(
-                    title='Class Chat',
-                    content='Real-time class discussion',
-                    user_id=user.id,
-                    class_group_id=user.class_group_id
-                )
-                db.session.add(chat_post)
-                db.session.commit()
-                print("✅ Chat post created")
-            else:
-                print("✅ Chat post already exists")
+            # Get or create the class chat room
+            channel_id = channel_id_for(user.class_group_id)
+            print(f"✅ Chat room {channel_id}")
             
             # Create a test message
-            test_message = ForumReply(
+            test_message = ChatMessage(
                 content="Test message from debug script",
                 user_id=user.id,
-                post_id=chat_post.id
+                channel_id=channel_id
             )
             db.session.add(test_message)
             db.session.commit()
@@ -66,7 +51,7 @@ def test_chat_message():
             print("✅ Test message created")
             
             # Check messages
-            messages = ForumReply.query.filter_by(post_id=chat_post.id).all()
+            messages = ChatMessage.query.filter_by(channel_id=channel_id).order_by(ChatMessage.id).all()
             print(f"📨 Total messages in chat: {len(messages)}")
             
             for msg in messages[-3:]:  # Show last 3 messages
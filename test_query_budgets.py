@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Query budget check for the hot dashboards and chat events
+Seeds a throwaway database, renders each budgeted page in test mode and
+reports how many queries it issued. A route that exceeds its @query_budget
+raises QueryBudgetExceeded, and a page that does not answer 200 (or an event
+that errors or never replies) fails too: the test asserts, and run as a
+script it exits non-zero.
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='uniportal-budget-'), 'budget.db')
+
+from app import create_app, db, socketio
+from app.models import (
+    University, ClassGroup, User, Course, Assignment, AttendanceSession, AttendanceRecord
+)
+from app.utils.cache import cache
+from app.utils.query_stats import QueryBudgetExceeded
+
+
+def seed():
+    university = University(name='Budget University', domain='budget.test')
+    db.session.add(university)
+    db.session.flush()
+
+    class_group = ClassGroup(name='Budget Class', code='BG-100', join_code='BG100', lecturer_code='LECBG100',
+                             university_id=university.id, premium_expiry=datetime.utcnow() + timedelta(days=30))
+    db.session.add(class_group)
+    db.session.flush()
+
+    lecturer = User(username='budget_lecturer', email='lecturer@budget.test', role='Lecturer',
+                    university_id=university.id, class_group_id=class_group.id, is_verified=True)
+    lecturer.set_password('budget')
+    db.session.add(lecturer)
+    db.session.flush()
+
+    course = Course(name='Budget Course', lecturer_code='BGC100', lecturer_id=lecturer.id,
+                    class_group_id=class_group.id)
+    db.session.add(course)
+    db.session.flush()
+
+    students = []
+    for i in range(20):
+        student = User(username=f'budget_student_{i}', email=f'student{i}@budget.test', role='Student',
+                       university_id=university.id, class_group_id=class_group.id, is_verified=True)
+        student.set_password('budget')
+        db.session.add(student)
+        students.append(student)
+    db.session.flush()
+
+    assignments = []
+    for student in students:
+        assignment = Assignment(filename=f'{student.username}.pdf', file_path=f'{student.username}.pdf',
+                                user_id=student.id, course_id=course.id)
+        db.session.add(assignment)
+        assignments.append(assignment)
+
+    session = AttendanceSession(course_id=course.id, created_by_id=lecturer.id, latitude=0.0, longitude=0.0)
+    db.session.add(session)
+    db.session.flush()
+    for student in students:
+        db.session.add(AttendanceRecord(session_id=session.id, student_id=student.id,
+                                        student_name=student.username))
+    db.session.commit()
+
+    return {
+        'lecturer': lecturer.id,
+        'student': students[0].id,
+        'class_group': class_group.id,
+        'assignment': assignments[0].id,
+        'session': session.id,
+    }
+
+
+def login(client, user_id):
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+
+
+def received(socket_client, name):
+    """Payloads of the named event received by a Socket.IO test client; fails on any `error` event"""
+    def payload(event):
+        # `message` events arrive with their payload dict as args, others as a list
+        args = event['args']
+        return args if isinstance(args, dict) else args[0]
+
+    events = socket_client.get_received()
+    errors = [payload(event) for event in events if event['name'] == 'error']
+    assert not errors, f"error events: {errors}"
+    return [payload(event) for event in events if event['name'] == name]
+
+
+def check(label, action):
+    """Run one request or event; return False if it blew its budget or failed"""
+    cache.clear()  # measure the cold path
+    try:
+        count = action()
+    except QueryBudgetExceeded as e:
+        print(f"❌ {label}: {e}")
+        return False
+    except AssertionError as e:
+        print(f"❌ {label}: {e}")
+        return False
+    print(f"✅ {label}: {count} queries")
+    return True
+
+
+def test_query_budgets():
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        ids = seed()
+
+    def get(user_id, path):
+        def action():
+            client = app.test_client()
+            login(client, user_id)
+            response = client.get(path)
+            # A redirect (e.g. to the login page) would never reach the budgeted view
+            assert response.status_code == 200, f"{path} answered {response.status_code}"
+            return response.headers.get('X-Query-Count')
+        return action
+
+    def chat_message():
+        client = app.test_client()
+        login(client, ids['student'])
+        socket_client = socketio.test_client(app, flask_test_client=client)
+        assert socket_client.is_connected(), "socket connection refused"
+        socket_client.emit('join', {'room': str(ids['class_group'])})
+        socket_client.emit('message', {'room': str(ids['class_group']), 'msg': 'budget check'})
+        assert received(socket_client, 'message'), "message was not broadcast"
+        socket_client.disconnect()
+        return 'within budget'
+
+    def chat_history():
+        client = app.test_client()
+        login(client, ids['student'])
+        socket_client = socketio.test_client(app, flask_test_client=client)
+        assert socket_client.is_connected(), "socket connection refused"
+        room = str(ids['class_group'])
+        socket_client.emit('get_chat_history', {'room': room})  # cold: fills the ring buffer
+        socket_client.emit('get_chat_history', {'room': room})  # warm
+        socket_client.emit('get_chat_history', {'room': room, 'before_id': 2 ** 31 - 1})  # scroll back
+        assert len(received(socket_client, 'chat_history')) == 3, "missing chat_history replies"
+        socket_client.disconnect()
+        return 'within budget'
+
+    def chat_search():
+        client = app.test_client()
+        login(client, ids['student'])
+        socket_client = socketio.test_client(app, flask_test_client=client)
+        assert socket_client.is_connected(), "socket connection refused"
+        room = str(ids['class_group'])
+        socket_client.emit('message', {'room': room, 'msg': 'quiz moved to friday'})
+        writer = app.extensions.get('chat_writer')
+        if writer is not None:
+            writer.flush()  # written behind the broadcast; search reads the table
+        socket_client.emit('search_chat', {'room': room, 'q': 'quiz'})
+        hits = received(socket_client, 'chat_search_results')
+        assert hits and hits[0]['results'], "search found nothing"
+        socket_client.emit('get_chat_context', {'room': room, 'around_id': hits[0]['results'][0]['id']})
+        assert received(socket_client, 'chat_context'), "missing chat_context reply"
+        socket_client.disconnect()
+        return 'within budget'
+
+    print("🔍 Query budgets (cold cache)")
+    print("=" * 60)
+    results = [
+        check("Student dashboard", get(ids['student'], '/student/dashboard')),
+        check("Attendance dashboard", get(ids['lecturer'], '/attendance_dashboard')),
+        check("Attendance records", get(ids['lecturer'], f"/attendance_session/{ids['session']}/records")),
+        check("Grading room", get(ids['lecturer'], f"/grading_room/{ids['assignment']}")),
+        check("Chat join + message", chat_message),
+        check("Chat history pages", chat_history),
+        check("Chat search + jump to context", chat_search),
+    ]
+    print("=" * 60)
+    assert all(results), "a page or event exceeded its query budget or failed"
+
+
+if __name__ == '__main__':
+    try:
+        test_query_budgets()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print("🎉 All budgets respected")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Class search check
+Seeds a throwaway database, adds a forum reply and a submission through the
+real routes and looks both up through /api/search as the student who wrote
+them and as their lecturer, along with a message in the class chat.
+"""
+
+import io
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+_workdir = tempfile.mkdtemp(prefix='uniportal-search-')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_workdir, 'search.db')
+
+from app import create_app, db
+from app.models import University, ClassGroup, User, Course, ForumPost, ChatChannel, ChatMessage
+
+
+def seed():
+    university = University(name='Search University', domain='search.test')
+    db.session.add(university)
+    db.session.flush()
+
+    class_group = ClassGroup(name='Search Class', code='SR-100', join_code='SR100', lecturer_code='LECSR100',
+                             university_id=university.id, premium_expiry=datetime.utcnow() + timedelta(days=30))
+    db.session.add(class_group)
+    db.session.flush()
+
+    lecturer = User(username='search_lecturer', email='lecturer@search.test', role='Lecturer',
+                    university_id=university.id, class_group_id=class_group.id, is_verified=True)
+    student = User(username='search_student', email='student@search.test', role='Student',
+                   university_id=university.id, class_group_id=class_group.id, is_verified=True)
+    for user in (lecturer, student):
+        user.set_password('search')
+        db.session.add(user)
+    db.session.flush()
+
+    course = Course(name='Search Course', lecturer_code='SRC100', lecturer_id=lecturer.id,
+                    class_group_id=class_group.id)
+    post = ForumPost(title='Exam prep', content='Questions about the exam', user_id=student.id,
+                     class_group_id=class_group.id)
+    channel = ChatChannel(class_group_id=class_group.id)
+    db.session.add_all([course, post, channel])
+    db.session.commit()
+
+    # Its own transaction: the message id is reserved on another connection
+    db.session.add(ChatMessage(channel_id=channel.id, user_id=student.id, content='meet at the quasar lab'))
+    db.session.commit()
+
+    return {'lecturer': lecturer.id, 'student': student.id, 'course': course.id, 'post': post.id}
+
+
+def login(client, user_id):
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+
+
+def search_kinds(client, query):
+    response = client.get('/api/search', query_string={'q': query})
+    assert response.status_code == 200, f"/api/search answered {response.status_code}"
+    return {result['kind'] for result in response.get_json()['results']}
+
+
+def test_search_finds_replies_submissions_and_chat():
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['UPLOAD_FOLDER'] = os.path.join(_workdir, 'uploads')
+
+    with app.app_context():
+        db.create_all()
+        ids = seed()
+
+    student = app.test_client()
+    login(student, ids['student'])
+
+    response = student.post(f"/forum/{ids['post']}/reply", data={'content': 'kaleidoscope revision notes'})
+    assert response.status_code == 302, f"reply answered {response.status_code}"
+
+    response = student.post('/student/upload', data={
+        'course_id': str(ids['course']),
+        'file': (io.BytesIO(b'photosynthesis lab report'), 'lab.txt'),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 302, f"upload answered {response.status_code}"
+
+    lecturer = app.test_client()
+    login(lecturer, ids['lecturer'])
+
+    for client in (student, lecturer):
+        assert 'reply' in search_kinds(client, 'kaleidoscope'), "new reply is not searchable"
+        assert 'assignment' in search_kinds(client, 'photosynthesis'), "new submission is not searchable"
+        assert 'chat' in search_kinds(client, 'quasar'), "class chat is not searchable"
+
+
+if __name__ == '__main__':
+    try:
+        test_search_finds_replies_submissions_and_chat()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print("🎉 Replies, submissions and chat are searchable")
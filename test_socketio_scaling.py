@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Cross-worker Socket.IO check
+Starts two app workers on different ports that share one database and one
+Socket.IO message queue, connects a student to each, and checks that a chat
+message sent through one worker reaches the student on the other, and that
+the other worker's history (served from its ring buffer) includes it.
+
+Usage:
+    python test_socketio_scaling.py                  # Redis at redis://localhost:6379/15
+    TEST_SOCKETIO_MESSAGE_QUEUE=redis://host:6379/3 python test_socketio_scaling.py
+    python test_socketio_scaling.py --fake           # fakeredis TCP server, no Redis needed
+    pytest test_socketio_scaling.py                  # Redis if reachable, else fakeredis, else skipped
+"""
+
+import argparse
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+PASSWORD = 'scaling-test'
+TIMEOUT = 10
+DEFAULT_MESSAGE_QUEUE = 'redis://localhost:6379/15'
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(predicate, timeout=TIMEOUT):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def seed(database_url):
+    """A class with two verified students; returns (room, emails)"""
+    from app import create_app, db
+    from app.models import University, ClassGroup, User
+
+    # Only this app uses the scaling database; other tests in the run keep theirs
+    previous = os.environ.get('DATABASE_URL')
+    os.environ['DATABASE_URL'] = database_url
+    try:
+        app = create_app()
+    finally:
+        if previous is None:
+            del os.environ['DATABASE_URL']
+        else:
+            os.environ['DATABASE_URL'] = previous
+    with app.app_context():
+        db.create_all()
+        university = University(name='Scaling University', domain='scaling.test')
+        db.session.add(university)
+        db.session.flush()
+
+        class_group = ClassGroup(name='Scaling', code='SC-100', join_code='SC100',
+                                 lecturer_code='LECSC100', university_id=university.id)
+        db.session.add(class_group)
+        db.session.flush()
+
+        emails = []
+        for name in ('alice', 'bola'):
+            student = User(username=name, email=f'{name}@scaling.test', role='Student',
+                           university_id=university.id, class_group_id=class_group.id, is_verified=True)
+            student.set_password(PASSWORD)
+            db.session.add(student)
+            emails.append(student.email)
+        db.session.commit()
+        return str(class_group.id), emails
+
+
+def serve(port, database_url, message_queue):
+    """Worker process: one app instance on its own port"""
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['SOCKETIO_MESSAGE_QUEUE'] = message_queue
+    os.environ['SOCKETIO_ASYNC_MODE'] = 'threading'
+    from app import create_app, socketio
+
+    app = create_app()
+    socketio.run(app, host='127.0.0.1', port=port, allow_unsafe_werkzeug=True, log_output=False)
+
+
+def connect(base_url, email):
+    """Log in over HTTP and open a Socket.IO connection with that session"""
+    import requests
+    import socketio as socketio_client
+
+    session = requests.Session()
+    response = session.post(f'{base_url}/login', data={'email': email, 'password': PASSWORD})
+    response.raise_for_status()
+
+    client = socketio_client.Client(http_session=session)
+    client.received = {'message': [], 'chat_history': []}
+    client.on('message', lambda data: client.received['message'].append(data))
+    client.on('chat_history', lambda data: client.received['chat_history'].append(data))
+    client.connect(base_url, transports=['polling'])
+    return client
+
+
+def start_fake_redis():
+    """A fakeredis TCP server on a free port; None without fakeredis 2.26 or newer"""
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        return None
+
+    port = _free_port()
+    server = TcpFakeServer(('127.0.0.1', port), server_type='redis')
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'redis://127.0.0.1:{port}/0'
+
+
+def _redis_reachable(url):
+    try:
+        import redis
+        return redis.Redis.from_url(url, socket_connect_timeout=1).ping()
+    except Exception:
+        return False
+
+
+def message_queue_for_test():
+    """TEST_SOCKETIO_MESSAGE_QUEUE, else a local Redis, else fakeredis; None when there is none"""
+    configured = os.environ.get('TEST_SOCKETIO_MESSAGE_QUEUE')
+    if configured:
+        return configured
+    if _redis_reachable(DEFAULT_MESSAGE_QUEUE):
+        return DEFAULT_MESSAGE_QUEUE
+    return start_fake_redis()
+
+
+def test_cross_worker_delivery():
+    import requests
+
+    message_queue = message_queue_for_test()
+    if message_queue is None:
+        import pytest
+        pytest.skip('needs Redis (TEST_SOCKETIO_MESSAGE_QUEUE or localhost) or fakeredis')
+    print(f"🔄 Two workers sharing {message_queue}")
+
+    database_url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='uniportal-scaling-'), 'scaling.db')
+    room, (email_a, email_b) = seed(database_url)
+
+    context = multiprocessing.get_context('spawn')
+    ports = [_free_port(), _free_port()]
+    workers = [context.Process(target=serve, args=(port, database_url, message_queue), daemon=True)
+               for port in ports]
+    for worker in workers:
+        worker.start()
+
+    clients = []
+    try:
+        urls = [f'http://127.0.0.1:{port}' for port in ports]
+        for url in urls:
+            def up(url=url):
+                try:
+                    return requests.get(f'{url}/login', timeout=1).ok
+                except requests.RequestException:
+                    return False
+            assert _wait_for(up), f"Worker at {url} did not start"
+
+        client_a, client_b = connect(urls[0], email_a), connect(urls[1], email_b)
+        clients = [client_a, client_b]
+        for client in clients:
+            client.emit('join', {'room': room})
+
+        # Warm worker A's ring buffer (the room has no messages, or even a
+        # channel, yet) so its history below comes from the relay, not the database
+        client_a.emit('get_chat_history', {'room': room})
+        assert _wait_for(lambda: client_a.received['chat_history']), "No chat history from worker A"
+        time.sleep(0.5)  # let both workers' relays subscribe
+
+        text = f'hello across workers {time.time()}'
+        client_b.emit('message', {'room': room, 'msg': text})
+
+        assert _wait_for(lambda: any(m['msg'] == text for m in client_a.received['message'])), \
+            "Message sent through worker B never reached the client on worker A"
+        print("✅ Message sent through worker B reached the client on worker A")
+
+        client_a.received['chat_history'].clear()
+        client_a.emit('get_chat_history', {'room': room})
+        assert _wait_for(lambda: client_a.received['chat_history']), "No chat history from worker A"
+        assert any(m['msg'] == text for m in client_a.received['chat_history'][0]['messages']), \
+            "Worker A's history is missing the message sent through worker B"
+        print("✅ Worker A's history includes the message sent through worker B")
+    finally:
+        for client in clients:
+            client.disconnect()
+        for worker in workers:
+            worker.terminate()
+            worker.join(5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cross-worker Socket.IO check')
+    parser.add_argument('--fake', action='store_true', help='use an in-process fakeredis server')
+    options = parser.parse_args()
+
+    if options.fake:
+        fake_queue = start_fake_redis()
+        if fake_queue is None:
+            print("❌ --fake needs fakeredis 2.26 or newer: pip install fakeredis")
+            sys.exit(1)
+        os.environ['TEST_SOCKETIO_MESSAGE_QUEUE'] = fake_queue
+    else:
+        os.environ.setdefault('TEST_SOCKETIO_MESSAGE_QUEUE', DEFAULT_MESSAGE_QUEUE)
+
+    try:
+        test_cross_worker_delivery()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print("🎉 Socket.IO events span workers")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""
+Production entry point for UniPortal
+Patches the standard library for the chosen async mode before the app is
+imported, then exposes `app` for gunicorn:
+
+    gunicorn --worker-class eventlet -w 1 --bind 0.0.0.0:5000 wsgi:app
+    SOCKETIO_ASYNC_MODE=gevent gunicorn --worker-class gevent -w 1 --bind 0.0.0.0:5000 wsgi:app
+
+Socket.IO needs every request of a client to reach the same process, so run
+one worker per gunicorn and scale out with more gunicorns (ports or hosts)
+behind a sticky-session load balancer, sharing SOCKETIO_MESSAGE_QUEUE.
+See "Running several workers" in REALTIME_CHAT_SETUP.md.
+"""
+
+import os
+
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', 'eventlet')
+
+if os.environ['SOCKETIO_ASYNC_MODE'] == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif os.environ['SOCKETIO_ASYNC_MODE'] == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+from app import create_app
+from app.utils.chat import flush_on_sigterm
+
+app = create_app()
+flush_on_sigterm()